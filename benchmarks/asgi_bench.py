@@ -0,0 +1,175 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from benchmarks.utils import populate, serving, hammer, percentile
+from contextlib import contextmanager
+from http.client import HTTPConnection
+from tempfile import TemporaryDirectory
+from threading import Thread
+from worky import asgi, server
+from worky.storage import Storage
+import argparse
+import os
+import socket
+import time
+
+
+@contextmanager
+def serving_asgi(asgi_app):
+    """
+    Serves an ASGI application with uvicorn on a free local port for the
+    duration of the context
+
+    Parameters
+    ----------
+    asgi_app : ASGI application
+        application to be served
+
+    Returns
+    -------
+    address : tuple of (str, int)
+        host and port where the application is being served
+    """
+    import uvicorn
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+
+    config = uvicorn.Config(asgi_app, host="127.0.0.1", port=port,
+                            log_level="error", lifespan="off")
+    uvicorn_server = uvicorn.Server(config)
+
+    server_thread = Thread(target=uvicorn_server.run, daemon=True)
+    server_thread.start()
+
+    while not uvicorn_server.started:
+        time.sleep(0.01)
+
+    try:
+        yield ("127.0.0.1", port)
+    finally:
+        uvicorn_server.should_exit = True
+        server_thread.join()
+
+
+@contextmanager
+def idle_connections(address, count):
+    """
+    Keeps connections open without sending anything after a first request,
+    like browsers holding keep-alive connections
+
+    Parameters
+    ----------
+    address : tuple of (str, int)
+        host and port of the server
+    count : int
+        number of idle connections
+    """
+    connections = []
+
+    try:
+        for _ in range(count):
+            connection = HTTPConnection(*address)
+            connection.request("GET", "/static/styles/style.css")
+            connection.getresponse().read()
+            connections.append(connection)
+
+        yield
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+def measure(address, path, clients, idle, duration):
+    with idle_connections(address, idle):
+        (rps, latencies) = hammer(address, path, clients, duration)
+
+    return (rps, percentile(latencies, 50) * 1000,
+            percentile(latencies, 99) * 1000)
+
+
+def bench(tasks, clients, idle_counts, duration, threads):
+    try:
+        import uvicorn  # noqa: F401
+        modes = ["waitress", "asgi"]
+    except ImportError:
+        print("uvicorn is not installed, only measuring waitress")
+        modes = ["waitress"]
+
+    with TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "bench.worky")
+
+        storage = Storage(db_path)
+        populate(storage, tasks, tasks // 4, tasks)
+        storage.close()
+
+        print("%-10s %8s %12s %12s %12s" % ("mode", "idle", "requests/s",
+                                            "p50 (ms)", "p99 (ms)"))
+
+        for idle in idle_counts:
+            for mode in modes:
+                storage = Storage(db_path, pool_size=threads)
+
+                if mode == "waitress":
+                    server.app.config['STORAGE'] = storage
+                    context = serving(server.app, threads=threads,
+                                      connection_limit=idle + clients + 10)
+                else:
+                    context = serving_asgi(asgi.AsgiApp(
+                        asgi.AsyncStorage(storage, threads=threads)))
+
+                with context as address:
+                    result = measure(address, "/", clients, idle, duration)
+
+                storage.close()
+
+                print("%-10s %8d %12.1f %12.2f %12.2f" %
+                      ((mode, idle) + result))
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Compares the "
+                                         "latency of the TODO page served by "
+                                         "waitress and by the ASGI mode "
+                                         "while many idle keep-alive "
+                                         "connections are held open")
+    arg_parser.add_argument("--tasks", help="number of active tasks in the "
+                            "benchmark workfile", type=int, default=50)
+    arg_parser.add_argument("--clients", help="number of concurrent busy "
+                            "clients", type=int, default=16)
+    arg_parser.add_argument("--idle", help="comma separated numbers of idle "
+                            "connections to try", type=str,
+                            default="0,100,500")
+    arg_parser.add_argument("--duration", help="duration of each run in "
+                            "seconds", type=float, default=5)
+    arg_parser.add_argument("--threads", help="server threads, or database "
+                            "threads in the ASGI mode", type=int,
+                            default=server.THREADS)
+    args = arg_parser.parse_args()
+
+    idle_counts = [int(count) for count in args.idle.split(",")]
+
+    bench(args.tasks, args.clients, idle_counts, args.duration,
+          args.threads)
@@ -0,0 +1,108 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from benchmarks.utils import populate
+from tempfile import TemporaryDirectory
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+def first_request(db_path, template_cache):
+    """
+    Serves the first request of a freshly started process and prints the
+    time to its first byte and since the process started, in seconds
+    """
+    start = time.perf_counter()
+
+    from worky import server
+    from worky.storage import Storage
+
+    server.app.config['STORAGE'] = Storage(db_path)
+
+    if template_cache:
+        server.set_template_cache(template_cache)
+
+    client = server.app.test_client()
+
+    request_start = time.perf_counter()
+    response = client.get("/", buffered=False)
+    next(response.response)
+    end = time.perf_counter()
+
+    print(end - request_start, end - start)
+
+
+def run_first_request(db_path, template_cache):
+    output = subprocess.check_output([sys.executable, "-m",
+                                      "benchmarks.cold_start_bench",
+                                      "--first-request", db_path,
+                                      template_cache], text=True)
+
+    return [float(value) for value in output.split()]
+
+
+def bench(runs):
+    with TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "bench.worky")
+        template_cache = os.path.join(tmpdir, "templates")
+
+        from worky.storage import Storage
+
+        storage = Storage(db_path)
+        populate(storage, 20, 5, 0)
+        storage.close()
+
+        """ fill the template cache """
+        run_first_request(db_path, template_cache)
+
+        print("%-16s %14s %14s" % ("templates", "first byte (ms)",
+                                   "launch (ms)"))
+
+        for mode, cache in [("compiled", ""), ("cached", template_cache)]:
+            results = [run_first_request(db_path, cache) for _ in range(runs)]
+
+            print("%-16s %14.2f %14.2f" %
+                  (mode, statistics.median(r[0] for r in results) * 1000,
+                   statistics.median(r[1] for r in results) * 1000))
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Measures the time to "
+                                         "first byte of the TODO page on a "
+                                         "freshly launched process, with and "
+                                         "without the template cache")
+    arg_parser.add_argument("--runs", help="number of launches per mode",
+                            type=int, default=10)
+    arg_parser.add_argument("--first-request", help=argparse.SUPPRESS,
+                            nargs=2)
+    args = arg_parser.parse_args()
+
+    if args.first_request:
+        first_request(*args.first_request)
+    else:
+        bench(args.runs)
@@ -0,0 +1,99 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from benchmarks.utils import due_date_format
+from datetime import datetime, timedelta, UTC
+from tempfile import TemporaryDirectory
+from worky.storage import Storage
+import argparse
+import os
+import time
+
+
+def timed(operation, *args):
+    start = time.perf_counter()
+    result = operation(*args)
+
+    return (result, time.perf_counter() - start)
+
+
+def bench(tasks, single, profile):
+    today = datetime.now(UTC)
+
+    rows = [("imported task %d" % i,
+             (today + timedelta(days=i % 60 - 30)).strftime(due_date_format))
+            for i in range(tasks)]
+
+    print("%-24s %8s %12s %12s" % ("operation", "tasks", "seconds",
+                                   "tasks/s"))
+
+    def report(name, count, seconds):
+        print("%-24s %8d %12.3f %12.1f" % (name, count, seconds,
+                                           count / seconds))
+
+    with TemporaryDirectory() as tmpdir:
+        storage = Storage(os.path.join(tmpdir, "bench.worky"),
+                          profile=profile)
+
+        if single:
+            (_, seconds) = timed(lambda: [storage.create_task(*row)
+                                          for row in rows[:single]])
+            report("create_task (loop)", single, seconds)
+
+        (task_ids, seconds) = timed(storage.create_tasks, rows)
+        report("create_tasks", tasks, seconds)
+
+        updates = [(task_id, "updated task", due_date)
+                   for (task_id, (_, due_date)) in zip(task_ids, rows)]
+
+        (_, seconds) = timed(storage.update_tasks, updates)
+        report("update_tasks", tasks, seconds)
+
+        half = task_ids[:tasks // 2]
+
+        (_, seconds) = timed(storage.complete_tasks, half)
+        report("complete_tasks", len(half), seconds)
+
+        (_, seconds) = timed(storage.delete_tasks, task_ids)
+        report("delete_tasks", tasks, seconds)
+
+        storage.close()
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Measures the "
+                                         "throughput of the batch task "
+                                         "operations of the storage, as used "
+                                         "by the batch API and the importer")
+    arg_parser.add_argument("--tasks", help="number of tasks in each batch",
+                            type=int, default=10000)
+    arg_parser.add_argument("--single", help="number of tasks also created "
+                            "one at a time, for comparison", type=int,
+                            default=500)
+    arg_parser.add_argument("--storage-profile", help="database tuning "
+                            "profile", type=str, dest="profile",
+                            default="default")
+    args = arg_parser.parse_args()
+
+    bench(args.tasks, args.single, args.profile)
@@ -0,0 +1,99 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from benchmarks.utils import populate, serving, hammer, percentile
+from tempfile import TemporaryDirectory
+from worky import server
+from worky.config import CONNECTION_LIMIT, BACKLOG, CHANNEL_TIMEOUT
+from worky.storage import Storage
+import argparse
+import os
+
+""" pages requested by the load test """
+PATHS = ["/", "/completed"]
+
+
+def bench(thread_counts, tasks, completed, clients, duration, pooled,
+          profile):
+    with TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "bench.worky")
+
+        storage = Storage(db_path)
+        populate(storage, tasks, tasks // 4, completed)
+        storage.close()
+
+        print("%-12s %8s %12s %12s %12s" % ("path", "threads", "requests/s",
+                                            "p50 (ms)", "p99 (ms)"))
+
+        for path in PATHS:
+            for threads in thread_counts:
+                """ uncached, so that every request reads the database """
+                storage = Storage(db_path,
+                                  pool_size=threads if pooled else 0,
+                                  profile=profile, cache=False)
+                server.app.config['STORAGE'] = storage
+
+                with serving(server.app, threads=threads,
+                             connection_limit=max(CONNECTION_LIMIT, clients),
+                             backlog=BACKLOG,
+                             channel_timeout=CHANNEL_TIMEOUT) as address:
+                    (rps, latencies) = hammer(address, path, clients,
+                                              duration)
+
+                storage.close()
+
+                print("%-12s %8d %12.1f %12.2f %12.2f" %
+                      (path, threads, rps, percentile(latencies, 50) * 1000,
+                       percentile(latencies, 99) * 1000))
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Sweeps the number of "
+                                         "server threads under a fixed "
+                                         "number of concurrent clients, to "
+                                         "size the --threads argument of "
+                                         "worky.py for a given workfile")
+    arg_parser.add_argument("--threads", help="comma separated thread counts "
+                            "to try", type=str, default="1,2,4,8,16")
+    arg_parser.add_argument("--tasks", help="number of active tasks in the "
+                            "benchmark workfile", type=int, default=200)
+    arg_parser.add_argument("--completed", help="number of completed tasks "
+                            "in the benchmark workfile", type=int,
+                            default=200)
+    arg_parser.add_argument("--clients", help="number of concurrent clients",
+                            type=int, default=32)
+    arg_parser.add_argument("--duration", help="duration of each run in "
+                            "seconds", type=float, default=5)
+    arg_parser.add_argument("--pool", help="keep one pooled connection per "
+                            "server thread", action="store_true",
+                            dest="pooled")
+    arg_parser.add_argument("--storage-profile", help="database tuning "
+                            "profile", type=str, dest="profile",
+                            default="default")
+    args = arg_parser.parse_args()
+
+    thread_counts = [int(count) for count in args.threads.split(",")]
+
+    bench(thread_counts, args.tasks, args.completed, args.clients,
+          args.duration, args.pooled, args.profile)
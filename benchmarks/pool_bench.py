@@ -0,0 +1,73 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from benchmarks.utils import populate, serving, hammer, percentile
+from tempfile import TemporaryDirectory
+from worky import server
+from worky.storage import Storage
+import argparse
+import os
+
+
+def bench(tasks, clients, duration):
+    with TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "bench.worky")
+
+        storage = Storage(db_path)
+        populate(storage, tasks, tasks // 4, tasks)
+        storage.close()
+
+        print("%-10s %12s %12s %12s" % ("mode", "requests/s", "p50 (ms)",
+                                        "p99 (ms)"))
+
+        for mode, pool_size in [("NullPool", 0), ("pooled", server.THREADS)]:
+            """ uncached, so that every request reads the database """
+            storage = Storage(db_path, pool_size=pool_size, cache=False)
+            server.app.config['STORAGE'] = storage
+
+            with serving(server.app, threads=server.THREADS) as address:
+                (rps, latencies) = hammer(address, "/", clients, duration)
+
+            storage.close()
+
+            print("%-10s %12.1f %12.2f %12.2f" %
+                  (mode, rps, percentile(latencies, 50) * 1000,
+                   percentile(latencies, 99) * 1000))
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Compares the "
+                                         "throughput of the index page when "
+                                         "a new database connection is "
+                                         "opened for every operation against "
+                                         "the pooled mode")
+    arg_parser.add_argument("--tasks", help="number of active tasks in the "
+                            "benchmark workfile", type=int, default=20)
+    arg_parser.add_argument("--clients", help="number of concurrent clients",
+                            type=int, default=8)
+    arg_parser.add_argument("--duration", help="duration of each run in "
+                            "seconds", type=float, default=5)
+    args = arg_parser.parse_args()
+
+    bench(args.tasks, args.clients, args.duration)
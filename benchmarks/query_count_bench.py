@@ -0,0 +1,99 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from benchmarks.utils import populate
+from tempfile import TemporaryDirectory
+from worky import server
+from worky.storage import Storage
+import argparse
+import os
+import sqlalchemy
+
+
+def count_queries(client, engine, path):
+    """
+    Counts the SQL statements executed while serving a request
+
+    Parameters
+    ----------
+    client : flask.testing.FlaskClient
+        test client of the application
+    engine : sqlalchemy.engine.Engine
+        engine of the storage used by the application
+    path : str
+        requested path
+
+    Returns
+    -------
+    count : int
+        number of executed SQL statements
+    """
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sqlalchemy.event.listen(engine, "before_cursor_execute", count)
+
+    try:
+        response = client.get(path)
+    finally:
+        sqlalchemy.event.remove(engine, "before_cursor_execute", count)
+
+    if response.status_code != 200:
+        raise Exception("Unexpected status %d for %s"
+                        % (response.status_code, path))
+
+    return len(statements)
+
+
+def bench(tasks):
+    with TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "bench.worky")
+
+        storage = Storage(db_path)
+        populate(storage, tasks, tasks, tasks)
+
+        server.app.config['STORAGE'] = storage
+        client = server.app.test_client()
+
+        print("%-12s %8s" % ("path", "queries"))
+
+        for path in ["/", "/completed"]:
+            print("%-12s %8d" % (path, count_queries(client, storage._engine,
+                                                     path)))
+
+        storage.close()
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Counts the SQL "
+                                         "statements issued per request on "
+                                         "the list pages")
+    arg_parser.add_argument("--tasks", help="number of active, overdue and "
+                            "completed tasks in the benchmark workfile",
+                            type=int, default=20)
+    args = arg_parser.parse_args()
+
+    bench(args.tasks)
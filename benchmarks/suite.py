@@ -0,0 +1,347 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from benchmarks.utils import due_date_format, populate
+from datetime import datetime, timedelta, UTC
+from tempfile import TemporaryDirectory
+from worky import server
+from worky.server import COMPLETED_PAGE_SIZE
+from worky.storage import Storage
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import time
+
+""" version of the results file format """
+RESULTS_VERSION = 1
+
+""" number of tasks of the synthetic workfiles """
+SIZES = [1000, 10000, 100000]
+
+""" number of timed runs of each benchmark """
+REPEAT = 15
+
+""" number of tasks created and completed by the throughput benchmarks """
+WRITES = 100
+
+""" relative slowdown from which a benchmark is flagged as a regression """
+THRESHOLD = 0.25
+
+"""
+slowdown, in milliseconds, below which a benchmark is never flagged, as
+such differences are within the noise of the fastest benchmarks
+"""
+NOISE_MS = 0.05
+
+
+def measure(operation, repeat):
+    """
+    Times an operation, after a first untimed run warming up the caches
+
+    Parameters
+    ----------
+    operation : callable
+        operation to time
+    repeat : int
+        number of timed runs
+
+    Returns
+    -------
+    result : dict
+        median and minimum duration of a run, in milliseconds
+    """
+    operation()
+
+    durations = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operation()
+        durations.append((time.perf_counter() - start) * 1000)
+
+    return {"median_ms": statistics.median(durations),
+            "min_ms": min(durations)}
+
+
+def measure_writes(write, ids, repeat):
+    """
+    Times a write operation done on one task at a time
+
+    Parameters
+    ----------
+    write : callable
+        operation, given a task id
+    ids : callable
+        gives the WRITES task ids of each run
+    repeat : int
+        number of timed runs
+
+    Returns
+    -------
+    result : dict
+        median and minimum duration of a single write, in milliseconds
+    """
+    def run():
+        for task_id in ids():
+            write(task_id)
+
+    result = measure(run, repeat)
+
+    return {key: value / WRITES for (key, value) in result.items()}
+
+
+def bench_size(size, repeat):
+    """
+    Runs every benchmark on a synthetic workfile
+
+    Parameters
+    ----------
+    size : int
+        number of tasks of the workfile: a tenth active, a tenth overdue
+        and the rest completed
+    repeat : int
+        number of timed runs of each benchmark
+
+    Returns
+    -------
+    results : dict
+        result of each benchmark, by name
+    """
+    results = {}
+
+    with TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "bench.worky")
+
+        """ uncached, so that every run reads the database """
+        storage = Storage(db_path, cache=False)
+        populate(storage, size // 10, size // 10, size - 2 * (size // 10))
+
+        results["get_active_tasks"] = measure(storage.get_active_tasks,
+                                              repeat)
+        results["get_overdue_tasks"] = measure(storage.get_overdue_tasks,
+                                               repeat)
+        results["get_completed_tasks"] = measure(
+            lambda: storage.get_completed_tasks(
+                limit=COMPLETED_PAGE_SIZE + 1), repeat)
+        results["search_tasks"] = measure(
+            lambda: storage.search_tasks("task 12",
+                                         limit=COMPLETED_PAGE_SIZE + 1),
+            repeat)
+
+        server.app.config['STORAGE'] = storage
+        server.app.config['STREAMING'] = False
+        client = server.app.test_client()
+
+        for path in ["/", "/completed"]:
+            def get():
+                response = client.get(path)
+
+                if response.status_code != 200:
+                    raise Exception("Unexpected status %d for %s"
+                                    % (response.status_code, path))
+
+            results["GET %s" % path] = measure(get, repeat)
+
+        due_date = (datetime.now(UTC) + timedelta(days=7)).strftime(
+            due_date_format)
+        created = []
+
+        def create(_):
+            created.append(storage.create_task("new task", due_date))
+
+        results["create_task"] = measure_writes(create,
+                                                lambda: range(WRITES), repeat)
+
+        def completable():
+            tasks = created[:WRITES]
+            del created[:WRITES]
+
+            return tasks
+
+        results["complete_task"] = measure_writes(storage.complete_task,
+                                                  completable, repeat)
+
+        server.app.config['STORAGE'] = None
+        storage.close()
+
+    return results
+
+
+def run(sizes, repeat):
+    """
+    Runs the benchmark suite
+
+    Parameters
+    ----------
+    sizes : list of int
+        number of tasks of each synthetic workfile
+    repeat : int
+        number of timed runs of each benchmark
+
+    Returns
+    -------
+    results : dict
+        the results document: the environment of the run and the result of
+        each benchmark, by "<size>/<benchmark>" name
+    """
+    results = {}
+
+    for size in sizes:
+        for (name, result) in bench_size(size, repeat).items():
+            results["%d/%s" % (size, name)] = result
+
+    return {"version": RESULTS_VERSION,
+            "date": datetime.now(UTC).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "results": results}
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """
+    Compares the results of a run with those of a previous run
+
+    Parameters
+    ----------
+    results : dict
+        results document of the run
+    baseline : dict
+        results document of the previous run
+    threshold : float
+        relative slowdown of the median from which a benchmark is flagged
+
+    Returns
+    -------
+    comparison : list of tuple of (str, float, float, bool)
+        name, median and baseline median in milliseconds, and regression
+        flag of each benchmark found in both runs
+    """
+    comparison = []
+
+    for (name, result) in results["results"].items():
+        previous = baseline["results"].get(name)
+
+        if previous is None:
+            continue
+
+        median = result["median_ms"]
+        previous_median = previous["median_ms"]
+
+        regression = (median > previous_median * (1 + threshold) and
+                      median - previous_median > NOISE_MS)
+
+        comparison.append((name, median, previous_median, regression))
+
+    return comparison
+
+
+def report(results, comparison=None):
+    """
+    Prints the results of a run, with their comparison if any
+    """
+    baseline = {name: (previous, regression)
+                for (name, _, previous, regression) in comparison or []}
+
+    print("%-32s %12s %12s %12s %9s" % ("benchmark", "median ms", "min ms",
+                                        "baseline ms", "change"))
+
+    for (name, result) in results["results"].items():
+        line = "%-32s %12.3f %12.3f" % (name, result["median_ms"],
+                                        result["min_ms"])
+
+        if name in baseline:
+            (previous, regression) = baseline[name]
+            line += " %12.3f %+8.0f%%" % (previous, (result["median_ms"] /
+                                                     previous - 1) * 100)
+
+            if regression:
+                line += " REGRESSION"
+
+        print(line)
+
+
+def main(argv):
+    """
+    Runs the benchmark suite from the command line. Exits with status 1 if
+    any benchmark regressed from the baseline
+
+    Parameters
+    ----------
+    argv : list of str
+        command arguments
+    """
+    arg_parser = argparse.ArgumentParser(prog="benchmarks.suite",
+                                         description="Times the storage "
+                                         "queries, the single task writes "
+                                         "and the TODO and completed pages on "
+                                         "synthetic workfiles of several "
+                                         "sizes, and saves the results as "
+                                         "JSON")
+    arg_parser.add_argument("--sizes", help="comma separated number of tasks "
+                            "of each synthetic workfile. Default is %s"
+                            % ",".join(str(size) for size in SIZES),
+                            type=lambda sizes: [int(size) for size
+                                                in sizes.split(",")],
+                            default=SIZES)
+    arg_parser.add_argument("--repeat", help="number of timed runs of each "
+                            "benchmark. Default is %d" % REPEAT, type=int,
+                            default=REPEAT)
+    arg_parser.add_argument("--output", help="file where the results are "
+                            "saved", type=str, default=None)
+    arg_parser.add_argument("--baseline", help="results of a previous run, "
+                            "to which the results are compared", type=str,
+                            default=None)
+    arg_parser.add_argument("--threshold", help="relative slowdown from "
+                            "which a benchmark is flagged as a regression. "
+                            "Default is %.2f" % THRESHOLD, type=float,
+                            default=THRESHOLD)
+    args = arg_parser.parse_args(argv)
+
+    results = run(args.sizes, args.repeat)
+
+    comparison = None
+
+    if args.baseline is not None:
+        with open(args.baseline) as baseline_file:
+            comparison = compare(results, json.load(baseline_file),
+                                 args.threshold)
+
+    report(results, comparison)
+
+    if args.output is not None:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+    if comparison and any(regression for (*_, regression) in comparison):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
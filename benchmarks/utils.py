@@ -0,0 +1,192 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta, UTC
+from http.client import HTTPConnection
+from threading import Event, Thread
+from waitress.server import create_server
+import logging
+import time
+
+""" queue depth warnings are expected while saturating the server """
+logging.getLogger("waitress.queue").setLevel(logging.ERROR)
+
+due_date_format = '%Y-%m-%d'
+
+
+def populate(storage, active, overdue, completed):
+    """
+    Fills a storage with synthetic tasks
+
+    Parameters
+    ----------
+    storage : worky.storage.Storage
+        storage to be filled
+    active : int
+        number of active tasks to create
+    overdue : int
+        number of overdue tasks to create
+    completed : int
+        number of completed tasks to create
+    """
+    today = datetime.now(UTC)
+
+    def due_date(days):
+        return (today + timedelta(days=days)).strftime(due_date_format)
+
+    storage.create_tasks([("active task %d" % i, due_date(1 + i % 30))
+                          for i in range(active)])
+    storage.create_tasks([("overdue task %d" % i, due_date(-1 - i % 30))
+                          for i in range(overdue)])
+
+    completed_ids = storage.create_tasks([("completed task %d" % i,
+                                           due_date(i % 30))
+                                          for i in range(completed)])
+    storage.complete_tasks(completed_ids)
+
+
+@contextmanager
+def serving(app, threads=4, **kwargs):
+    """
+    Serves a WSGI application with waitress on a free local port for the
+    duration of the context
+
+    Parameters
+    ----------
+    app : WSGI application
+        application to be served
+    threads : int
+        number of waitress worker threads
+    kwargs : dict
+        additional waitress adjustments
+
+    Returns
+    -------
+    address : tuple of (str, int)
+        host and port where the application is being served
+    """
+    server = create_server(app, host="127.0.0.1", port=0, threads=threads,
+                           **kwargs)
+    stop = Event()
+
+    def loop():
+        while not stop.is_set():
+            server.asyncore.loop(timeout=0.1, map=server._map, count=1)
+
+        server.task_dispatcher.shutdown()
+        server.asyncore.close_all(server._map)
+
+    server_thread = Thread(target=loop, daemon=True)
+    server_thread.start()
+
+    try:
+        yield ("127.0.0.1", server.effective_port)
+    finally:
+        stop.set()
+        server_thread.join()
+
+
+def hammer(address, path, clients, duration):
+    """
+    Sends GET requests to the given address from several concurrent
+    keep-alive clients during the given amount of time
+
+    Parameters
+    ----------
+    address : tuple of (str, int)
+        host and port of the server
+    path : str
+        requested path
+    clients : int
+        number of concurrent clients
+    duration : float
+        duration of the test in seconds
+
+    Returns
+    -------
+    requests_per_second : float
+        number of answered requests per second
+    latencies : list of float
+        latency of every answered request, in seconds
+    """
+    latencies = []
+    deadline = time.perf_counter() + duration
+
+    def client():
+        connection = HTTPConnection(*address)
+
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+
+            connection.request("GET", path)
+            response = connection.getresponse()
+            response.read()
+
+            if response.status != 200:
+                raise Exception("Unexpected status %d for %s"
+                                % (response.status, path))
+
+            latencies.append(time.perf_counter() - start)
+
+        connection.close()
+
+    workers = [Thread(target=client) for _ in range(clients)]
+
+    start = time.perf_counter()
+
+    for worker in workers:
+        worker.start()
+
+    for worker in workers:
+        worker.join()
+
+    return (len(latencies) / (time.perf_counter() - start), latencies)
+
+
+def percentile(values, percent):
+    """
+    Computes a percentile of a list of values (nearest rank)
+
+    Parameters
+    ----------
+    values : list of float
+        sampled values
+    percent : float
+        wanted percentile, from 0 to 100
+
+    Returns
+    -------
+    percentile : float
+        the value at the given percentile
+    """
+    ordered = sorted(values)
+
+    if not ordered:
+        return 0.0
+
+    rank = max(0, min(len(ordered) - 1,
+                      round(percent / 100 * len(ordered)) - 1))
+
+    return ordered[rank]
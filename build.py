@@ -47,6 +47,9 @@ else:
 
 SELENIUM_DRIVER_PATH = Path(".env") / PIPENV_BIN_DIR
 
+BENCHMARK_RESULTS = "benchmark_results.json"
+BENCHMARK_BASELINE = "benchmark_baseline.json"
+
 
 def get_deps_tar_file(platform):
     return "%s_%s.tar.gz" % (DEPS_DIR, platform)
@@ -126,6 +129,29 @@ def run_flake8():
     subprocess.check_call(['flake8', '--exclude', '.env'])
 
 
+def precompile_templates():
+    from worky import server
+
+    cache_dir = server.default_template_cache_dir()
+
+    server.set_template_cache(cache_dir)
+
+    for template in server.precompile_templates():
+        print("Compiled %s" % template)
+
+    print("Compiled templates stored at %s" % cache_dir)
+
+
+def run_benchmarks():
+    command = [sys.executable, '-m', 'benchmarks.suite',
+               '--output', BENCHMARK_RESULTS]
+
+    if Path(BENCHMARK_BASELINE).is_file():
+        command += ['--baseline', BENCHMARK_BASELINE]
+
+    subprocess.check_call(command)
+
+
 if __name__ == '__main__':
     arg_parser = argparse.ArgumentParser()
 
@@ -157,6 +183,14 @@ if __name__ == '__main__':
                          action="store_true")
     options.add_argument("--lint", help="Run flake8 against the project",
                          action="store_true")
+    options.add_argument("--precompile-templates", help="Compile the page "
+                         "templates into the user template cache, so the "
+                         "first page load after launching worky is faster",
+                         action="store_true")
+    options.add_argument("--bench", help="Run the benchmark suite, save the "
+                         "results at %s and flag the regressions from %s if "
+                         "it exists" % (BENCHMARK_RESULTS, BENCHMARK_BASELINE),
+                         action="store_true")
 
     args = arg_parser.parse_args()
 
@@ -179,6 +213,10 @@ if __name__ == '__main__':
             package(WIN_PLATFORM)
         elif args.lint:
             run_flake8()
+        elif args.precompile_templates:
+            precompile_templates()
+        elif args.bench:
+            run_benchmarks()
         else:
             arg_parser.print_help()
     except subprocess.CalledProcessError as e:
@@ -0,0 +1,195 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from worky import server
+from worky.storage import Storage
+from tests.utils import date_utils
+import pytest
+
+
+@pytest.fixture
+def _client(tmpdir):
+    storage = Storage(str(tmpdir.join("stuff.worky")))
+    server.app.config['STORAGE'] = storage
+
+    yield (server.app.test_client(), storage)
+
+    storage.close()
+
+
+def _task(description, days):
+    return {"description": description,
+            "due_date": date_utils.date_from_today(days)}
+
+
+def test_api_task_lifecycle(_client):
+    (client, storage) = _client
+
+    response = client.post("/api/tasks", json=_task("new", 1))
+
+    assert response.status_code == 201
+
+    task = response.get_json()
+
+    assert task["description"] == "new"
+    assert task["due_date"] == date_utils.date_from_today(1)
+
+    response = client.put("/api/tasks/%d" % task["id"],
+                          json=_task("updated", 2))
+
+    assert response.get_json()["description"] == "updated"
+    assert client.get("/api/tasks/%d" % task["id"]).get_json() == \
+        response.get_json()
+
+    assert client.post("/api/tasks/%d/complete" % task["id"]).status_code \
+        == 204
+    assert client.post("/api/tasks/%d/complete" % task["id"]).status_code \
+        == 409
+
+    [completed] = client.get("/api/tasks/completed").get_json()["tasks"]
+
+    assert completed["id"] == task["id"]
+    assert "completed_by" in completed
+
+    assert client.delete("/api/tasks/%d" % task["id"]).status_code == 204
+    assert client.get("/api/tasks/%d" % task["id"]).status_code == 404
+    assert storage.get_completed_tasks() == []
+
+
+def test_api_list_tasks(_client):
+    (client, storage) = _client
+
+    storage.create_task("active", date_utils.date_from_today(1))
+    storage.create_task("overdue", date_utils.date_from_today(-1))
+
+    response = client.get("/api/tasks")
+    tasks = response.get_json()
+
+    assert [task["description"] for task in tasks["active"]] == ["active"]
+    assert [task["description"] for task in tasks["overdue"]] == ["overdue"]
+
+    response = client.get("/api/tasks", headers={
+        "If-None-Match": response.headers["ETag"]})
+
+    assert response.status_code == 304
+
+
+def test_api_completed_pagination(_client):
+    (client, storage) = _client
+
+    task_ids = storage.create_tasks([("task %d" % i, date_utils
+                                      .date_from_today(1))
+                                     for i in range(3)])
+    storage.complete_tasks(task_ids)
+
+    page = client.get("/api/tasks/completed?limit=2").get_json()
+
+    assert len(page["tasks"]) == 2
+    assert page["after"] == page["tasks"][-1]["id"]
+
+    page = client.get("/api/tasks/completed?limit=2&after=%d"
+                      % page["after"]).get_json()
+
+    assert len(page["tasks"]) == 1
+    assert page["after"] is None
+
+
+def test_api_batch(_client):
+    (client, storage) = _client
+
+    response = client.post("/api/batch/create",
+                           json=[_task("task %d" % i, 1) for i in range(4)])
+
+    assert response.status_code == 201
+
+    task_ids = response.get_json()["ids"]
+
+    assert len(storage.get_active_tasks()) == 4
+
+    update = [dict(_task("renamed", 2), id=task_id)
+              for task_id in task_ids[:2]]
+
+    assert client.post("/api/batch/update", json=update).status_code == 204
+    assert client.post("/api/batch/complete",
+                       json=task_ids[2:]).status_code == 204
+    assert client.post("/api/batch/delete",
+                       json=task_ids[:1]).status_code == 204
+
+    [task] = storage.get_active_tasks()
+
+    assert (task.id, task.description) == (task_ids[1], "renamed")
+    assert len(storage.get_completed_tasks()) == 2
+
+
+def test_api_batch_is_atomic(_client):
+    (client, storage) = _client
+
+    task_ids = storage.create_tasks([("task", date_utils.date_from_today(1))])
+
+    response = client.post("/api/batch/complete", json=task_ids + [999])
+
+    assert response.status_code == 409
+    assert storage.get_completed_tasks() == []
+
+    update = [dict(_task("renamed", 1), id=task_ids[0]),
+              dict(_task("renamed", 1), id=999)]
+
+    assert client.post("/api/batch/update", json=update).status_code == 404
+    assert storage.get_task(task_ids[0]).description == "task"
+
+
+@pytest.mark.parametrize("path, body", [
+    ("/api/tasks", [_task("task", 1)]),
+    ("/api/tasks", {"description": "task"}),
+    ("/api/tasks", {"description": "", "due_date": "2020-01-01"}),
+    ("/api/tasks", {"description": "task", "due_date": "tomorrow"}),
+    ("/api/tasks", {"description": "task", "due_date": "20300101"}),
+    ("/api/tasks", {"description": "task", "due_date": "2030-W01-1"}),
+    ("/api/batch/create", [{"description": "task",
+                            "due_date": "20300101"}]),
+    ("/api/batch/create", _task("task", 1)),
+    ("/api/batch/create", [_task("task", 1), "task"]),
+    ("/api/batch/update", [_task("task", 1)]),
+    ("/api/batch/complete", ["1"]),
+    ("/api/batch/delete", [True]),
+    ("/api/batch/delete", [2 ** 63]),
+    ("/api/batch/complete", [-2 ** 63 - 1]),
+])
+def test_api_invalid_requests(_client, path, body):
+    (client, storage) = _client
+
+    response = client.post(path, json=body)
+
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+    assert storage.get_active_tasks() == []
+
+
+def test_api_task_id_out_of_range(_client):
+    (client, _) = _client
+
+    response = client.get("/api/tasks/%d" % 2 ** 64)
+
+    assert response.status_code == 400
+    assert "error" in response.get_json()
@@ -0,0 +1,221 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from worky import archive, server
+from worky.storage import Storage, StorageException, Completed
+from tests.utils import date_utils
+from datetime import datetime, timedelta, UTC
+import os
+import pytest
+import sqlalchemy
+
+
+@pytest.fixture(params=[{}, {"profile": "performance"},
+                        {"denormalize": True}],
+                ids=["default", "performance", "denormalized"])
+def _storage(tmpdir, request):
+    storage = Storage(str(tmpdir.join("stuff.worky")), **request.param)
+
+    yield storage
+
+    storage.close()
+
+
+def _complete_days_ago(storage, task_ids, days):
+    """ completes the tasks as if it happened the given days ago """
+    storage.complete_tasks(task_ids)
+
+    completed_by = datetime.now(UTC).replace(tzinfo=None) - \
+        timedelta(days=days)
+
+    with storage._session_scope() as session:
+        session.execute(sqlalchemy.update(Completed)
+                        .where(Completed.id.in_(task_ids))
+                        .values(completed_by=completed_by))
+
+
+def _create_tasks(storage, count, first=0):
+    return storage.create_tasks([("task %d" % i,
+                                  date_utils.date_from_today(1))
+                                 for i in range(first, first + count)])
+
+
+def test_archive_tasks(_storage):
+    task_ids = _create_tasks(_storage, 6)
+
+    _complete_days_ago(_storage, task_ids[:2], 40)
+    _complete_days_ago(_storage, task_ids[2:4], 10)
+
+    assert not _storage.has_archive()
+    assert _storage.get_archived_tasks() == []
+
+    assert _storage.archive_tasks(30) == 2
+
+    assert _storage.has_archive()
+    assert [task.description for task in _storage.get_archived_tasks()] == \
+        ["task 1", "task 0"]
+    assert [task.task_id for task in _storage.get_archived_tasks()] == \
+        task_ids[1::-1]
+    assert [row.Tasks.id for row in _storage.get_completed_tasks()] == \
+        task_ids[3:1:-1]
+    assert [task.id for task in _storage.get_active_tasks()] == \
+        task_ids[4:]
+    assert [task.id for task in _storage.iter_tasks()] == task_ids[2:]
+
+    """ nothing left to archive """
+    assert _storage.archive_tasks(30) == 0
+
+    assert _storage.archive_tasks(5) == 2
+    assert len(_storage.get_archived_tasks()) == 4
+
+
+def test_archived_task_ids_are_not_reused(_storage):
+    task_ids = _create_tasks(_storage, 2)
+    _complete_days_ago(_storage, task_ids, 40)
+    _storage.archive_tasks(30)
+
+    """ the workfile hands out the archived ids again """
+    new_ids = _create_tasks(_storage, 2, first=2)
+    _complete_days_ago(_storage, new_ids, 40)
+    _storage.archive_tasks(30)
+
+    assert sorted(task.description
+                  for task in _storage.get_archived_tasks()) == \
+        ["task 0", "task 1", "task 2", "task 3"]
+
+
+def test_interrupted_archival_is_completed(_storage, monkeypatch):
+    task_ids = _create_tasks(_storage, 3)
+    _complete_days_ago(_storage, task_ids[:2], 40)
+
+    def interrupt(connection, archived):
+        raise OSError("interrupted")
+
+    """ stop after the tasks were copied to the archive """
+    with monkeypatch.context() as patch:
+        patch.setattr(_storage, "_remove_archived", interrupt)
+
+        with pytest.raises(OSError):
+            _storage.archive_tasks(30)
+
+    assert len(_storage.get_archived_tasks()) == 2
+    assert len(_storage.get_completed_tasks()) == 2
+
+    """ archiving again removes the copied tasks without copying them twice """
+    assert _storage.archive_tasks(30) == 2
+
+    assert [task.task_id for task in _storage.get_archived_tasks()] == \
+        task_ids[1::-1]
+    assert _storage.get_completed_tasks() == []
+    assert [task.id for task in _storage.iter_tasks()] == task_ids[2:]
+
+
+def test_archived_tasks_pagination(_storage):
+    task_ids = _create_tasks(_storage, 5)
+
+    for (days, task_id) in enumerate(task_ids):
+        _complete_days_ago(_storage, [task_id], 40 + days)
+
+    _storage.archive_tasks(30)
+
+    first_page = _storage.get_archived_tasks(limit=2)
+    second_page = _storage.get_archived_tasks(after=first_page[-1].id,
+                                              limit=2)
+
+    assert [task.task_id for task in first_page] == task_ids[:2]
+    assert [task.task_id for task in second_page] == task_ids[2:4]
+    assert [task.id for task in
+            _storage.get_archived_tasks(before=second_page[0].id,
+                                        limit=2)] == \
+        [task.id for task in first_page]
+
+
+def test_invalid_archive_age(_storage):
+    with pytest.raises(StorageException):
+        _storage.archive_tasks(-1)
+
+
+def test_vacuum(tmpdir):
+    db_path = str(tmpdir.join("stuff.worky"))
+    storage = Storage(db_path)
+
+    task_ids = _create_tasks(storage, 3000)
+    _complete_days_ago(storage, task_ids, 40)
+
+    size = os.path.getsize(db_path)
+
+    storage.archive_tasks(30)
+    storage.vacuum()
+
+    assert os.path.getsize(db_path) < size / 2
+
+    storage.close()
+
+
+def test_archive_command(tmpdir, capsys):
+    db_path = str(tmpdir.join("stuff.worky"))
+    storage = Storage(db_path)
+    task_ids = _create_tasks(storage, 3)
+    _complete_days_ago(storage, task_ids[:2], 400)
+    storage.close()
+
+    archive.main([db_path])
+
+    assert "Archived 2 tasks" in capsys.readouterr().err
+
+    storage = Storage(db_path)
+
+    assert len(storage.get_archived_tasks()) == 2
+    assert [task.id for task in storage.iter_tasks()] == task_ids[2:]
+
+    storage.close()
+
+
+def test_archive_command_missing_database(tmpdir):
+    with pytest.raises(SystemExit):
+        archive.main([str(tmpdir.join("missing.worky"))])
+
+
+def test_archived_page(_storage):
+    server.app.config['STORAGE'] = _storage
+    client = server.app.test_client()
+
+    task_ids = _create_tasks(_storage, 3)
+    _complete_days_ago(_storage, task_ids, 40)
+
+    assert "Show Archived" not in client.get("/completed").get_data(
+        as_text=True)
+
+    _storage.archive_tasks(30)
+
+    assert 'href="/archived"' in client.get("/completed").get_data(
+        as_text=True)
+
+    response = client.get("/archived?limit=2")
+    body = response.get_data(as_text=True)
+    archived = _storage.get_archived_tasks()
+
+    assert response.status_code == 200
+    assert "task 2" in body and "task 1" in body and "task 0" not in body
+    assert 'href="/archived?after=%d&amp;limit=2"' % archived[1].id in body
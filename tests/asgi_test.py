@@ -0,0 +1,318 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from worky import asgi, server
+from worky.events import EventBroker
+from worky.storage import Storage
+from tests.utils import date_utils
+from tests.utils.legacy_schema import create_legacy_database
+import asyncio
+import pytest
+
+
+@pytest.fixture
+def _app(tmpdir):
+    storage = Storage(str(tmpdir.join("stuff.worky")))
+    asgi_app = asgi.AsgiApp(asgi.AsyncStorage(storage))
+
+    yield (asgi_app, storage)
+
+    asgi_app.storage.close()
+
+
+async def _request(asgi_app, path, query_string="", headers=()):
+    scope = {
+        "type": "http",
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "root_path": "",
+        "query_string": query_string.encode(),
+        "headers": [(name.encode(), value.encode())
+                    for (name, value) in headers],
+        "server": ("127.0.0.1", 5000),
+    }
+    messages = [{"type": "http.request", "body": b"", "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await asgi_app(scope, receive, send)
+
+    response_headers = {name.decode(): value.decode()
+                        for (name, value) in sent[0]["headers"]}
+    body = b"".join(message.get("body", b"") for message in sent[1:])
+
+    return (sent[0]["status"], response_headers, body.decode())
+
+
+def _get(asgi_app, path, query_string="", headers=()):
+    return asyncio.run(_request(asgi_app, path, query_string, headers))
+
+
+def test_asgi_index(_app):
+    (asgi_app, storage) = _app
+
+    storage.create_task("active task", date_utils.date_from_today(1))
+    storage.create_task("overdue task", date_utils.date_from_today(-1))
+
+    (status, headers, body) = _get(asgi_app, "/")
+
+    assert status == 200
+    assert headers["content-type"].startswith("text/html")
+    assert "active task" in body and "overdue task" in body
+    assert 'href="/updateForm?id=1"' in body
+
+
+def test_asgi_conditional(_app):
+    (asgi_app, storage) = _app
+
+    (status, headers, _) = _get(asgi_app, "/")
+
+    (status, _, body) = _get(asgi_app, "/", headers=[
+        ("If-None-Match", headers["etag"])])
+
+    assert status == 304
+    assert body == ""
+
+
+def test_asgi_task_lifecycle(_app):
+    (asgi_app, storage) = _app
+
+    (status, headers, _) = _get(asgi_app, "/createTask",
+                                "description=new&dueDate=%s"
+                                % date_utils.date_from_today(2))
+
+    assert status == 302
+    assert headers["location"] == "/"
+
+    [task] = storage.get_active_tasks()
+
+    (status, _, body) = _get(asgi_app, "/completeForm", "id=%d" % task.id)
+
+    assert status == 200
+    assert 'action="/completeTask"' in body
+
+    _get(asgi_app, "/completeTask", "id=%d" % task.id)
+
+    (_, _, body) = _get(asgi_app, "/completed")
+
+    assert "new" in body
+    assert storage.get_active_tasks() == []
+
+
+def test_asgi_completed_pagination(_app):
+    (asgi_app, storage) = _app
+
+    for i in range(3):
+        storage.create_task("task %d" % i, date_utils.date_from_today(1))
+
+    for task in storage.get_active_tasks():
+        storage.complete_task(task.id)
+
+    completed = [row.Tasks.id for row in storage.get_completed_tasks()]
+
+    (_, _, body) = _get(asgi_app, "/completed", "limit=2")
+
+    assert 'href="/completed?after=%d&amp;limit=2"' % completed[1] in body
+
+
+def test_asgi_wsgi_fallback(_app):
+    (asgi_app, _) = _app
+
+    (status, headers, body) = _get(asgi_app, "/static/styles/style.css")
+
+    assert status == 200
+    assert headers["content-type"].startswith("text/css")
+    assert "#tasks" in body
+
+
+def test_asgi_not_found(_app):
+    (asgi_app, _) = _app
+
+    (status, _, _) = _get(asgi_app, "/missing")
+
+    assert status == 404
+
+
+@pytest.mark.parametrize("path", ["/deleteTask", "/updateForm",
+                                  "/deleteForm", "/completeForm",
+                                  "/completeTask", "/updateTask"])
+@pytest.mark.parametrize("query_string", ["", "id=abc"])
+def test_asgi_invalid_task_id(_app, path, query_string):
+    (asgi_app, _) = _app
+
+    (status, _, _) = _get(asgi_app, path, query_string)
+
+    assert status == 400
+
+
+@pytest.mark.parametrize("path, query_string, expected_status", [
+    ("/createTask", "", 400),
+    ("/createTask", "description=task&dueDate=bad", 400),
+    ("/updateTask", "id=999&description=&dueDate=2030-01-01", 400),
+    ("/updateTask", "id=999&description=task&dueDate=2030-01-01", 404),
+    ("/updateForm", "id=999", 404),
+    ("/completeForm", "id=999", 404),
+    ("/completeTask", "id=999", 404),
+])
+def test_asgi_invalid_task_request(_app, path, query_string, expected_status):
+    (asgi_app, storage) = _app
+
+    (status, _, _) = _get(asgi_app, path, query_string)
+
+    assert status == expected_status
+    assert storage.get_active_tasks() == []
+
+
+def test_asgi_settings_isolated(_app, tmpdir):
+    (asgi_app, storage) = _app
+
+    other = Storage(str(tmpdir.join("other.worky")))
+    other.create_task("other task", date_utils.date_from_today(1))
+    storage.create_task("served task", date_utils.date_from_today(1))
+
+    config = dict(server.app.config)
+
+    """ as set by a WSGI server running in the same process """
+    server.app.config.update(STORAGE=other, STREAMING=True, EVENTS=True,
+                             EVENTS_PORT=5001)
+
+    try:
+        (_, _, page) = _get(asgi_app, "/")
+        (_, _, search) = _get(asgi_app, "/search", "q=task")
+    finally:
+        server.app.config.clear()
+        server.app.config.update(config)
+        other.close()
+
+    for body in (page, search):
+        assert "served task" in body
+        assert "other task" not in body
+
+    assert ":5001" not in page
+    assert "data-events" not in page
+
+
+def test_asgi_create_app_leaves_config(tmpdir):
+    config = dict(server.app.config)
+
+    asgi_app = asgi.create_app(str(tmpdir.join("stuff.worky")))
+    asgi_app.storage.close()
+
+    assert dict(server.app.config) == config
+
+
+def test_asgi_upgrades_legacy_database(tmpdir):
+    db_path = str(tmpdir.join("legacy.worky"))
+
+    create_legacy_database(db_path,
+                           [(1, "legacy task", date_utils.date_from_today(1))],
+                           [])
+
+    asgi_app = asgi.create_app(db_path)
+
+    try:
+        (status, _, body) = _get(asgi_app, "/search", "q=legacy")
+    finally:
+        asgi_app.storage.close()
+
+    assert status == 200
+    assert "legacy task" in body
+
+
+def test_asgi_concurrent_requests(_app):
+    (asgi_app, storage) = _app
+
+    storage.create_task("task", date_utils.date_from_today(1))
+
+    async def requests():
+        return await asyncio.gather(*[_request(asgi_app, "/")
+                                      for _ in range(8)] +
+                                    [_request(asgi_app, "/completed")
+                                     for _ in range(8)])
+
+    responses = asyncio.run(requests())
+
+    assert all(status == 200 for (status, _, _) in responses)
+    assert all("TODO" in body for (_, _, body) in responses[:8])
+    assert all("Completed Tasks" in body for (_, _, body) in responses[8:])
+
+
+def test_asgi_event_stream(tmpdir):
+    broker = EventBroker()
+    storage = Storage(str(tmpdir.join("stuff.worky")),
+                      events=broker.publisher(""))
+    asgi_app = asgi.AsgiApp(asgi.AsyncStorage(storage), broker)
+
+    scope = {"type": "http", "method": "GET", "path": "/events",
+             "root_path": "", "query_string": b"", "headers": []}
+    sent = []
+
+    async def stream():
+        received = asyncio.Event()
+        disconnect = asyncio.Event()
+        messages = [{"type": "http.request", "body": b"",
+                     "more_body": False}]
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+
+            await disconnect.wait()
+
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+            received.set()
+
+            if len(sent) == 3:
+                disconnect.set()
+
+        serving = asyncio.ensure_future(asgi_app(scope, receive, send))
+
+        """ the response start and the hello event """
+        while len(sent) < 2:
+            received.clear()
+            await received.wait()
+
+        await asgi_app.storage.create_task("task",
+                                           date_utils.date_from_today(1))
+
+        await asyncio.wait_for(serving, 30)
+
+    asyncio.run(stream())
+
+    assert sent[0]["status"] == 200
+    assert b"event: hello" in sent[1]["body"]
+    assert sent[2]["body"].startswith(b"event: created\ndata: [{")
+    assert broker.subscriber_count("") == 0
+
+    asgi_app.storage.close()
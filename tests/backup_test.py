@@ -0,0 +1,181 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from worky import backup
+from worky.backup import BackupException, PeriodicBackup
+from worky.storage import Storage, StorageException
+from worky.workspace import Workspace
+from tests.utils import date_utils
+from threading import Event, Thread
+import logging
+import pytest
+
+
+@pytest.fixture(params=["default", "performance"])
+def _storage(tmpdir, request):
+    storage = Storage(str(tmpdir.join("stuff.worky")), profile=request.param)
+
+    storage.create_tasks([("task %d" % i, date_utils.date_from_today(1))
+                          for i in range(2000)])
+
+    yield storage
+
+    storage.close()
+
+
+def _descriptions(db_path):
+    storage = Storage(db_path)
+    descriptions = [task.description for task in storage.iter_tasks()]
+    storage.close()
+
+    return descriptions
+
+
+def test_backup(_storage, tmpdir):
+    target = tmpdir.join("copy.worky")
+    target.write("previous backup")
+
+    (pages, seconds) = _storage.backup(str(target), step_pages=4)
+
+    assert pages > 4
+    assert seconds >= 0
+    assert _descriptions(str(target)) == \
+        [task.description for task in _storage.iter_tasks()]
+    assert [path.basename for path in tmpdir.listdir()
+            if path.ext == ".tmp"] == []
+
+
+def test_backup_during_writes(_storage, tmpdir):
+    stop = Event()
+
+    def write():
+        while not stop.is_set():
+            _storage.create_task("concurrent", date_utils.date_from_today(1))
+
+    writer = Thread(target=write)
+    writer.start()
+
+    try:
+        _storage.backup(str(tmpdir.join("copy.worky")), step_pages=8,
+                        step_sleep=0.001)
+    finally:
+        stop.set()
+        writer.join()
+
+    descriptions = _descriptions(str(tmpdir.join("copy.worky")))
+
+    """ a consistent snapshot: all the initial tasks, in order """
+    assert descriptions[:2000] == ["task %d" % i for i in range(2000)]
+    assert set(descriptions[2000:]) <= {"concurrent"}
+
+
+def test_backup_failure(_storage, tmpdir):
+    with pytest.raises(StorageException):
+        _storage.backup(str(tmpdir.join("missing", "copy.worky")))
+
+
+def test_periodic_backup(_storage, tmpdir):
+    backups = tmpdir.join("backups")
+    backups.mkdir()
+
+    for old in ["stuff_20000101_000000.worky", "stuff_20000102_000000.worky",
+                "other_20000101_000000.worky", "stuff_old.worky"]:
+        backups.join(old).write("")
+
+    periodic = PeriodicBackup.of_storage(_storage, "stuff", str(backups), 60,
+                                         keep=2)
+
+    [written] = periodic.backup_all()
+
+    assert _descriptions(str(written))[0] == "task 0"
+
+    """ nothing changed since the last backup """
+    assert periodic.backup_all() == []
+
+    assert sorted(path.basename for path in backups.listdir()) == \
+        ["other_20000101_000000.worky", "stuff_20000102_000000.worky",
+         written.name, "stuff_old.worky"]
+
+
+def test_periodic_workspace_backup(tmpdir):
+    workfiles = tmpdir.mkdir("workfiles")
+
+    for name in ["alpha", "beta"]:
+        Storage(str(workfiles.join("%s.worky" % name))).close()
+
+    workspace = Workspace(str(workfiles))
+    periodic = PeriodicBackup.of_workspace(workspace, str(tmpdir.join("bk")),
+                                           60)
+
+    backups = periodic.backup_all()
+
+    assert sorted(path.name.split("_")[0] for path in backups) == \
+        ["alpha", "beta"]
+
+    workspace.close()
+
+
+def test_periodic_backup_removed_workfile(tmpdir, caplog):
+    workfiles = tmpdir.mkdir("workfiles")
+
+    for name in ["alpha", "beta"]:
+        Storage(str(workfiles.join("%s.worky" % name))).close()
+
+    workspace = Workspace(str(workfiles))
+
+    """ a workfile removed after the workfiles were listed """
+    periodic = PeriodicBackup(lambda: [(name, workspace.storage(name))
+                                       for name in ["alpha", "gone", "beta"]],
+                              str(tmpdir.join("bk")), 60)
+
+    with caplog.at_level(logging.INFO, logger="worky.backup"):
+        backups = periodic.backup_all()
+
+    assert sorted(path.name.split("_")[0] for path in backups) == \
+        ["alpha", "beta"]
+    assert [record.levelno for record in caplog.records] == \
+        [logging.INFO, logging.ERROR, logging.INFO]
+    assert "Backup of gone failed" in caplog.records[1].getMessage()
+
+    workspace.close()
+
+
+def test_periodic_backup_invalid_arguments(_storage, tmpdir):
+    with pytest.raises(BackupException):
+        PeriodicBackup.of_storage(_storage, "stuff", str(tmpdir), 0)
+
+    with pytest.raises(BackupException):
+        PeriodicBackup.of_storage(_storage, "stuff", str(tmpdir), 60, keep=0)
+
+
+def test_backup_command(_storage, tmpdir, capsys):
+    target = str(tmpdir.join("copy.worky"))
+
+    backup.main([_storage._engine.url.database, target])
+
+    assert "pages in" in capsys.readouterr().err
+    assert len(_descriptions(target)) == 2000
+
+    with pytest.raises(SystemExit):
+        backup.main([str(tmpdir.join("missing.worky")), target])
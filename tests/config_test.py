@@ -0,0 +1,81 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from worky.config import ConfigException, read_config
+from worky.config import validate_server_settings
+import pytest
+
+
+def test_read_config(tmpdir):
+    config = tmpdir.join("worky.ini")
+    config.write("[server]\n"
+                 "host = 0.0.0.0\n"
+                 "port = 8080\n"
+                 "threads = 16\n"
+                 "connection-limit = 500\n"
+                 "backlog = 2048\n"
+                 "channel_timeout = 60\n")
+
+    assert read_config(str(config)) == {
+        "host": "0.0.0.0",
+        "port": 8080,
+        "threads": 16,
+        "connection_limit": 500,
+        "backlog": 2048,
+        "channel_timeout": 60,
+    }
+
+
+def test_read_config_without_server_section(tmpdir):
+    config = tmpdir.join("worky.ini")
+    config.write("[other]\nthreads = 16\n")
+
+    assert read_config(str(config)) == {}
+
+
+@pytest.mark.parametrize("content", [
+    "[server]\nthreds = 16\n",
+    "[server]\nthreads = many\n",
+    "threads = 16\n",
+])
+def test_read_invalid_config(tmpdir, content):
+    config = tmpdir.join("worky.ini")
+    config.write(content)
+
+    with pytest.raises(ConfigException):
+        read_config(str(config))
+
+
+def test_read_missing_config(tmpdir):
+    with pytest.raises(ConfigException):
+        read_config(str(tmpdir.join("missing.ini")))
+
+
+def test_validate_server_settings():
+    validate_server_settings(1, 1, 1, 1)
+
+    for settings in [(0, 100, 1024, 120), (4, 0, 1024, 120),
+                     (4, 100, -1, 120), (4, 100, 1024, 0)]:
+        with pytest.raises(ConfigException):
+            validate_server_settings(*settings)
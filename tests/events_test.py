@@ -0,0 +1,257 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from worky import events, server
+from worky.events import EventBroker, EventServer, format_event
+from worky.events import stream_events, events_topic
+from worky.storage import Storage, MAX_EVENT_TASKS
+from tests.utils import date_utils
+import asyncio
+import pytest
+import socket
+
+
+@pytest.fixture
+def _storage(tmpdir):
+    published = []
+    storage = Storage(str(tmpdir.join("stuff.worky")),
+                      events=lambda event, data: published.append(
+                          (event, data)))
+
+    yield (storage, published)
+
+    storage.close()
+
+
+def test_broker():
+    broker = EventBroker()
+    received = []
+
+    def failing(message):
+        raise RuntimeError("subscriber failure")
+
+    broker.subscribe("stuff", failing)
+    broker.subscribe("stuff", received.append)
+    broker.subscribe("other", received.append)
+
+    broker.publisher("stuff")("created", [{"id": 1}])
+
+    assert received == [b'event: created\ndata: [{"id":1}]\n\n']
+    assert broker.subscriber_count("stuff") == 2
+
+    broker.unsubscribe("stuff", received.append)
+    broker.unsubscribe("stuff", failing)
+    broker.publish("stuff", "deleted", [])
+
+    assert len(received) == 1
+    assert broker.subscriber_count("stuff") == 0
+
+
+def test_storage_events(_storage):
+    (storage, published) = _storage
+    due_date = date_utils.date_from_today(1)
+
+    task_id = storage.create_task("task", due_date)
+
+    ((event, [task]),) = published
+
+    assert event == "created"
+    assert task["id"] == task_id
+    assert task["description"] == "task"
+    assert task["due_date"] == due_date
+    assert task["created_date"] == task["last_updated"]
+
+    storage.update_task(task_id, "updated task", due_date)
+    storage.complete_task(task_id)
+    storage.delete_task(task_id)
+
+    assert [event for (event, _) in published] == \
+        ["created", "updated", "completed", "deleted"]
+    assert published[1][1][0]["description"] == "updated task"
+    assert published[2][1] == [{"id": task_id}]
+    assert published[3][1] == [{"id": task_id}]
+
+
+def test_storage_reload_events(_storage):
+    (storage, published) = _storage
+
+    storage.create_tasks([("task %d" % i, date_utils.date_from_today(1))
+                          for i in range(MAX_EVENT_TASKS + 1)])
+
+    assert published == [("reload", [])]
+
+    storage.import_tasks(task._asdict() for task in storage.iter_tasks())
+
+    assert published == [("reload", [])] * 2
+
+
+def _messages(broker, topic, published, count, **kwargs):
+    async def read():
+        messages = []
+
+        async for message in stream_events(broker, topic, **kwargs):
+            messages.append(message)
+
+            if len(messages) == 1:
+                for (event, data) in published:
+                    broker.publish(topic, event, data)
+
+            if len(messages) == count:
+                break
+
+        return messages
+
+    return asyncio.run(read())
+
+
+def test_stream_events():
+    broker = EventBroker()
+
+    messages = _messages(broker, "", [("deleted", [{"id": 1}])], 3,
+                         heartbeat=0.01)
+
+    assert messages[0].endswith(format_event("hello", {}))
+    assert messages[1] == format_event("deleted", [{"id": 1}])
+    assert messages[2] == events.HEARTBEAT
+    assert broker.subscriber_count("") == 0
+
+
+def test_stream_ends_when_client_falls_behind():
+    broker = EventBroker()
+
+    """ published at once, while the stream is not read """
+    messages = _messages(broker, "", [("deleted", [])] * 3, 10,
+                         queue_size=2)
+
+    assert len(messages) == 1
+
+
+def test_events_topic():
+    assert events_topic("/events") == ""
+    assert events_topic("/w/stuff/events") == "stuff"
+    assert events_topic("/w/../events") is None
+    assert events_topic("/other") is None
+
+
+@pytest.fixture
+def _event_server():
+    broker = EventBroker()
+    event_server = EventServer(broker, "127.0.0.1", 0, 5000)
+    event_server.start()
+
+    yield (event_server, broker)
+
+    event_server.stop()
+
+
+def _connect(event_server, path, headers=""):
+    connection = socket.create_connection(("127.0.0.1", event_server.port),
+                                          timeout=5)
+    connection.sendall(("GET %s HTTP/1.1\r\n%s\r\n" % (path, headers))
+                       .encode())
+
+    return connection
+
+
+def _read_until(connection, end):
+    data = b""
+
+    while not data.endswith(end):
+        data += connection.recv(4096)
+
+    return data
+
+
+def test_event_server(_event_server):
+    (event_server, broker) = _event_server
+
+    connection = _connect(event_server, "/w/stuff/events",
+                          "Host: localhost:%d\r\n"
+                          "Origin: http://localhost:5000\r\n"
+                          % event_server.port)
+
+    head = _read_until(connection, b"event: hello\ndata: {}\n\n")
+
+    assert head.startswith(b"HTTP/1.1 200 OK\r\n")
+    assert b"Content-Type: text/event-stream\r\n" in head
+    assert b"Access-Control-Allow-Origin: http://localhost:5000\r\n" in head
+
+    broker.publish("stuff", "completed", [{"id": 3}])
+
+    message = _read_until(connection, b"\n\n")
+
+    assert message == b'event: completed\ndata: [{"id":3}]\n\n'
+
+    connection.close()
+
+
+def test_event_server_other_origin(_event_server):
+    (event_server, broker) = _event_server
+
+    connection = _connect(event_server, "/events",
+                          "Host: localhost:%d\r\n"
+                          "Origin: http://example.com:5000\r\n"
+                          % event_server.port)
+
+    head = _read_until(connection, b"event: hello\ndata: {}\n\n")
+
+    assert b"Access-Control-Allow-Origin" not in head
+
+    connection.close()
+
+
+def test_event_server_not_found(_event_server):
+    (event_server, _) = _event_server
+
+    connection = _connect(event_server, "/index")
+
+    assert _read_until(connection, b"\r\n\r\n").startswith(
+        b"HTTP/1.1 404 Not Found\r\n")
+
+    connection.close()
+
+
+def test_index_events_script(tmpdir):
+    storage = Storage(str(tmpdir.join("stuff.worky")))
+    task_id = storage.create_task("task", date_utils.date_from_today(1))
+
+    server.app.config['STORAGE'] = storage
+    client = server.app.test_client()
+
+    body = client.get("/").get_data(as_text=True)
+
+    assert '<tr id="task-%d"' % task_id in body
+    assert "live.js" not in body
+
+    server.app.config['EVENTS'] = True
+    server.app.config['EVENTS_PORT'] = 5001
+
+    try:
+        body = client.get("/").get_data(as_text=True)
+    finally:
+        server.app.config['EVENTS'] = False
+
+    assert 'data-events="//localhost:5001/events"' in body
+
+    storage.close()
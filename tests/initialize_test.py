@@ -22,7 +22,8 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-from worky.storage import Storage, StorageException
+from worky.storage import Storage, StorageException, POOLED_CACHE_SIZE
+from worky.profiles import POOL_OVERFLOW
 import pytest
 import os
 
@@ -80,3 +81,55 @@ def test_db_in_dir(tmpdir):
     assert os.path.isfile(db_path)
 
     os.remove(db_path)
+
+
+def test_negative_pool_size(tmpdir):
+    db_path = str(tmpdir.join("stuff.worky"))
+
+    with pytest.raises(StorageException):
+        Storage(db_path, pool_size=-1)
+
+
+def test_pooled_connections_are_reused(tmpdir):
+    db_path = str(tmpdir.join("stuff.worky"))
+
+    storage = Storage(db_path, pool_size=2)
+
+    connections = set()
+
+    for _ in range(5):
+        with storage._engine.connect() as connection:
+            dbapi_connection = connection.connection.dbapi_connection
+            connections.add(id(dbapi_connection))
+
+            cache_size = connection.exec_driver_sql("PRAGMA cache_size")
+
+            assert cache_size.scalar() == POOLED_CACHE_SIZE
+
+    assert len(connections) == 1
+
+    storage.close()
+
+
+def test_unknown_profile(tmpdir):
+    db_path = str(tmpdir.join("stuff.worky"))
+
+    with pytest.raises(StorageException):
+        Storage(db_path, profile="turbo")
+
+
+def test_pool_overflow(tmpdir):
+    db_path = str(tmpdir.join("stuff.worky"))
+
+    storage = Storage(db_path, pool_size=1, cache=False)
+
+    """ such as held by a backup, while a request needs one more """
+    connections = [storage._engine.connect() for _ in range(POOL_OVERFLOW)]
+
+    try:
+        assert storage.get_active_tasks() == []
+    finally:
+        for connection in connections:
+            connection.close()
+
+    storage.close()
@@ -0,0 +1,156 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from worky import server
+from worky.metrics import Histogram, Metrics, MetricsException, CONTENT_TYPE
+from worky.storage import Storage
+from tests.utils import date_utils
+import pytest
+
+
+@pytest.fixture
+def _metrics(tmpdir):
+    db_path = str(tmpdir.join("stuff.worky"))
+
+    metrics = Metrics(slow_request=1000)
+    storage = Storage(db_path, metrics=metrics)
+
+    server.app.config['STORAGE'] = storage
+    server.app.config['METRICS'] = metrics
+    server.app.config['METRICS_ENDPOINT'] = True
+
+    yield (server.app.test_client(), storage, metrics)
+
+    server.app.config['METRICS'] = None
+    server.app.config['METRICS_ENDPOINT'] = False
+    server.app.config['STREAMING'] = False
+
+    storage.close()
+
+
+def _sample(exposition, sample):
+    """ value of a sample of the exposition """
+    for line in exposition.splitlines():
+        if line.startswith(sample + " "):
+            return float(line.split(" ")[-1])
+
+    return None
+
+
+def test_histogram_exposition():
+    histogram = Histogram("test_seconds", "Test durations", ("route",),
+                          (0.1, 1))
+
+    histogram.observe(("/",), 0.05)
+    histogram.observe(("/",), 0.1)
+    histogram.observe(("/",), 5)
+
+    assert histogram.expose() == [
+        "# HELP test_seconds Test durations",
+        "# TYPE test_seconds histogram",
+        "test_seconds_bucket{route=\"/\",le=\"0.1\"} 2",
+        "test_seconds_bucket{route=\"/\",le=\"1.0\"} 2",
+        "test_seconds_bucket{route=\"/\",le=\"+Inf\"} 3",
+        "test_seconds_sum{route=\"/\"} 5.15",
+        "test_seconds_count{route=\"/\"} 3"]
+
+
+def test_request_metrics(_metrics):
+    (client, storage, metrics) = _metrics
+
+    inserts = metrics.query_duration.count(("INSERT",))
+
+    for i in range(3):
+        storage.create_task("task %d" % i, date_utils.date_from_today(1))
+
+    assert metrics.query_duration.count(("INSERT",)) == inserts + 3
+    assert client.get("/").status_code == 200
+    assert client.get("/missing").status_code == 404
+
+    response = client.get("/metrics")
+    exposition = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == CONTENT_TYPE
+
+    assert metrics.requests.count(("/", "GET", "200")) == 1
+    assert metrics.requests.count(("unmatched", "GET", "404")) == 1
+    assert _sample(exposition, "worky_request_queries_sum{route=\"/\"}") >= 1
+    assert _sample(exposition, "worky_request_rows_sum{route=\"/\"}") == 3
+    assert _sample(exposition,
+                   "worky_request_render_seconds_sum{route=\"/\"}") > 0
+
+
+def test_streamed_request_metrics(_metrics):
+    (client, storage, metrics) = _metrics
+
+    server.app.config['STREAMING'] = True
+
+    for i in range(3):
+        storage.create_task("task %d" % i, date_utils.date_from_today(1))
+
+    response = client.get("/")
+    response.get_data()
+    response.close()
+
+    exposition = metrics.expose()
+
+    """ the rows are fetched while the page is sent """
+    assert _sample(exposition, "worky_request_rows_sum{route=\"/\"}") == 3
+    assert _sample(exposition,
+                   "worky_request_render_seconds_sum{route=\"/\"}") > 0
+
+
+def test_metrics_endpoint_disabled(_metrics):
+    (client, _, metrics) = _metrics
+
+    server.app.config['METRICS_ENDPOINT'] = False
+
+    assert client.get("/metrics").status_code == 404
+    assert client.get("/").status_code == 200
+
+    """ the requests are still measured for the slow request log """
+    assert metrics.requests.count(("/", "GET", "200")) == 1
+
+
+def test_slow_request_log(tmpdir, caplog):
+    storage = Storage(str(tmpdir.join("stuff.worky")))
+    metrics = Metrics(slow_request=0.001)
+
+    server.app.config['STORAGE'] = storage
+    server.app.config['METRICS'] = metrics
+
+    try:
+        server.app.test_client().get("/completed?limit=2")
+    finally:
+        server.app.config['METRICS'] = None
+        storage.close()
+
+    assert "Slow request GET /completed?limit=2" in caplog.text
+    assert caplog.records[-1].levelname == "WARNING"
+
+
+def test_invalid_slow_request_threshold():
+    with pytest.raises(MetricsException):
+        Metrics(slow_request=0)
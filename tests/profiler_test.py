@@ -0,0 +1,118 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from worky import server
+from worky.profiler import RequestProfiler, PROFILE_SUFFIX
+from worky.storage import Storage
+from tests.utils import date_utils
+from threading import Thread
+import pstats
+import pytest
+
+
+@pytest.fixture
+def _profiled(tmpdir):
+    storage = Storage(str(tmpdir.join("stuff.worky")))
+    profiler = RequestProfiler(str(tmpdir.join("profiles")))
+
+    server.app.config['STORAGE'] = storage
+    server.app.config['PROFILER'] = profiler
+
+    yield (server.app.test_client(), storage, profiler)
+
+    server.app.config['PROFILER'] = None
+
+    storage.close()
+
+
+def test_profiles_by_route(_profiled):
+    (client, storage, profiler) = _profiled
+
+    storage.create_task("task", date_utils.date_from_today(1))
+
+    client.get("/")
+    client.get("/")
+    client.get("/completed")
+
+    routes = {name: requests for (name, requests, _) in profiler.routes()}
+
+    assert routes == {"index": 2, "completed": 1}
+
+    """ the dumps are readable with pstats """
+    dump = profiler.directory / ("index" + PROFILE_SUFFIX)
+    functions = pstats.Stats(str(dump)).stats
+
+    assert any(name == "get_index_view" for (_, _, name) in functions)
+
+
+def test_profiles_page(_profiled):
+    (client, _, _) = _profiled
+
+    body = client.get("/debug/profiles").get_data(as_text=True)
+
+    assert "No request profiled yet!" in body
+
+    client.get("/completed")
+
+    body = client.get("/debug/profiles").get_data(as_text=True)
+
+    assert 'href="/debug/profiles?route=completed"' in body
+
+    response = client.get("/debug/profiles?route=completed")
+    body = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert "get_completed_tasks" in body
+
+    assert client.get("/debug/profiles?route=search").status_code == 404
+
+
+def test_profiles_page_disabled(tmpdir):
+    assert server.app.config.get('PROFILER') is None
+    assert server.app.test_client().get("/debug/profiles").status_code == 404
+
+
+def test_concurrent_request_not_profiled(_profiled):
+    (client, _, profiler) = _profiled
+
+    profile = profiler.start("index")
+
+    other = Thread(target=lambda: client.get("/completed").close())
+    other.start()
+
+    """ the other request waits for the profiled one """
+    other.join(0.5)
+
+    assert other.is_alive()
+
+    profiler.finish(profile, "index")
+
+    other.join()
+
+    functions = profiler.functions("index", limit=None)
+
+    assert not any("get_completed_tasks" in location
+                   for (location, _, _, _) in functions)
+    assert any("get_completed_tasks" in location
+               for (location, _, _, _) in profiler.functions("completed"))
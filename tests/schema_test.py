@@ -0,0 +1,402 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from worky import backup, transfer
+from worky.storage import Storage, StorageException, Tasks
+from tests.utils.legacy_schema import create_legacy_database
+from tests.utils import date_utils
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.engine import Engine
+import logging
+import pytest
+import sqlalchemy
+import sqlite3
+
+
+@pytest.fixture
+def _setup(tmpdir):
+    db_path = str(tmpdir.join("stuff.worky"))
+
+    storage = Storage(db_path)
+
+    yield storage
+
+    storage.close()
+
+
+def _query_plan(storage, query):
+    sql = query.statement.compile(dialect=sqlite.dialect(),
+                                  compile_kwargs={"literal_binds": True})
+
+    with storage._engine.connect() as connection:
+        plan = connection.exec_driver_sql("EXPLAIN QUERY PLAN %s" % sql)
+
+        return [row[3] for row in plan]
+
+
+def _indexes(db_path):
+    connection = sqlite3.connect(db_path)
+
+    indexes = connection.execute("SELECT name FROM sqlite_master WHERE "
+                                 "type = 'index' AND name LIKE 'ix_%'")
+    indexes = sorted(row[0] for row in indexes)
+
+    connection.close()
+
+    return indexes
+
+
+def test_active_tasks_use_due_date_index(_setup):
+    storage = _setup
+
+    with storage._session_scope() as session:
+        query = storage._get_incomplete_tasks(session)
+        query = query.filter(Tasks.due_date >= storage._today())
+
+        plan = _query_plan(storage, query)
+
+    assert plan[0].startswith("SEARCH tasks USING INDEX ix_tasks_due_date")
+    assert not any("TEMP B-TREE" in step for step in plan)
+
+
+def test_incomplete_tasks_sorted_by_index(_setup):
+    storage = _setup
+
+    with storage._session_scope() as session:
+        plan = _query_plan(storage, storage._get_incomplete_tasks(session))
+
+    assert plan[0] == "SCAN tasks USING INDEX ix_tasks_due_date"
+    assert not any("TEMP B-TREE" in step for step in plan)
+
+
+def test_completed_tasks_sorted_by_index(_setup):
+    storage = _setup
+
+    with storage._session_scope() as session:
+        plan = _query_plan(storage,
+                           storage._get_completed_tasks_query(session))
+
+    assert "ix_completed_completed_by" in plan[0]
+    assert not any("TEMP B-TREE" in step for step in plan)
+
+
+def test_completed_tasks_page_seeks_index(_setup):
+    storage = _setup
+
+    with storage._session_scope() as session:
+        query = storage._get_completed_tasks_query(session, after=1)
+
+        plan = _query_plan(storage, query.limit(10))
+
+    assert plan[0].startswith("SEARCH completed USING COVERING INDEX "
+                              "ix_completed_completed_by")
+    assert not any("TEMP B-TREE" in step for step in plan)
+
+
+def test_legacy_database_upgrade(tmpdir, caplog):
+    db_path = str(tmpdir.join("legacy.worky"))
+
+    create_legacy_database(db_path,
+                           [(1, "active", date_utils.date_from_today(1)),
+                            (2, "overdue", date_utils.date_from_today(-1)),
+                            (3, "completed", date_utils.date_from_today(1))],
+                           [3])
+
+    assert _indexes(db_path) == []
+
+    with caplog.at_level(logging.WARNING, logger="worky.storage"):
+        storage = Storage(db_path, upgrade=True)
+
+    """ the one-way upgrade to the full-text index is logged """
+    assert [record.getMessage() for record in caplog.records] == [
+        "Building the full-text search index of %s: older versions of "
+        "worky will no longer open it" % db_path]
+
+    assert _indexes(db_path) == ["ix_completed_completed_by",
+                                 "ix_tasks_due_date"]
+
+    (overdue_tasks, active_tasks) = storage.get_index_view()
+
+    assert [t.description for t in overdue_tasks] == ["overdue"]
+    assert [t.description for t in active_tasks] == ["active"]
+    assert len(storage.get_completed_tasks()) == 1
+
+    """ the existing tasks are added to the full-text index """
+    assert [task.description
+            for (task, _) in storage.search_tasks("overdue")] == ["overdue"]
+
+    storage.close()
+
+    caplog.clear()
+
+    """ an upgraded database is accepted as is """
+    with caplog.at_level(logging.WARNING, logger="worky.storage"):
+        Storage(db_path).close()
+
+    assert caplog.records == []
+
+
+def _user_version(db_path):
+    connection = sqlite3.connect(db_path)
+
+    try:
+        return connection.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        connection.close()
+
+
+def _has_search_index(db_path):
+    connection = sqlite3.connect(db_path)
+
+    try:
+        return connection.execute("SELECT name FROM sqlite_master WHERE "
+                                  "name = 'tasks_search'").fetchone() \
+            is not None
+    finally:
+        connection.close()
+
+
+def test_legacy_database_opened_as_is(tmpdir):
+    db_path = str(tmpdir.join("legacy.worky"))
+    copy_path = str(tmpdir.join("copy.worky"))
+
+    create_legacy_database(db_path,
+                           [(1, "active", date_utils.date_from_today(1))],
+                           [])
+
+    """ the commands other than serving do not upgrade the workfile """
+    transfer.main("export", [db_path, str(tmpdir.join("tasks.csv"))])
+    backup.main([db_path, copy_path])
+
+    storage = Storage(db_path)
+
+    assert len(storage.get_active_tasks()) == 1
+
+    storage.close()
+
+    for path in (db_path, copy_path):
+        assert _indexes(path) == []
+        assert _user_version(path) == 0
+        assert not _has_search_index(path)
+
+    """ serving upgrades it """
+    storage = Storage(db_path, upgrade=True)
+
+    assert [task.description
+            for (task, _) in storage.search_tasks("active")] == ["active"]
+
+    storage.close()
+
+    assert _indexes(db_path) == ["ix_completed_completed_by",
+                                 "ix_tasks_due_date"]
+    assert _user_version(db_path) != 0
+
+
+def _task_states(db_path):
+    connection = sqlite3.connect(db_path)
+
+    states = connection.execute("SELECT id, status, completed_by IS NOT NULL "
+                                "FROM tasks ORDER BY id").fetchall()
+
+    connection.close()
+
+    return states
+
+
+def test_denormalize_legacy_database(tmpdir):
+    db_path = str(tmpdir.join("legacy.worky"))
+
+    create_legacy_database(db_path,
+                           [(1, "active", date_utils.date_from_today(1)),
+                            (2, "overdue", date_utils.date_from_today(-1)),
+                            (3, "completed", date_utils.date_from_today(1))],
+                           [3])
+
+    storage = Storage(db_path, denormalize=True)
+
+    assert _task_states(db_path) == [(1, 0, 0), (2, 0, 0), (3, 1, 1)]
+    assert "ix_tasks_open_due_date" in _indexes(db_path)
+
+    (overdue_tasks, active_tasks) = storage.get_index_view()
+
+    assert [t.description for t in overdue_tasks] == ["overdue"]
+    assert [t.description for t in active_tasks] == ["active"]
+    assert len(storage.get_completed_tasks()) == 1
+
+    storage.close()
+
+
+def test_denormalized_layout_consistency(tmpdir):
+    db_path = str(tmpdir.join("stuff.worky"))
+
+    storage = Storage(db_path, denormalize=True)
+
+    storage.create_task("first", date_utils.date_from_today(1))
+    storage.create_task("second", date_utils.date_from_today(2))
+
+    (first, second) = storage.get_active_tasks()
+
+    storage.complete_task(first.id)
+
+    assert _task_states(db_path) == [(first.id, 1, 1), (second.id, 0, 0)]
+    assert [t.id for t in storage.get_active_tasks()] == [second.id]
+    assert storage.get_completed_tasks()[0][0].id == first.id
+
+    storage.delete_task(first.id)
+
+    assert storage.get_completed_tasks() == []
+
+    storage.close()
+
+    """ the layout is detected when the database is opened again """
+    storage = Storage(db_path)
+
+    assert [t.id for t in storage.get_active_tasks()] == [second.id]
+
+    storage.close()
+
+
+def test_open_tasks_use_partial_index(tmpdir):
+    db_path = str(tmpdir.join("stuff.worky"))
+
+    storage = Storage(db_path, denormalize=True)
+
+    with storage._session_scope() as session:
+        plan = _query_plan(storage, storage._get_incomplete_tasks(session))
+
+    assert plan == ["SCAN tasks USING INDEX ix_tasks_open_due_date"]
+
+    storage.close()
+
+
+def _count_statements(open_storage):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sqlalchemy.event.listen(Engine, "before_cursor_execute", count)
+
+    try:
+        open_storage().close()
+    finally:
+        sqlalchemy.event.remove(Engine, "before_cursor_execute", count)
+
+    return statements
+
+
+def test_fast_schema_validation(tmpdir):
+    db_path = str(tmpdir.join("stuff.worky"))
+
+    Storage(db_path).close()
+
+    statements = _count_statements(lambda: Storage(db_path))
+
+    """ a single query reads the schema, plus the checkpoint on close """
+    assert len(statements) == 2
+    assert "sqlite_master" in statements[0]
+
+
+def test_schema_change_is_validated(tmpdir):
+    db_path = str(tmpdir.join("stuff.worky"))
+
+    Storage(db_path).close()
+
+    connection = sqlite3.connect(db_path)
+    connection.execute("DROP INDEX ix_tasks_due_date")
+    connection.close()
+
+    statements = _count_statements(lambda: Storage(db_path, upgrade=True))
+
+    assert len(statements) > 2
+    assert "ix_tasks_due_date" in _indexes(db_path)
+
+    statements = _count_statements(lambda: Storage(db_path))
+
+    assert len(statements) == 2
+
+
+def test_fingerprint_rewritten_after_denormalize(tmpdir):
+    db_path = str(tmpdir.join("stuff.worky"))
+
+    Storage(db_path).close()
+    Storage(db_path, denormalize=True).close()
+
+    statements = _count_statements(lambda: Storage(db_path))
+
+    assert len(statements) == 2
+
+    storage = Storage(db_path)
+
+    assert storage._denormalized
+
+    storage.close()
+
+
+def test_invalid_schema_with_stale_fingerprint(tmpdir):
+    db_path = str(tmpdir.join("stuff.worky"))
+
+    Storage(db_path).close()
+
+    connection = sqlite3.connect(db_path)
+    connection.execute("ALTER TABLE tasks ADD COLUMN priority INTEGER")
+    connection.close()
+
+    with pytest.raises(StorageException):
+        Storage(db_path)
+
+
+def test_search_uses_full_text_index(_setup):
+    storage = _setup
+
+    with storage._engine.connect() as connection:
+        plan = connection.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT rowid FROM tasks_search WHERE "
+            "tasks_search MATCH '\"report\"*' ORDER BY rank")
+
+        plan = [row[3] for row in plan]
+
+    assert plan[0].startswith("SCAN tasks_search VIRTUAL TABLE INDEX")
+
+
+def test_validation_ignores_full_text_index(tmpdir, caplog):
+    db_path = str(tmpdir.join("stuff.worky"))
+
+    with caplog.at_level(logging.WARNING, logger="worky.storage"):
+        Storage(db_path).close()
+
+    """ a new database gets its full-text index without warning """
+    assert caplog.records == []
+
+    """ forget the fingerprint, so that the schema is validated again """
+    connection = sqlite3.connect(db_path)
+    connection.execute("PRAGMA user_version = 0")
+    connection.close()
+
+    storage = Storage(db_path)
+    storage.create_task("report", date_utils.date_from_today(1))
+
+    assert len(storage.search_tasks("report")) == 1
+
+    storage.close()
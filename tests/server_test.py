@@ -0,0 +1,312 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from worky import server
+from worky.storage import Storage
+from tests.utils import date_utils
+import logging
+import pytest
+import sqlite3
+
+
+@pytest.fixture
+def _client(tmpdir):
+    db_path = str(tmpdir.join("stuff.worky"))
+
+    storage = Storage(db_path)
+    server.app.config['STORAGE'] = storage
+
+    yield (server.app.test_client(), storage)
+
+    storage.close()
+
+
+def _complete_tasks(storage, count):
+    for i in range(count):
+        storage.create_task("task %d" % i, date_utils.date_from_today(1))
+
+    for task in storage.get_active_tasks():
+        storage.complete_task(task.id)
+
+    return [row.Tasks.id for row in storage.get_completed_tasks()]
+
+
+def test_completed_pagination(_client):
+    (client, storage) = _client
+
+    completed = _complete_tasks(storage, 5)
+
+    response = client.get("/completed?limit=2")
+    body = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert 'href="/completed?after=%d&amp;limit=2"' % completed[1] in body
+    assert "/completed?before=" not in body
+
+    response = client.get("/completed?after=%d&limit=2" % completed[1])
+    body = response.get_data(as_text=True)
+
+    assert 'href="/completed?after=%d&amp;limit=2"' % completed[3] in body
+    assert 'href="/completed?before=%d&amp;limit=2"' % completed[2] in body
+
+    response = client.get("/completed?after=%d&limit=2" % completed[3])
+    body = response.get_data(as_text=True)
+
+    assert "/completed?after=" not in body
+    assert 'href="/completed?before=%d&amp;limit=2"' % completed[4] in body
+
+
+def test_completed_default_page_size(_client):
+    (client, storage) = _client
+
+    _complete_tasks(storage, server.COMPLETED_PAGE_SIZE + 1)
+
+    body = client.get("/completed").get_data(as_text=True)
+
+    assert body.count('class="description">task ') == \
+        server.COMPLETED_PAGE_SIZE
+    assert "/completed?after=" in body
+
+
+@pytest.fixture
+def _streaming():
+    server.app.config['STREAMING'] = True
+
+    yield
+
+    server.app.config['STREAMING'] = False
+
+
+def _create_tasks(storage):
+    for days in [-2, -1, 0, 1, 2]:
+        storage.create_task("task %d" % days, date_utils.date_from_today(days))
+
+
+@pytest.mark.parametrize("path", ["/", "/completed", "/completed?limit=2"])
+def test_streamed_pages_match_rendered_pages(_client, path):
+    (client, storage) = _client
+
+    _create_tasks(storage)
+    _complete_tasks(storage, 5)
+    _create_tasks(storage)
+
+    rendered = client.get(path).get_data(as_text=True)
+
+    server.app.config['STREAMING'] = True
+
+    try:
+        response = client.get(path)
+    finally:
+        server.app.config['STREAMING'] = False
+
+    assert response.is_streamed
+    assert response.get_data(as_text=True) == rendered
+
+
+def test_streamed_empty_index(_client, _streaming):
+    (client, storage) = _client
+
+    body = client.get("/").get_data(as_text=True)
+
+    assert "Nothing left to do!" in body
+
+
+@pytest.mark.parametrize("path", ["/", "/completed"])
+def test_not_modified(_client, path):
+    (client, storage) = _client
+
+    response = client.get(path)
+    etag = response.headers["ETag"]
+
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "no-cache"
+
+    response = client.get(path, headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.get_data() == b""
+    assert response.headers["ETag"] == etag
+
+    storage.create_task("new task", date_utils.date_from_today(1))
+
+    response = client.get(path, headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_version_changes(tmpdir):
+    db_path = str(tmpdir.join("stuff.worky"))
+    storage = Storage(db_path)
+
+    versions = [storage.get_version()]
+
+    storage.create_task("task", date_utils.date_from_today(1))
+    versions.append(storage.get_version())
+
+    task = storage.get_active_tasks()[0]
+
+    storage.complete_task(task.id)
+    versions.append(storage.get_version())
+
+    storage.delete_task(task.id)
+    versions.append(storage.get_version())
+
+    """ changes made by other programs """
+    connection = sqlite3.connect(db_path)
+    connection.execute("INSERT INTO tasks (description, due_date, "
+                       "created_date, last_updated) VALUES ('other', "
+                       "'2020-01-01', '2020-01-01 00:00:00.000000', "
+                       "'2020-01-01 00:00:00.000000')")
+    connection.commit()
+    connection.close()
+
+    versions.append(storage.get_version())
+
+    assert len(set(versions)) == len(versions)
+    assert versions[-1] == storage.get_version()
+
+    storage.close()
+
+
+@pytest.mark.parametrize("path", ["/deleteTask", "/deleteTask?id=abc",
+                                  "/completeTask?id=",
+                                  "/updateTask?id=%d" % 2 ** 63,
+                                  "/updateForm?id=abc", "/deleteForm",
+                                  "/completeForm?id=1.5"])
+def test_invalid_task_id(_client, path):
+    (client, storage) = _client
+
+    storage.create_task("task", date_utils.date_from_today(1))
+
+    assert client.get(path).status_code == 400
+    assert len(storage.get_active_tasks()) == 1
+
+
+@pytest.mark.parametrize("query_string", [
+    "", "description=task", "dueDate=2030-01-01",
+    "description=&dueDate=2030-01-01", "description=task&dueDate=bad",
+    "description=task&dueDate=2030-13-01"])
+def test_invalid_task_fields(_client, query_string):
+    (client, storage) = _client
+
+    task_id = storage.create_task("task", date_utils.date_from_today(1))
+
+    for path in ("/createTask?%s" % query_string,
+                 "/updateTask?id=%d&%s" % (task_id, query_string)):
+        assert client.get(path).status_code == 400
+
+    assert [t.description for t in storage.get_active_tasks()] == ["task"]
+
+
+@pytest.mark.parametrize("path", ["/updateForm?id=999", "/deleteForm?id=999",
+                                  "/completeForm?id=999",
+                                  "/completeTask?id=999",
+                                  "/updateTask?id=999&description=task&"
+                                  "dueDate=2030-01-01"])
+def test_unknown_task(_client, path):
+    (client, _) = _client
+
+    assert client.get(path).status_code == 404
+
+
+def test_complete_completed_task(_client):
+    (client, storage) = _client
+
+    task_id = storage.create_task("task", date_utils.date_from_today(1))
+
+    assert client.get("/completeTask?id=%d" % task_id).status_code == 302
+    assert client.get("/completeTask?id=%d" % task_id).status_code == 409
+    assert len(storage.get_completed_tasks()) == 1
+
+
+def test_template_cache(_client, tmpdir):
+    (client, _) = _client
+
+    cache_dir = tmpdir.join("templates")
+
+    server.set_template_cache(cache_dir)
+    server.app.jinja_env.cache.clear()
+
+    try:
+        templates = server.precompile_templates()
+
+        assert "index.html" in templates
+        assert len(cache_dir.listdir()) == len(templates)
+
+        """ templates are loaded from the cache """
+        server.app.jinja_env.cache.clear()
+
+        assert client.get("/").status_code == 200
+    finally:
+        server.app.jinja_env.bytecode_cache = None
+        server.app.jinja_env.cache.clear()
+
+
+def test_template_cache_unavailable(_client, tmpdir, caplog):
+    (client, _) = _client
+
+    """ a file where the cache directory should be """
+    blocker = tmpdir.join("cache")
+    blocker.write("")
+
+    server.app.jinja_env.cache.clear()
+
+    try:
+        with caplog.at_level(logging.WARNING, logger="worky.server"):
+            server.set_template_cache(blocker.join("templates"))
+
+        assert server.app.jinja_env.bytecode_cache is None
+        assert "Template cache disabled" in caplog.text
+
+        assert client.get("/").status_code == 200
+    finally:
+        server.app.jinja_env.bytecode_cache = None
+        server.app.jinja_env.cache.clear()
+
+
+def test_search(_client):
+    (client, storage) = _client
+
+    storage.create_tasks([("report %d" % i, date_utils.date_from_today(1))
+                          for i in range(3)] +
+                         [("other", date_utils.date_from_today(1))])
+
+    response = client.get("/search?q=report&limit=2")
+    body = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert body.count("updateForm?id=") == 2
+    assert "other" not in body
+    assert 'href="/search?q=report&amp;page=1&amp;limit=2"' in body
+
+    body = client.get("/search?q=report&page=1&limit=2").get_data(
+        as_text=True)
+
+    assert body.count("updateForm?id=") == 1
+    assert 'href="/search?q=report&amp;page=0&amp;limit=2"' in body
+
+    body = client.get("/search?q=missing").get_data(as_text=True)
+
+    assert "No task matches" in body
@@ -0,0 +1,79 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from worky import startup
+import io
+import pytest
+
+
+@pytest.fixture
+def _profiling():
+    startup.enable()
+    yield
+    startup._phases = None
+
+
+def test_disabled_profile_reports_nothing():
+    out = io.StringIO()
+
+    with startup.phase("import"):
+        pass
+
+    startup.report(file=out)
+
+    assert out.getvalue() == ""
+
+
+def test_nested_phases(_profiling):
+    out = io.StringIO()
+
+    with startup.phase("storage construction"):
+        with startup.phase("schema validation"):
+            pass
+
+    with startup.phase("template compile"):
+        pass
+
+    startup.report(file=out)
+
+    lines = out.getvalue().splitlines()
+
+    assert lines[0] == "Startup profile:"
+    assert lines[1].split()[:2] == ["storage", "construction"]
+    assert lines[2].startswith("    schema validation")
+    assert lines[3].split()[:2] == ["template", "compile"]
+    assert lines[4].split()[0] == "total"
+    assert [depth for (_, depth, _) in startup._phases] == [0, 1, 0]
+
+
+def test_phase_recorded_on_error(_profiling):
+    with pytest.raises(ValueError):
+        with startup.phase("failing"):
+            raise ValueError()
+
+    [(name, depth, duration)] = startup._phases
+
+    assert name == "failing"
+    assert duration is not None
+    assert startup._depth == 0
@@ -22,18 +22,28 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-from worky.storage import Storage
+from worky.storage import Storage, StorageException
 import pytest
 from datetime import datetime, timedelta, UTC
+from threading import Thread
+import os
+import sqlalchemy
+import sqlite3
 
 due_date_format = '%Y-%m-%d'
 
 
-@pytest.fixture
-def _setup(tmpdir):
+@pytest.fixture(params=[{}, {"pool_size": 4}, {"denormalize": True},
+                        {"cache": False}],
+                ids=["default", "pooled", "denormalized", "uncached"])
+def _setup(tmpdir, request):
     db_path = str(tmpdir.join("stuff.worky"))
 
-    yield Storage(db_path)
+    storage = Storage(db_path, **request.param)
+
+    yield storage
+
+    storage.close()
 
 
 def _create_active_task(storage):
@@ -166,3 +176,414 @@ def test_delete_completed_active_task(_setup):
     storage.delete_task(completed_task[0].id)
 
     _assert_no_tasks(storage)
+
+
+def test_performance_profile_readers_not_blocked_by_writer(tmpdir):
+    db_path = str(tmpdir.join("stuff.worky"))
+
+    storage = Storage(db_path, profile="performance")
+
+    _create_active_task(storage)
+
+    writer = sqlite3.connect(db_path, timeout=0, isolation_level=None)
+    writer.execute("BEGIN EXCLUSIVE")
+    writer.execute("DELETE FROM tasks")
+
+    results = []
+
+    def read():
+        results.append(len(storage.get_active_tasks()))
+
+    readers = [Thread(target=read) for _ in range(4)]
+
+    for reader in readers:
+        reader.start()
+
+    for reader in readers:
+        reader.join(timeout=2)
+
+    """ readers were not blocked and only see committed data """
+    assert results == [1, 1, 1, 1]
+
+    writer.execute("ROLLBACK")
+    writer.close()
+
+    storage.close()
+
+
+def test_performance_profile_checkpoint_on_close(tmpdir):
+    db_path = str(tmpdir.join("stuff.worky"))
+
+    storage = Storage(db_path, pool_size=2, profile="performance")
+
+    _create_active_task(storage)
+
+    assert os.path.getsize(db_path + "-wal") > 0
+
+    storage.close()
+
+    assert (not os.path.exists(db_path + "-wal")
+            or os.path.getsize(db_path + "-wal") == 0)
+
+    """ all the data is in the database file alone """
+    reader = sqlite3.connect(db_path)
+
+    assert reader.execute("SELECT count(*) FROM tasks").fetchone() == (1,)
+
+    reader.close()
+
+
+def test_index_view_single_query(_setup):
+    storage = _setup
+
+    (_, _, overdue_task) = _create_overdue_task(storage)
+
+    """ tasks due today are not overdue yet """
+    storage.create_task("due today", datetime.now(UTC).strftime(
+        due_date_format))
+
+    active_task = storage.get_active_tasks()[0]
+
+    """ measure a read cache miss """
+    storage._changed()
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sqlalchemy.event.listen(storage._engine, "before_cursor_execute", count)
+
+    (overdue_tasks, active_tasks) = storage.get_index_view()
+
+    sqlalchemy.event.remove(storage._engine, "before_cursor_execute", count)
+
+    assert len(statements) == 1
+    assert [t.id for t in overdue_tasks] == [overdue_task.id]
+    assert [t.id for t in active_tasks] == [active_task.id]
+
+
+def _complete_tasks(storage, count):
+    for i in range(count):
+        storage.create_task("task %d" % i, datetime.now(UTC).strftime(
+            due_date_format))
+
+    for task in storage.get_active_tasks():
+        storage.complete_task(task.id)
+
+    return [row.Tasks.id for row in storage.get_completed_tasks()]
+
+
+def test_completed_tasks_keyset_pages(_setup):
+    storage = _setup
+
+    """ tasks completed within the same second share completed_by """
+    completed = _complete_tasks(storage, 7)
+
+    pages = []
+    after = None
+
+    while True:
+        page = storage.get_completed_tasks(after=after, limit=3)
+
+        if not page:
+            break
+
+        pages.append([row.Tasks.id for row in page])
+        after = page[-1].Tasks.id
+
+    assert pages == [completed[0:3], completed[3:6], completed[6:7]]
+
+    newer = storage.get_completed_tasks(before=completed[6], limit=3)
+
+    assert [row.Tasks.id for row in newer] == completed[3:6]
+
+    newer = storage.get_completed_tasks(before=completed[1], limit=3)
+
+    assert [row.Tasks.id for row in newer] == completed[0:1]
+
+
+def test_iter_index_view(_setup):
+    storage = _setup
+
+    for days in [2, -1, 0, -3, 1]:
+        storage.create_task("task", (datetime.now(UTC) + timedelta(
+            days=days)).strftime(due_date_format))
+
+    (overdue_tasks, active_tasks) = storage.get_index_view()
+    (overdue_stream, active_stream) = storage.iter_index_view()
+
+    assert [t.id for t in overdue_stream] == [t.id for t in overdue_tasks]
+    assert [t.id for t in active_stream] == [t.id for t in active_tasks]
+
+
+def test_iter_completed_tasks(_setup):
+    storage = _setup
+
+    completed = _complete_tasks(storage, 5)
+
+    stream = storage.iter_completed_tasks(after=completed[0], limit=3)
+
+    assert [row.Tasks.id for row in stream] == completed[1:4]
+    assert stream.has_more
+
+    stream = storage.iter_completed_tasks(after=completed[1], limit=3)
+
+    assert [row.Tasks.id for row in stream] == completed[2:5]
+    assert not stream.has_more
+
+
+def test_read_cache_hits_and_invalidation(tmpdir):
+    storage = Storage(str(tmpdir.join("stuff.worky")))
+
+    (_, _, task) = _create_active_task(storage)
+
+    (hits, misses) = (storage.cache_hits, storage.cache_misses)
+
+    storage.get_index_view()
+    storage.get_active_tasks()
+    storage.get_overdue_tasks()
+
+    assert (storage.cache_hits, storage.cache_misses) == (hits + 3, misses)
+
+    storage.update_task(task.id, "updated", task.due_date.strftime(
+        due_date_format))
+
+    assert storage.get_active_tasks()[0].description == "updated"
+    assert storage.cache_misses == misses + 1
+
+    storage.complete_task(task.id)
+
+    assert storage.get_active_tasks() == []
+    assert len(storage.get_completed_tasks()) == 1
+
+    storage.delete_task(task.id)
+
+    _assert_no_tasks(storage)
+
+    storage.close()
+
+
+def test_read_cache_external_changes(tmpdir):
+    db_path = str(tmpdir.join("stuff.worky"))
+
+    storage = Storage(db_path)
+    other = Storage(db_path)
+
+    _create_active_task(storage)
+
+    """ written by another connection, as the import command does """
+    due_date = (datetime.now(UTC) + timedelta(days=2)).strftime(
+        due_date_format)
+    task_id = other.create_task("other task", due_date)
+
+    assert [t.id for t in storage.get_active_tasks()][-1] == task_id
+    assert len(storage.get_completed_tasks()) == 0
+
+    other.complete_task(task_id)
+
+    assert len(storage.get_completed_tasks()) == 1
+    assert len(list(storage.iter_index_view()[1])) == 1
+
+    other.close()
+    storage.close()
+
+
+def test_read_cache_midnight_rollover(tmpdir, monkeypatch):
+    storage = Storage(str(tmpdir.join("stuff.worky")))
+
+    (_, due_date, task) = _create_active_task(storage)
+
+    assert storage.get_overdue_tasks() == []
+
+    """ the day after the due date the cached task becomes overdue """
+    next_day = (datetime.strptime(due_date, due_date_format) +
+                timedelta(days=1)).strftime(due_date_format)
+    monkeypatch.setattr(storage, "_today", lambda: next_day)
+
+    assert [t.id for t in storage.get_overdue_tasks()] == [task.id]
+    assert storage.get_active_tasks() == []
+
+    storage.close()
+
+
+def test_read_cache_disabled(tmpdir):
+    storage = Storage(str(tmpdir.join("stuff.worky")), cache=False)
+
+    _create_active_task(storage)
+
+    storage.get_index_view()
+
+    assert (storage.cache_hits, storage.cache_misses) == (0, 0)
+
+    storage.close()
+
+
+def test_read_cache_discards_stale_loads(tmpdir):
+    storage = Storage(str(tmpdir.join("stuff.worky")))
+
+    def load():
+        """ a task is changed while the list is being loaded """
+        storage._changed()
+
+        return ["stale"]
+
+    assert storage._cached(("key",), load) == ["stale"]
+    assert storage._cached(("key",), lambda: ["fresh"]) == ["fresh"]
+
+    storage.close()
+
+
+def _due_date(days):
+    return (datetime.now(UTC) + timedelta(days=days)).strftime(due_date_format)
+
+
+def test_batch_mutations(_setup):
+    storage = _setup
+
+    task_ids = storage.create_tasks([("task %d" % i, _due_date(1 + i))
+                                     for i in range(5)])
+
+    assert [task.id for task in storage.get_active_tasks()] == task_ids
+
+    storage.update_tasks([(task_ids[0], "updated", _due_date(-1))])
+    storage.complete_tasks(task_ids[1:3])
+    storage.delete_tasks([task_ids[2], task_ids[3]])
+
+    [overdue] = storage.get_overdue_tasks()
+    [active] = storage.get_active_tasks()
+    [completed] = storage.get_completed_tasks()
+
+    assert (overdue.id, overdue.description) == (task_ids[0], "updated")
+    assert active.id == task_ids[4]
+    assert completed.Tasks.id == task_ids[1]
+
+
+def test_batch_mutations_are_atomic(_setup):
+    storage = _setup
+
+    task_ids = storage.create_tasks([("task", _due_date(1))] * 2)
+
+    for task_batch in [[task_ids[0], 999], [task_ids[0], task_ids[0]]]:
+        with pytest.raises(StorageException):
+            storage.complete_tasks(task_batch)
+
+    with pytest.raises(StorageException):
+        storage.update_tasks([(task_ids[0], "updated", _due_date(1)),
+                              (999, "updated", _due_date(1))])
+
+    with pytest.raises(ValueError):
+        storage.create_tasks([("task", _due_date(1)), ("task", "never")])
+
+    assert [task.description for task in storage.get_active_tasks()] == \
+        ["task", "task"]
+    assert storage.get_completed_tasks() == []
+
+
+def test_batch_mutations_use_bulk_statements(_setup):
+    storage = _setup
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split()[0])
+
+    sqlalchemy.event.listen(storage._engine, "before_cursor_execute", count)
+
+    task_ids = storage.create_tasks([("task", _due_date(1))] * 300)
+    storage.update_tasks([(task_id, "updated", _due_date(2))
+                          for task_id in task_ids])
+    storage.complete_tasks(task_ids[:100])
+    storage.delete_tasks(task_ids)
+
+    sqlalchemy.event.remove(storage._engine, "before_cursor_execute", count)
+
+    """ no statement per task: one per batch, and one per check """
+    assert statements.count("INSERT") == 2
+    assert statements.count("UPDATE") == \
+        (2 if storage._denormalized else 1)
+    assert statements.count("DELETE") == 2
+    assert statements.count("SELECT") == 2
+
+
+def test_iter_and_import_tasks(_setup, tmpdir):
+    storage = _setup
+
+    task_ids = storage.create_tasks([("task %d" % i, _due_date(i - 2))
+                                     for i in range(5)])
+    storage.complete_tasks(task_ids[1:3])
+
+    tasks = list(storage.iter_tasks(chunk_size=2))
+
+    assert [task.id for task in tasks] == task_ids
+    assert [task.completed_by is not None for task in tasks] == \
+        [False, True, True, False, False]
+
+    copy = Storage(str(tmpdir.join("copy.worky")),
+                   denormalize=storage._denormalized)
+
+    assert copy.import_tasks((task._asdict() for task in tasks),
+                             chunk_size=2) == 5
+
+    copied = list(copy.iter_tasks())
+
+    assert [task[1:] for task in copied] == [task[1:] for task in tasks]
+    assert len(copy.get_completed_tasks()) == 2
+    assert [task.description for task in copy.get_overdue_tasks()] == \
+        ["task 0"]
+    assert [task.description for task in copy.get_active_tasks()] == \
+        ["task 3", "task 4"]
+
+    copy.close()
+
+
+def _search(storage, text, **kwargs):
+    return [task.description
+            for (task, _) in storage.search_tasks(text, **kwargs)]
+
+
+def test_search_tasks(_setup):
+    storage = _setup
+
+    task_ids = storage.create_tasks([
+        ("Buy milk", _due_date(1)),
+        ("Write the report", _due_date(1)),
+        ("Milk the cows, more milk", _due_date(2)),
+        ("Café \"menu\" OR drinks", _due_date(3))])
+    storage.complete_tasks(task_ids[:1])
+
+    """ best matches first """
+    results = storage.search_tasks("milk")
+
+    assert [task.id for (task, _) in results] == [task_ids[2], task_ids[0]]
+    assert [completed_by is None for (_, completed_by) in results] == \
+        [True, False]
+
+    assert _search(storage, "rep") == ["Write the report"]
+    assert _search(storage, "MILK cows") == ["Milk the cows, more milk"]
+    assert _search(storage, "cafe") == ["Café \"menu\" OR drinks"]
+    assert _search(storage, "\"menu\" OR") == ["Café \"menu\" OR drinks"]
+    assert _search(storage, "  ") == []
+    assert _search(storage, "milk", offset=1, limit=1) == ["Buy milk"]
+
+
+def test_search_index_follows_changes(_setup):
+    storage = _setup
+
+    task_id = storage.create_task("Write the report", _due_date(1))
+    storage.create_tasks([("Read the report", _due_date(1))])
+
+    assert len(_search(storage, "report")) == 2
+
+    storage.update_task(task_id, "Write the paper", _due_date(1))
+
+    assert _search(storage, "report") == ["Read the report"]
+    assert _search(storage, "paper") == ["Write the paper"]
+
+    storage.delete_task(task_id)
+
+    assert _search(storage, "paper") == []
+
+    copy = list(storage.iter_tasks())
+    storage.import_tasks(task._asdict() for task in copy)
+
+    assert _search(storage, "report") == ["Read the report"] * 2
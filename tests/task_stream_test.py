@@ -0,0 +1,88 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from worky.task_stream import TaskSource, TaskStream
+
+
+def test_empty_stream():
+    stream = TaskStream(TaskSource([]))
+
+    assert not stream
+    assert list(stream) == []
+    assert not stream.has_more
+
+
+def test_streams_sharing_source():
+    source = TaskSource(range(6))
+
+    low = TaskStream(source, lambda task: task < 3)
+    high = TaskStream(source)
+
+    assert low and high
+    assert list(low) == [0, 1, 2]
+    assert list(high) == [3, 4, 5]
+    assert (high.first, high.last, high.count) == (3, 5, 3)
+
+
+def test_stream_without_first_partition():
+    source = TaskSource(range(3, 6))
+
+    low = TaskStream(source, lambda task: task < 3)
+    high = TaskStream(source)
+
+    assert not low
+    assert high
+    assert list(low) == []
+    assert list(high) == [3, 4, 5]
+
+
+def test_stream_limit():
+    stream = TaskStream(TaskSource(range(3)), limit=2)
+
+    assert list(stream) == [0, 1]
+    assert stream.has_more
+
+    stream = TaskStream(TaskSource(range(2)), limit=2)
+
+    assert list(stream) == [0, 1]
+    assert not stream.has_more
+
+
+def test_stream_is_lazy():
+    fetched = []
+
+    def tasks():
+        for task in range(3):
+            fetched.append(task)
+
+            yield task
+
+    stream = TaskStream(TaskSource(tasks()))
+
+    assert fetched == []
+
+    iterator = iter(stream)
+
+    assert next(iterator) == 0
+    assert fetched == [0]
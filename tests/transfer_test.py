@@ -0,0 +1,140 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from worky import transfer
+from worky.storage import Storage
+from worky.transfer import TransferException
+from tests.utils import date_utils
+from datetime import datetime
+import io
+import json
+import pytest
+
+
+@pytest.fixture
+def _storage(tmpdir):
+    storage = Storage(str(tmpdir.join("stuff.worky")))
+
+    task_ids = storage.create_tasks([
+        ("plain task", date_utils.date_from_today(1)),
+        ("task with, \"quotes\"\nand lines", date_utils.date_from_today(-1)),
+        ("completed task", date_utils.date_from_today(2)),
+    ])
+    storage.complete_tasks(task_ids[2:])
+
+    yield storage
+
+    storage.close()
+
+
+def _fields(storage):
+    return [tuple(task)[1:] for task in storage.iter_tasks()]
+
+
+@pytest.mark.parametrize("file_format", transfer.FORMATS)
+def test_export_import_round_trip(_storage, tmpdir, file_format):
+    output = io.StringIO(newline="")
+
+    assert transfer.export_tasks(_storage, output, file_format) == 3
+
+    copy = Storage(str(tmpdir.join("copy.worky")))
+
+    tasks = transfer.read_tasks(io.StringIO(output.getvalue(), newline=""),
+                                file_format)
+
+    assert copy.import_tasks(tasks) == 3
+    assert _fields(copy) == _fields(_storage)
+
+    copy.close()
+
+
+def test_import_minimal_csv(_storage):
+    source = io.StringIO("description,due_date\n"
+                         "imported,%s\n" % date_utils.date_from_today(3))
+
+    _storage.import_tasks(transfer.read_tasks(source, "csv"))
+
+    [task] = [task for task in _storage.get_active_tasks()
+              if task.description == "imported"]
+
+    assert task.created_date == task.last_updated
+
+
+def test_import_converts_time_zones(_storage):
+    source = io.StringIO(json.dumps({
+        "description": "imported",
+        "due_date": "2020-01-01",
+        "created_date": "2020-01-01T10:00:00+02:00",
+        "last_updated": "2020-01-01T10:00:00",
+    }))
+
+    [task] = transfer.read_tasks(source, "jsonl")
+
+    assert task["created_date"] == datetime(2020, 1, 1, 8)
+    assert task["last_updated"] == datetime(2020, 1, 1, 10)
+    assert task["completed_by"] is None
+
+
+@pytest.mark.parametrize("file_format, content", [
+    ("csv", "description,due_date\nvalid,2020-01-01\n,2020-01-01\n"),
+    ("csv", "description,due_date\nvalid,2020-01-01\ninvalid,tomorrow\n"),
+    ("csv", "description\nno due date\n"),
+    ("jsonl", '{"description": "valid", "due_date": "2020-01-01"}\n{'),
+    ("jsonl", '["invalid", "2020-01-01"]\n'),
+])
+def test_import_invalid_file(_storage, file_format, content):
+    before = _fields(_storage)
+
+    with pytest.raises(TransferException):
+        _storage.import_tasks(transfer.read_tasks(io.StringIO(content),
+                                                  file_format))
+
+    assert _fields(_storage) == before
+
+
+def test_transfer_commands(_storage, tmpdir, capsys):
+    exported = str(tmpdir.join("tasks.jsonl"))
+    copy_path = str(tmpdir.join("copy.worky"))
+
+    transfer.main("export", [_storage._engine.url.database, exported])
+    transfer.main("import", [copy_path, exported])
+
+    assert "Exported 3 tasks" in capsys.readouterr().err
+
+    with open(exported) as output:
+        assert json.loads(output.readline())["description"] == "plain task"
+
+    copy = Storage(copy_path)
+
+    assert _fields(copy) == _fields(_storage)
+
+    copy.close()
+
+
+def test_export_missing_database(tmpdir):
+    with pytest.raises(SystemExit):
+        transfer.main("export", [str(tmpdir.join("missing.worky")),
+                                 str(tmpdir.join("tasks.csv"))])
+
+    assert not tmpdir.join("missing.worky").exists()
@@ -0,0 +1,43 @@
+import sqlite3
+
+""" schema of the workfiles created before the schema indexes were added """
+legacy_schema = [
+    "CREATE TABLE tasks (id INTEGER NOT NULL, description VARCHAR NOT NULL, "
+    "due_date DATE NOT NULL, created_date DATETIME NOT NULL, "
+    "last_updated DATETIME NOT NULL, PRIMARY KEY (id))",
+    "CREATE TABLE completed (id INTEGER NOT NULL, "
+    "completed_by DATETIME NOT NULL, PRIMARY KEY (id), "
+    "FOREIGN KEY(id) REFERENCES tasks (id) ON DELETE CASCADE)",
+]
+
+
+def create_legacy_database(db_path, tasks=(), completed=()):
+    """
+    Creates a workfile with the legacy schema
+
+    Parameters
+    ----------
+    db_path : str
+        path of the workfile to create
+    tasks : list of tuple of (int, str, str)
+        id, description and due date of the tasks to insert
+    completed : list of int
+        ids of the tasks to mark as completed
+    """
+    connection = sqlite3.connect(db_path)
+
+    for statement in legacy_schema:
+        connection.execute(statement)
+
+    for (task_id, description, due_date) in tasks:
+        connection.execute("INSERT INTO tasks VALUES (?, ?, ?, "
+                           "'2020-01-01 00:00:00.000000', "
+                           "'2020-01-01 00:00:00.000000')",
+                           (task_id, description, due_date))
+
+    for task_id in completed:
+        connection.execute("INSERT INTO completed VALUES (?, "
+                           "'2020-01-02 00:00:00.000000')", (task_id,))
+
+    connection.commit()
+    connection.close()
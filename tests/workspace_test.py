@@ -0,0 +1,201 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from worky import server
+from worky.storage import Storage
+from worky.workspace import Workspace, WorkspaceException, WorkspaceMiddleware
+from tests.utils import date_utils
+from werkzeug.test import Client
+import logging
+import pytest
+
+
+def _create_workfiles(directory, *names):
+    for name in names:
+        storage = Storage(str(directory.join("%s.worky" % name)))
+        storage.create_task("%s task" % name, date_utils.date_from_today(1))
+        storage.close()
+
+
+@pytest.fixture
+def _workspace(tmpdir):
+    _create_workfiles(tmpdir, "alpha", "beta", "gamma")
+
+    workspace = Workspace(str(tmpdir), max_open=2)
+
+    yield workspace
+
+    workspace.close()
+
+
+@pytest.fixture
+def _client(_workspace):
+    server.app.config['STORAGE'] = None
+    server.app.config['WORKSPACE'] = _workspace
+
+    yield Client(WorkspaceMiddleware(server.app, _workspace))
+
+    server.app.config['WORKSPACE'] = None
+
+
+def test_workspace_names(_workspace, tmpdir):
+    tmpdir.join("notes.txt").write("")
+    tmpdir.mkdir("delta.worky")
+
+    assert _workspace.names() == ["alpha", "beta", "gamma"]
+
+
+def test_workspace_invalid_arguments(tmpdir):
+    with pytest.raises(WorkspaceException):
+        Workspace(str(tmpdir.join("missing")))
+
+    with pytest.raises(WorkspaceException):
+        Workspace(str(tmpdir), max_open=0)
+
+    with pytest.raises(WorkspaceException):
+        Workspace(str(tmpdir), idle_timeout=0)
+
+
+def test_workspace_unknown_workfile(_workspace):
+    for name in ["delta", "../alpha", "1alpha"]:
+        with pytest.raises(WorkspaceException):
+            _workspace.acquire(name)
+
+    assert _workspace.open_count() == 0
+
+
+def test_workspace_lru_eviction(_workspace):
+    with _workspace.storage("alpha") as alpha:
+        assert alpha.get_active_tasks()[0].description == "alpha task"
+
+    with _workspace.storage("beta"):
+        pass
+
+    """ reuse alpha, so beta becomes the least recently used """
+    with _workspace.storage("alpha") as storage:
+        assert storage is alpha
+
+    with _workspace.storage("gamma"):
+        pass
+
+    assert _workspace.open_count() == 2
+
+    with _workspace.storage("alpha") as storage:
+        assert storage is alpha
+
+
+def test_workspace_keeps_workfiles_in_use(_workspace):
+    alpha = _workspace.acquire("alpha")
+    beta = _workspace.acquire("beta")
+
+    with _workspace.storage("gamma"):
+        assert _workspace.open_count() == 3
+
+    assert _workspace.open_count() == 2
+
+    """ still usable, as it was never closed """
+    assert alpha.get_active_tasks()[0].description == "alpha task"
+    assert beta.get_active_tasks()[0].description == "beta task"
+
+    _workspace.release("alpha")
+    _workspace.release("beta")
+
+
+def test_workspace_idle_eviction(tmpdir):
+    _create_workfiles(tmpdir, "alpha")
+
+    workspace = Workspace(str(tmpdir), idle_timeout=0.01)
+
+    with workspace.storage("alpha"):
+        workspace.evict_idle()
+
+        assert workspace.open_count() == 1
+
+    workspace._open["alpha"].last_used -= 1
+    workspace.evict_idle()
+
+    assert workspace.open_count() == 0
+
+    workspace.close()
+
+
+def test_workspace_listing(_client):
+    body = _client.get("/").get_data(as_text=True)
+
+    for name in ["alpha", "beta", "gamma"]:
+        assert 'href="/w/%s/"' % name in body
+
+
+def test_workspace_routing(_client):
+    alpha = _client.get("/w/alpha/").get_data(as_text=True)
+    beta = _client.get("/w/beta/").get_data(as_text=True)
+
+    assert "alpha task" in alpha and "beta task" not in alpha
+    assert "beta task" in beta and "alpha task" not in beta
+
+    assert 'href="/w/alpha/createForm"' in alpha
+    assert 'href="/w/alpha/updateForm?id=1"' in alpha
+    assert 'href="/w/alpha/static/styles/style.css"' in alpha
+
+
+def test_workspace_routing_writes(_client, _workspace):
+    response = _client.get("/w/beta/createTask?description=new&dueDate=%s"
+                           % date_utils.date_from_today(2))
+
+    assert response.status_code == 302
+    assert response.headers["Location"].endswith("/w/beta/")
+
+    with _workspace.storage("beta") as beta:
+        assert len(beta.get_active_tasks()) == 2
+
+    with _workspace.storage("alpha") as alpha:
+        assert len(alpha.get_active_tasks()) == 1
+
+
+def test_workspace_routing_unknown(_client, _workspace):
+    assert _client.get("/w/delta/").status_code == 404
+    assert _client.get("/completed").status_code == 404
+
+    assert _workspace.open_count() == 0
+
+
+def test_workspace_routing_invalid_workfile(_client, _workspace, tmpdir,
+                                            caplog):
+    tmpdir.join("broken.worky").write("not a database")
+
+    with caplog.at_level(logging.WARNING, logger="worky.workspace"):
+        assert _client.get("/w/broken/").status_code == 404
+
+    assert "Can not serve workfile broken" in caplog.text
+    assert _workspace.open_count() == 0
+
+    assert _client.get("/w/alpha/").status_code == 200
+
+
+def test_workspace_routing_releases(_client, _workspace):
+    for name in ["alpha", "beta", "gamma"]:
+        _client.get("/w/%s/" % name).close()
+
+    assert _workspace.open_count() == 2
+    assert all(entry.users == 0 for entry in _workspace._open.values())
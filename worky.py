@@ -22,15 +22,58 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-from worky import server
+from worky import startup
+from worky.profiles import PROFILES
+from worky.config import THREADS, CONNECTION_LIMIT, BACKLOG, CHANNEL_TIMEOUT
+from worky.config import BACKUP_INTERVAL, BACKUP_KEEP, MAX_OPEN, IDLE_TIMEOUT
+from worky.config import ConfigException, read_config
+from worky.config import validate_server_settings
 import argparse
+import os
+import sys
 
-if __name__ == '__main__':
-    arg_parser = argparse.ArgumentParser()
+""" commands run instead of serving a database """
+TRANSFER_COMMANDS = ["import", "export"]
+BACKUP_COMMAND = "backup"
+ARCHIVE_COMMAND = "archive"
+
+if __name__ == '__main__' and sys.argv[1:2] == [BACKUP_COMMAND]:
+    from worky import backup
+
+    backup.main(sys.argv[2:])
+elif __name__ == '__main__' and sys.argv[1:2] == [ARCHIVE_COMMAND]:
+    from worky import archive
+
+    archive.main(sys.argv[2:])
+elif __name__ == '__main__' and len(sys.argv) > 1 and \
+        sys.argv[1] in TRANSFER_COMMANDS:
+    from worky import transfer
+
+    transfer.main(sys.argv[1], sys.argv[2:])
+elif __name__ == '__main__':
+    """ the configuration file is read first, as it changes the defaults """
+    config_parser = argparse.ArgumentParser(add_help=False)
+    config_parser.add_argument("--config", metavar="", help="INI file whose "
+                               "[server] section sets any of host, port, "
+                               "threads, connection_limit, backlog and "
+                               "channel_timeout. Command line arguments take "
+                               "precedence", type=str, dest="config")
+    (config_args, _) = config_parser.parse_known_args()
+
+    arg_parser = argparse.ArgumentParser(parents=[config_parser],
+                                         epilog="Tasks are moved in and out "
+                                         "of a database with the import and "
+                                         "export commands, databases are "
+                                         "copied with the backup command, and "
+                                         "old completed tasks are archived "
+                                         "with the archive command. See "
+                                         "worky.py <command> -h")
     arg_parser.add_argument("db", help="location of the Worky database. "
                             "If the database does not exists it will be "
                             "created. Database file must have "
-                            "the \".worky\" suffix ", type=str)
+                            "the \".worky\" suffix. If a directory is given, "
+                            "every database in it is served at "
+                            "/w/<name>/", type=str)
     arg_parser.add_argument("--host", metavar="", help="host address where "
                             "the worky webpage will be served. Default is "
                             "127.0.0.1", type=str, dest="host",
@@ -38,6 +81,202 @@ if __name__ == '__main__':
     arg_parser.add_argument("-p, --port", metavar="", help="port where the "
                             "worky webpage will be served. Default is 5000",
                             type=int, dest="port", default=5000)
+    arg_parser.add_argument("--threads", metavar="", help="number of "
+                            "server threads handling requests. Default is %d"
+                            % THREADS, type=int, dest="threads",
+                            default=THREADS)
+    arg_parser.add_argument("--connection-limit", metavar="", help="maximum "
+                            "number of simultaneous client connections. "
+                            "Default is %d" % CONNECTION_LIMIT, type=int,
+                            dest="connection_limit", default=CONNECTION_LIMIT)
+    arg_parser.add_argument("--backlog", metavar="", help="maximum number of "
+                            "connections waiting to be accepted. Default is "
+                            "%d" % BACKLOG, type=int, dest="backlog",
+                            default=BACKLOG)
+    arg_parser.add_argument("--channel-timeout", metavar="", help="seconds "
+                            "after which an inactive client connection is "
+                            "closed. Default is %d" % CHANNEL_TIMEOUT,
+                            type=int, dest="channel_timeout",
+                            default=CHANNEL_TIMEOUT)
+    arg_parser.add_argument("--pool", help="keep one long-lived database "
+                            "connection per server thread instead of opening "
+                            "a new connection for every operation",
+                            action="store_true", dest="pooled")
+    arg_parser.add_argument("--storage-profile", metavar="", help="database "
+                            "tuning profile, one of: %s. The performance "
+                            "profile enables write-ahead logging so that "
+                            "pages keep loading while tasks are written. "
+                            "Default is default" % ", ".join(PROFILES),
+                            type=str, dest="profile", default="default",
+                            choices=PROFILES)
+    arg_parser.add_argument("--denormalize", help="migrate the database to "
+                            "the denormalized layout, which keeps the TODO "
+                            "page fast regardless of the number of completed "
+                            "tasks. The migration is one-way: the database "
+                            "can no longer be opened by older versions of "
+                            "worky", action="store_true", dest="denormalize")
+    arg_parser.add_argument("--stream", help="send the task tables to the "
+                            "browser while they are read from the database, "
+                            "which keeps memory usage flat for very long "
+                            "task lists. Best used with the performance "
+                            "storage profile, as writes wait for the table "
+                            "to be sent otherwise", action="store_true",
+                            dest="streaming")
+    arg_parser.add_argument("--no-cache", help="do not keep the task lists "
+                            "in memory between requests. The lists are "
+                            "reloaded whenever the database changes, "
+                            "including by other programs such as the import "
+                            "and archive commands", action="store_false",
+                            dest="cache")
+    arg_parser.add_argument("--template-cache", metavar="", help="directory "
+                            "where the compiled page templates are kept "
+                            "between launches, which speeds up the first "
+                            "page load. Default is worky/templates inside the "
+                            "user cache directory", type=str,
+                            dest="template_cache", default=None)
+    arg_parser.add_argument("--no-template-cache", help="compile the page "
+                            "templates on every launch",
+                            action="store_true", dest="no_template_cache")
+    arg_parser.add_argument("--max-open", metavar="", help="maximum "
+                            "number of databases kept open when serving a "
+                            "directory. Default is %d" % MAX_OPEN, type=int,
+                            dest="max_open", default=MAX_OPEN)
+    arg_parser.add_argument("--idle-timeout", metavar="", help="seconds "
+                            "after which an unused database is closed when "
+                            "serving a directory. Default is %d"
+                            % IDLE_TIMEOUT, type=float, dest="idle_timeout",
+                            default=IDLE_TIMEOUT)
+    arg_parser.add_argument("--backup-dir", metavar="", help="directory "
+                            "where timestamped copies of the served "
+                            "databases are written periodically while "
+                            "serving. Disabled by default", type=str,
+                            dest="backup_dir", default=None)
+    arg_parser.add_argument("--backup-interval", metavar="", help="minutes "
+                            "between periodic backups. Default is %d"
+                            % BACKUP_INTERVAL, type=float,
+                            dest="backup_interval", default=BACKUP_INTERVAL)
+    arg_parser.add_argument("--backup-keep", metavar="", help="number of "
+                            "periodic backups kept of each database. Default "
+                            "is %d" % BACKUP_KEEP, type=int,
+                            dest="backup_keep", default=BACKUP_KEEP)
+    arg_parser.add_argument("--events-port", metavar="", help="port where "
+                            "the changes to the tasks are pushed to the open "
+                            "TODO pages, which are then updated in place. "
+                            "The waiting pages hold no server thread. Not "
+                            "needed with --asgi, which pushes the changes "
+                            "on the serving port. Disabled by default",
+                            type=int, dest="events_port", default=None)
+    arg_parser.add_argument("--metrics", help="serve the latency of the "
+                            "requests, their SQL statements, fetched rows and "
+                            "template rendering time at /metrics, in the "
+                            "Prometheus text format", action="store_true",
+                            dest="metrics")
+    arg_parser.add_argument("--slow-request", metavar="", help="milliseconds "
+                            "from which a request is logged along with where "
+                            "its time went. Disabled by default", type=float,
+                            dest="slow_request", default=None)
+    arg_parser.add_argument("--profile-requests", metavar="", help="directory "
+                            "where the requests are profiled with cProfile, "
+                            "in one dump per route readable with python -m "
+                            "pstats. The slowest functions of each route are "
+                            "listed at /debug/profiles. Slows down every "
+                            "request, and requests are served one at a time. "
+                            "Disabled by default", type=str,
+                            dest="profile_dir", default=None)
+    arg_parser.add_argument("--asgi", help="serve with uvicorn (installed "
+                            "separately) and asynchronous views, so that "
+                            "slow clients and idle connections do not hold "
+                            "server threads. --threads then sets the number "
+                            "of database threads. Can not serve a directory "
+                            "and does not stream", action="store_true",
+                            dest="asgi")
+    arg_parser.add_argument("--profile-startup", help="print how long each "
+                            "startup phase took (module imports, database "
+                            "opening and validation, template compilation) "
+                            "before serving", action="store_true",
+                            dest="profile_startup")
+
+    if config_args.config is not None:
+        try:
+            arg_parser.set_defaults(**read_config(config_args.config))
+        except ConfigException as error:
+            arg_parser.error(str(error))
+
     args = arg_parser.parse_args()
 
-    server.run(db=args.db, host=args.host, port=args.port)
+    try:
+        validate_server_settings(args.threads, args.connection_limit,
+                                 args.backlog, args.channel_timeout)
+    except ConfigException as error:
+        arg_parser.error(str(error))
+
+    if args.asgi and os.path.isdir(args.db):
+        arg_parser.error("--asgi can not serve a directory")
+
+    if args.asgi and args.backup_dir is not None:
+        arg_parser.error("--asgi does not make periodic backups")
+
+    if args.asgi and (args.metrics or args.slow_request is not None):
+        arg_parser.error("--asgi does not collect request metrics")
+
+    if args.asgi and args.profile_dir is not None:
+        arg_parser.error("--asgi does not profile requests")
+
+    if args.slow_request is not None and args.slow_request <= 0:
+        arg_parser.error("--slow-request must be positive")
+
+    if args.events_port is not None and args.asgi:
+        arg_parser.error("--asgi pushes the changes on the serving port, "
+                         "without --events-port")
+
+    if args.events_port is not None and args.events_port in (0, args.port):
+        arg_parser.error("--events-port must differ from the serving port")
+
+    """
+    the server and storage modules pull in Flask and SQLAlchemy, so they are
+    only imported once the arguments are known to be valid
+    """
+    if args.profile_startup:
+        startup.enable()
+
+    with startup.phase("import storage"):
+        import worky.storage  # noqa: F401
+
+    with startup.phase("import server"):
+        from worky import server
+
+    if args.no_template_cache:
+        template_cache = None
+    elif args.template_cache is None:
+        template_cache = str(server.default_template_cache_dir())
+    else:
+        template_cache = args.template_cache
+
+    if args.asgi:
+        from worky import asgi
+
+        try:
+            asgi.run(db=args.db, host=args.host, port=args.port,
+                     pooled=args.pooled, profile=args.profile,
+                     denormalize=args.denormalize, cache=args.cache,
+                     template_cache=template_cache, db_threads=args.threads,
+                     connection_limit=args.connection_limit,
+                     channel_timeout=args.channel_timeout)
+        except asgi.AsgiException as error:
+            arg_parser.error(str(error))
+    else:
+        server.run(db=args.db, host=args.host, port=args.port,
+                   pooled=args.pooled, profile=args.profile,
+                   denormalize=args.denormalize, streaming=args.streaming,
+                   cache=args.cache, template_cache=template_cache,
+                   max_open=args.max_open, idle_timeout=args.idle_timeout,
+                   threads=args.threads,
+                   connection_limit=args.connection_limit,
+                   backlog=args.backlog,
+                   channel_timeout=args.channel_timeout,
+                   backup_dir=args.backup_dir,
+                   backup_interval=args.backup_interval,
+                   backup_keep=args.backup_keep,
+                   events_port=args.events_port, metrics=args.metrics,
+                   slow_request=args.slow_request,
+                   profile_dir=args.profile_dir)
@@ -0,0 +1,93 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from worky.storage import Storage, StorageException
+from pathlib import Path
+import argparse
+import os
+import sys
+import time
+
+""" default age, in days, from which completed tasks are archived """
+ARCHIVE_AGE = 365
+
+
+def _size(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def main(argv):
+    """
+    Runs the archive command of worky.py
+
+    Parameters
+    ----------
+    argv : list of str
+        command arguments
+    """
+    arg_parser = argparse.ArgumentParser(prog="worky.py archive",
+                                         description="Moves the tasks "
+                                         "completed long ago from a Worky "
+                                         "database to the archive file kept "
+                                         "next to it (<database>-archive), "
+                                         "then shrinks the database. The "
+                                         "archived tasks are still shown by "
+                                         "the Show Archived page")
+    arg_parser.add_argument("db", help="location of the Worky database",
+                            type=str)
+    arg_parser.add_argument("--days", metavar="", help="archive the tasks "
+                            "completed more than this many days ago. Default "
+                            "is %d" % ARCHIVE_AGE, type=float, dest="days",
+                            default=ARCHIVE_AGE)
+    arg_parser.add_argument("--no-vacuum", help="leave the space freed by "
+                            "the archived tasks in the database, to be reused "
+                            "by new tasks. Vacuuming blocks writers while the "
+                            "database is rebuilt", action="store_false",
+                            dest="vacuum")
+    args = arg_parser.parse_args(argv)
+
+    if not Path(args.db).is_file():
+        arg_parser.error("Database does not exist: %s" % args.db)
+
+    try:
+        storage = Storage(args.db)
+    except StorageException as error:
+        arg_parser.error(str(error))
+
+    size = _size(args.db)
+    start = time.perf_counter()
+
+    try:
+        count = storage.archive_tasks(args.days)
+
+        if args.vacuum:
+            storage.vacuum()
+    except StorageException as error:
+        arg_parser.error(str(error))
+    finally:
+        storage.close()
+
+    print("Archived %d tasks in %.2f s. Database size: %d -> %d bytes"
+          % (count, time.perf_counter() - start, size, _size(args.db)),
+          file=sys.stderr)
@@ -0,0 +1,567 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from flask import abort, request
+from werkzeug.exceptions import HTTPException
+from worky.storage import Storage, StorageException
+from worky import server
+from worky.server import app, precompile_templates, set_template_cache
+from worky.server import not_modified, versioned, index_page, completed_page
+from worky.server import requested_task_id, requested_task_fields
+from worky.server import requested_page, index_redirect, update_form_page
+from worky.server import confirm_form_page, known_task, SETTINGS_KEY
+from worky.config import THREADS
+from worky.workspace import STORAGE_KEY
+from worky.events import EventBroker, stream_events, events_topic
+from worky import startup
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from functools import partial, wraps
+import asyncio
+import io
+import sys
+
+""" number of threads the blocking database operations are run on """
+DB_THREADS = 1
+
+
+class AsyncStorage():
+    """
+    Asynchronous front of a Storage. The blocking database operations run on
+    dedicated threads, so the event loop keeps serving other connections
+    while they wait on SQLite. Every public Storage method is available as a
+    coroutine taking the same arguments, and the wrapped Storage itself as
+    the storage attribute
+    """
+
+    def __init__(self, storage, threads=DB_THREADS):
+        """
+        Parameters
+        ----------
+        storage : Storage
+            storage whose operations are run asynchronously
+        threads : int
+            number of database threads. A single thread serializes every
+            operation, which suits the default storage profile, where writers
+            block readers anyway
+        """
+        self.storage = storage
+        self._executor = ThreadPoolExecutor(max_workers=threads,
+                                            thread_name_prefix="worky-db")
+
+    def __getattr__(self, name):
+        method = getattr(self.storage, name)
+
+        if name.startswith("_") or not callable(method):
+            raise AttributeError(name)
+
+        async def run(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+
+            return await loop.run_in_executor(self._executor,
+                                              partial(method, *args,
+                                                      **kwargs))
+
+        return run
+
+    def close(self):
+        """
+        Waits for the pending operations and closes the storage
+        """
+        self._executor.shutdown(wait=True)
+        self.storage.close()
+
+
+class AsgiApp():
+    """
+    ASGI application serving the worky pages with asynchronous views. Pages
+    are rendered from the same templates and URL map as the WSGI
+    application; any route without an asynchronous view, such as the static
+    files or the JSON API, is served by the WSGI application on a worker
+    thread. The event stream of the workfile is served by the event loop
+    too
+    """
+
+    def __init__(self, storage, events=None):
+        """
+        Parameters
+        ----------
+        storage : AsyncStorage
+            storage of the served workfile
+        events : EventBroker
+            broker to which the storage publishes its events, or None
+        """
+        self.storage = storage
+        self._events = events
+
+        """
+        settings of the pages, given with every request rather than set on
+        the Flask application, whose config belongs to the WSGI server
+        """
+        self._settings = {
+            "STORAGE": storage.storage,
+            "WORKSPACE": None,
+            "STREAMING": False,
+            "EVENTS": events is not None,
+            "EVENTS_PORT": None,
+            "METRICS": None,
+            "METRICS_ENDPOINT": False,
+            "PROFILER": None,
+        }
+        self._wsgi_executor = ThreadPoolExecutor(
+            max_workers=THREADS, thread_name_prefix="worky-wsgi")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self._wsgi_executor.shutdown(wait=True)
+                self.storage.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope, receive, send):
+        if self._events is not None and \
+                events_topic(scope["path"]) == "":
+            await self._stream(receive, send)
+            return
+
+        body = b""
+
+        while True:
+            message = await receive()
+
+            if message["type"] == "http.disconnect":
+                return
+
+            body += message.get("body", b"")
+
+            if not message.get("more_body", False):
+                break
+
+        environ = _environ(scope, body)
+        environ[SETTINGS_KEY] = self._settings
+        environ[STORAGE_KEY] = self.storage.storage
+
+        with app.request_context(environ):
+            view = VIEWS.get(request.endpoint)
+
+            if request.routing_exception is not None:
+                response = request.routing_exception.get_response(environ)
+            elif view is None:
+                response = None
+            else:
+                try:
+                    response = app.make_response(await view(self.storage))
+                except HTTPException as error:
+                    response = error.get_response(environ)
+
+        if response is None:
+            loop = asyncio.get_running_loop()
+
+            status, headers, chunks = await loop.run_in_executor(
+                self._wsgi_executor, _call_wsgi, environ)
+        else:
+            status = response.status_code
+            headers = response.headers.to_wsgi_list()
+            chunks = [response.get_data()]
+
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(name.lower().encode("latin-1"),
+                                 value.encode("latin-1"))
+                                for (name, value) in headers]})
+
+        for chunk in chunks:
+            await send({"type": "http.response.body", "body": chunk,
+                        "more_body": True})
+
+        await send({"type": "http.response.body", "body": b""})
+
+    async def _stream(self, receive, send):
+        """
+        Sends the event stream of the workfile until the client disconnects
+        """
+        while True:
+            message = await receive()
+
+            if message["type"] == "http.disconnect":
+                return
+
+            if not message.get("more_body", False):
+                break
+
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream"),
+                                (b"cache-control", b"no-cache")]})
+
+        disconnected = asyncio.ensure_future(receive())
+
+        try:
+            async with aclosing(stream_events(self._events, "")) as messages:
+                while True:
+                    message = asyncio.ensure_future(anext(messages))
+
+                    await asyncio.wait([message, disconnected],
+                                       return_when=asyncio.FIRST_COMPLETED)
+
+                    if disconnected.done():
+                        """ ends the stream, which unsubscribes """
+                        message.cancel()
+                        await asyncio.gather(message, return_exceptions=True)
+                        return
+
+                    try:
+                        body = message.result()
+                    except StopAsyncIteration:
+                        break
+
+                    await send({"type": "http.response.body", "body": body,
+                                "more_body": True})
+
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            disconnected.cancel()
+
+
+def _environ(scope, body):
+    """
+    Builds the WSGI environ of an ASGI HTTP request, so that the request can
+    be handled with the Flask request context
+
+    Parameters
+    ----------
+    scope : dict
+        ASGI connection scope
+    body : bytes
+        request body
+
+    Returns
+    -------
+    environ : dict
+        WSGI environ of the request
+    """
+    (server_name, server_port) = scope.get("server") or ("localhost", 80)
+
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": scope["path"],
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_NAME": server_name,
+        "SERVER_PORT": str(server_port),
+        "SERVER_PROTOCOL": "HTTP/%s" % scope.get("http_version", "1.1"),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+
+    for (name, value) in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+
+        if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            name = "HTTP_" + name
+
+        if name in environ:
+            environ[name] += "," + value
+        else:
+            environ[name] = value
+
+    return environ
+
+
+def _call_wsgi(environ):
+    """
+    Serves a request with the WSGI application
+
+    Parameters
+    ----------
+    environ : dict
+        WSGI environ of the request
+
+    Returns
+    -------
+    response : tuple of (int, list, list of bytes)
+        status code, headers and body chunks of the response
+    """
+    started = []
+
+    def start_response(status, headers, exc_info=None):
+        started[:] = [int(status.split(" ", 1)[0]), headers]
+
+    result = app(environ, start_response)
+
+    try:
+        chunks = list(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+
+    return (started[0], started[1], chunks)
+
+
+def conditional(view):
+    """
+    Asynchronous counterpart of worky.server.conditional
+    """
+    @wraps(view)
+    async def conditional_view(storage):
+        """ read before rendering, so a concurrent change is not missed """
+        etag = await storage.get_version()
+
+        response = not_modified(etag)
+
+        if response is None:
+            response = app.make_response(await view(storage))
+
+        return versioned(response, etag)
+
+    return conditional_view
+
+
+@conditional
+async def index(storage):
+    (overdue_tasks, active_tasks) = await storage.get_index_view()
+
+    return index_page(overdue_tasks, active_tasks)
+
+
+async def create_form(storage):
+    return server.create_form()
+
+
+async def create_task(storage):
+    (description, due_date) = requested_task_fields()
+
+    await storage.create_task(description, due_date)
+
+    return index_redirect()
+
+
+async def update_form(storage):
+    task = known_task(await storage.get_task(requested_task_id()))
+
+    return update_form_page(task)
+
+
+async def update_task(storage):
+    task_id = requested_task_id()
+    (description, due_date) = requested_task_fields()
+
+    try:
+        await storage.update_task(task_id, description, due_date)
+    except StorageException:
+        abort(404)
+
+    return index_redirect()
+
+
+async def delete_form(storage):
+    task = known_task(await storage.get_task(requested_task_id()))
+
+    return confirm_form_page(task, "Delete", 'delete_task')
+
+
+async def delete_task(storage):
+    await storage.delete_task(requested_task_id())
+
+    return index_redirect()
+
+
+async def complete_form(storage):
+    task = known_task(await storage.get_task(requested_task_id()))
+
+    return confirm_form_page(task, "Complete", 'complete_task')
+
+
+async def complete_task(storage):
+    task_id = requested_task_id()
+
+    known_task(await storage.get_task(task_id))
+
+    try:
+        await storage.complete_task(task_id)
+    except StorageException:
+        """ the task was completed already """
+        abort(409)
+
+    return index_redirect()
+
+
+@conditional
+async def completed(storage):
+    page = requested_page()
+    (after, before, _, page_size) = page
+
+    """ fetch one extra task to know if there is a further page """
+    completed_tasks = await storage.get_completed_tasks(after=after,
+                                                        before=before,
+                                                        limit=page_size + 1)
+
+    return completed_page(completed_tasks, page, await storage.has_archive())
+
+
+""" asynchronous views, by the endpoint of the route they serve """
+VIEWS = {
+    "index": index,
+    "create_form": create_form,
+    "create_task": create_task,
+    "update_form": update_form,
+    "update_task": update_task,
+    "delete_form": delete_form,
+    "delete_task": delete_task,
+    "complete_form": complete_form,
+    "complete_task": complete_task,
+    "completed": completed,
+}
+
+
+def create_app(db, pooled=False, profile="default", denormalize=False,
+               cache=True, db_threads=DB_THREADS):
+    """
+    Creates the ASGI application serving a workfile
+
+    Parameters
+    ----------
+    db : str
+        location of the Worky database
+    pooled : bool
+        keep one long-lived connection per database thread
+    profile : str
+        storage profile
+    denormalize : bool
+        migrate the database to the denormalized layout
+    cache : bool
+        keep the task lists in memory between requests
+    db_threads : int
+        number of threads the database operations are run on
+
+    Returns
+    -------
+    app : AsgiApp
+        the ASGI application
+    """
+    broker = EventBroker()
+
+    """
+    one pooled connection per thread using the storage, so no thread waits:
+    the database threads and the threads of the WSGI fallback
+    """
+    pool_size = db_threads + THREADS if pooled else 0
+
+    with startup.phase("storage construction"):
+        storage = Storage(db, pool_size=pool_size,
+                          profile=profile, denormalize=denormalize,
+                          cache=cache, events=broker.publisher(""),
+                          upgrade=True)
+
+    """ the event stream is served next to the pages """
+    return AsgiApp(AsyncStorage(storage, threads=db_threads), broker)
+
+
+def run(db, host, port, pooled=False, profile="default", denormalize=False,
+        cache=True, template_cache=None, db_threads=DB_THREADS,
+        connection_limit=None, channel_timeout=None):
+    """
+    Serves a workfile with uvicorn, which must be installed separately
+
+    Parameters
+    ----------
+    db : str
+        location of the Worky database
+    host : str
+        host address where the pages are served
+    port : int
+        port where the pages are served
+    pooled : bool
+        keep one long-lived connection per database thread
+    profile : str
+        storage profile
+    denormalize : bool
+        migrate the database to the denormalized layout
+    cache : bool
+        keep the task lists in memory between requests
+    template_cache : str
+        directory where the compiled templates are kept, or None
+    db_threads : int
+        number of threads the database operations are run on
+    connection_limit : int
+        maximum number of simultaneous client connections, or None
+    channel_timeout : int
+        seconds after which an idle keep-alive connection is closed, or None
+
+    Raises
+    ------
+    AsgiException
+        if uvicorn is not installed
+    """
+    with startup.phase("import uvicorn"):
+        try:
+            import uvicorn
+        except ImportError:
+            raise AsgiException("The ASGI mode requires uvicorn: "
+                                "pip install uvicorn")
+
+    if template_cache is not None:
+        set_template_cache(template_cache)
+
+    asgi_app = create_app(db, pooled=pooled, profile=profile,
+                          denormalize=denormalize, cache=cache,
+                          db_threads=db_threads)
+
+    with startup.phase("template compile"):
+        precompile_templates()
+
+    server_args = {}
+
+    if connection_limit is not None:
+        server_args["limit_concurrency"] = connection_limit
+
+    if channel_timeout is not None:
+        server_args["timeout_keep_alive"] = channel_timeout
+
+    startup.report()
+
+    uvicorn.run(asgi_app, host=host, port=port, lifespan="on",
+                log_level="warning", **server_args)
+
+
+class AsgiException(Exception):
+    """
+    ASGI serving exception
+    """
+    pass
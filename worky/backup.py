@@ -0,0 +1,242 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from worky.storage import Storage, StorageException
+from worky.workspace import WorkspaceException
+from worky.config import BACKUP_KEEP
+from contextlib import nullcontext
+from datetime import datetime, UTC
+from pathlib import Path
+from threading import Event, Thread
+import argparse
+import logging
+import re
+import sys
+
+logger = logging.getLogger(__name__)
+
+""" timestamp of a periodic backup, part of its file name """
+BACKUP_TIMESTAMP = "%Y%m%d_%H%M%S"
+
+""" file name of a periodic backup, which is a valid workfile name too """
+BACKUP_NAME = "%s_%s.worky"
+BACKUP_NAME_PATTERN = re.compile("(\\w+)_\\d{8}_\\d{6}\\.worky")
+
+
+""" message reporting a finished backup """
+BACKUP_REPORT = "Backed up %s to %s: %d pages in %.2f s"
+
+
+class PeriodicBackup():
+    """
+    Backs up the served workfiles at a regular interval, in the background.
+    Each backup is a timestamped copy of a workfile, and only the most recent
+    copies are kept. A workfile that did not change since its last backup is
+    not copied again
+    """
+
+    def __init__(self, workfiles, directory, interval, keep=BACKUP_KEEP):
+        """
+        Parameters
+        ----------
+        workfiles : callable
+            returns the (name, storage) pairs to back up, where storage is a
+            context manager giving the Storage of the workfile
+        directory : str
+            directory where the backups are written. Created if it does not
+            exist
+        interval : float
+            seconds between backups
+        keep : int
+            number of backups kept of each workfile
+
+        Raises
+        ------
+        BackupException
+            if the interval or the number of backups kept are invalid
+        """
+        if interval <= 0:
+            raise BackupException("Invalid backup interval: %s" % interval)
+
+        if keep < 1:
+            raise BackupException("Invalid number of backups kept: %d"
+                                  % keep)
+
+        self._workfiles = workfiles
+        self._directory = Path(directory)
+        self._interval = interval
+        self._keep = keep
+        self._versions = {}
+        self._stop = Event()
+        self._thread = None
+
+    @classmethod
+    def of_storage(cls, storage, name, directory, interval, keep=BACKUP_KEEP):
+        """
+        Creates the periodic backup of a single storage
+
+        Parameters
+        ----------
+        storage : Storage
+            storage to back up
+        name : str
+            workfile name, used to name the backups
+        """
+        return cls(lambda: [(name, nullcontext(storage))], directory,
+                   interval, keep)
+
+    @classmethod
+    def of_workspace(cls, workspace, directory, interval, keep=BACKUP_KEEP):
+        """
+        Creates the periodic backup of every workfile of a workspace
+
+        Parameters
+        ----------
+        workspace : Workspace
+            workspace to back up
+        """
+        return cls(lambda: [(name, workspace.storage(name))
+                            for name in workspace.names()],
+                   directory, interval, keep)
+
+    def backup_all(self):
+        """
+        Backs up every changed workfile once
+
+        Returns
+        -------
+        backups : list of pathlib.Path
+            the written backups
+        """
+        self._directory.mkdir(parents=True, exist_ok=True)
+
+        backups = []
+
+        for (name, workfile) in self._workfiles():
+            try:
+                with workfile as storage:
+                    version = storage.get_version()
+
+                    if self._versions.get(name) == version:
+                        continue
+
+                    timestamp = datetime.now(UTC).strftime(BACKUP_TIMESTAMP)
+                    target = self._directory / (BACKUP_NAME
+                                                % (name, timestamp))
+
+                    (pages, seconds) = storage.backup(str(target))
+            except (StorageException, WorkspaceException) as error:
+                """
+                a failed backup, or a workfile removed since it was listed,
+                must not stop the others
+                """
+                logger.error("Backup of %s failed: %s", name, error)
+                continue
+
+            logger.info(BACKUP_REPORT, name, target, pages, seconds)
+
+            self._versions[name] = version
+            backups.append(target)
+
+            self._prune(name)
+
+        return backups
+
+    def _prune(self, name):
+        backups = sorted(path for path in self._directory.iterdir()
+                         if BACKUP_NAME_PATTERN.fullmatch(path.name) and
+                         BACKUP_NAME_PATTERN.fullmatch(path.name)[1] == name)
+
+        for backup in backups[:-self._keep]:
+            backup.unlink()
+
+    def start(self):
+        """
+        Starts backing up in the background
+        """
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name="worky-backup",
+                              daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops backing up, waiting for a running backup to finish
+        """
+        self._stop.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            self.backup_all()
+
+
+def main(argv):
+    """
+    Runs the backup command of worky.py
+
+    Parameters
+    ----------
+    argv : list of str
+        command arguments
+    """
+    arg_parser = argparse.ArgumentParser(prog="worky.py backup",
+                                         description="Copies a Worky "
+                                         "database to another file. Safe to "
+                                         "run while worky is serving the "
+                                         "database, which keeps serving "
+                                         "requests during the copy")
+    arg_parser.add_argument("db", help="location of the Worky database",
+                            type=str)
+    arg_parser.add_argument("target", help="location of the copy. Replaced "
+                            "if it exists", type=str)
+    args = arg_parser.parse_args(argv)
+
+    if not Path(args.db).is_file():
+        arg_parser.error("Database does not exist: %s" % args.db)
+
+    try:
+        storage = Storage(args.db)
+    except StorageException as error:
+        arg_parser.error(str(error))
+
+    try:
+        (pages, seconds) = storage.backup(args.target)
+    except StorageException as error:
+        arg_parser.error(str(error))
+    finally:
+        storage.close()
+
+    print(BACKUP_REPORT % (args.db, args.target, pages, seconds),
+          file=sys.stderr)
+
+
+class BackupException(Exception):
+    """
+    Backup exception
+    """
+    pass
@@ -0,0 +1,157 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import configparser
+
+""" number of waitress worker threads """
+THREADS = 4
+
+""" maximum number of simultaneous client connections """
+CONNECTION_LIMIT = 100
+
+""" maximum number of connections waiting to be accepted by the server """
+BACKLOG = 1024
+
+""" seconds after which an inactive client connection is closed """
+CHANNEL_TIMEOUT = 120
+
+""" default minutes between periodic backups """
+BACKUP_INTERVAL = 60
+
+""" default number of periodic backups kept of each workfile """
+BACKUP_KEEP = 24
+
+""" default maximum number of workfiles of a workspace kept open at once """
+MAX_OPEN = 16
+
+""" default number of seconds an unused workfile of a workspace stays open """
+IDLE_TIMEOUT = 300
+
+""" section of the configuration file holding the server settings """
+SERVER_SECTION = "server"
+
+""" server settings accepted by the configuration file, and their types """
+SERVER_SETTINGS = {
+    "host": str,
+    "port": int,
+    "threads": int,
+    "connection_limit": int,
+    "backlog": int,
+    "channel_timeout": int,
+}
+
+
+def read_config(path):
+    """
+    Reads the server settings of a configuration file, an INI file such as::
+
+        [server]
+        host = 0.0.0.0
+        port = 8080
+        threads = 16
+        connection_limit = 500
+        backlog = 2048
+        channel_timeout = 60
+
+    Every setting is optional
+
+    Parameters
+    ----------
+    path : str
+        location of the configuration file
+
+    Returns
+    -------
+    settings : dict
+        the settings found in the file, converted to their types
+
+    Raises
+    ------
+    ConfigException
+        if the file can not be read, holds unknown settings or invalid
+        values
+    """
+    parser = configparser.ConfigParser()
+
+    try:
+        with open(path) as config_file:
+            parser.read_file(config_file)
+    except (OSError, configparser.Error) as error:
+        raise ConfigException("Invalid configuration file %s: %s"
+                              % (path, error))
+
+    settings = {}
+
+    if not parser.has_section(SERVER_SECTION):
+        return settings
+
+    for (name, value) in parser.items(SERVER_SECTION):
+        setting_type = SERVER_SETTINGS.get(name.replace("-", "_"))
+
+        if setting_type is None:
+            raise ConfigException("Unknown setting in %s: %s" % (path, name))
+
+        try:
+            settings[name.replace("-", "_")] = setting_type(value)
+        except ValueError:
+            raise ConfigException("Invalid value for %s in %s: %s"
+                                  % (name, path, value))
+
+    return settings
+
+
+def validate_server_settings(threads, connection_limit, backlog,
+                             channel_timeout):
+    """
+    Checks that the server settings are usable
+
+    Parameters
+    ----------
+    threads : int
+        number of waitress worker threads
+    connection_limit : int
+        maximum number of simultaneous client connections
+    backlog : int
+        maximum number of connections waiting to be accepted
+    channel_timeout : int
+        seconds after which an inactive connection is closed
+
+    Raises
+    ------
+    ConfigException
+        if any setting is not a positive number
+    """
+    for (name, value) in [("threads", threads),
+                          ("connection limit", connection_limit),
+                          ("backlog", backlog),
+                          ("channel timeout", channel_timeout)]:
+        if value < 1:
+            raise ConfigException("Invalid %s: %d" % (name, value))
+
+
+class ConfigException(Exception):
+    """
+    Configuration exception
+    """
+    pass
@@ -0,0 +1,449 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from worky.workspace import WORKFILE_PREFIX, WORKFILE_NAME
+from contextlib import aclosing
+from threading import Event, Lock, Thread
+from urllib.parse import urlsplit
+import asyncio
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+""" path of the event stream of a workfile, below its script root """
+EVENTS_PATH = "/events"
+
+""" seconds between the comments keeping an idle event stream open """
+HEARTBEAT_INTERVAL = 15
+
+"""
+number of events kept for a client that does not read them fast enough.
+A client falling further behind is disconnected, and reloads its page when
+it connects again
+"""
+EVENT_QUEUE_SIZE = 256
+
+""" seconds a client has to send its request to the event server """
+REQUEST_TIMEOUT = 10
+
+""" maximum size of a request to the event server """
+MAX_REQUEST_SIZE = 8192
+
+""" milliseconds a browser waits before reconnecting to the event stream """
+RETRY_INTERVAL = 2000
+
+HEARTBEAT = b": heartbeat\n\n"
+
+
+def format_event(event, data):
+    """
+    Formats a server-sent event
+
+    Parameters
+    ----------
+    event : str
+        event type
+    data : object
+        event data, sent as JSON
+
+    Returns
+    -------
+    message : bytes
+        the event, as sent on the event stream
+    """
+    return ("event: %s\ndata: %s\n\n"
+            % (event, json.dumps(data, separators=(",", ":")))).encode()
+
+
+class EventBroker():
+    """
+    Delivers the events published on a topic, such as the changes to the
+    tasks of a workfile, to every subscriber of the topic. Events are
+    formatted once, however many clients receive them
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = Lock()
+
+    def subscribe(self, topic, callback):
+        """
+        Subscribes to the events of a topic
+
+        Parameters
+        ----------
+        topic : str
+            topic, the name of a workfile or "" when serving a single one
+        callback : callable
+            called with each formatted event, on the thread publishing it.
+            Must return quickly, without blocking
+        """
+        with self._lock:
+            subscribers = self._subscribers.get(topic, [])
+            self._subscribers[topic] = subscribers + [callback]
+
+    def unsubscribe(self, topic, callback):
+        """
+        Stops delivering the events of a topic to a subscriber
+
+        Parameters
+        ----------
+        topic : str
+            topic subscribed to
+        callback : callable
+            callback given to subscribe
+        """
+        with self._lock:
+            subscribers = [subscriber for subscriber
+                           in self._subscribers.get(topic, [])
+                           if subscriber != callback]
+
+            if subscribers:
+                self._subscribers[topic] = subscribers
+            else:
+                self._subscribers.pop(topic, None)
+
+    def subscriber_count(self, topic):
+        """
+        Get the number of subscribers of a topic
+
+        Returns
+        -------
+        count : int
+            number of subscribers
+        """
+        with self._lock:
+            return len(self._subscribers.get(topic, []))
+
+    def publish(self, topic, event, data):
+        """
+        Publishes an event to the subscribers of a topic. A failing
+        subscriber does not keep the event from the others
+
+        Parameters
+        ----------
+        topic : str
+            topic of the event
+        event : str
+            event type
+        data : object
+            event data, sent as JSON
+        """
+        """ the subscriber lists are replaced, never changed in place """
+        with self._lock:
+            subscribers = self._subscribers.get(topic)
+
+        if not subscribers:
+            return
+
+        message = format_event(event, data)
+
+        for callback in subscribers:
+            try:
+                callback(message)
+            except Exception:
+                logger.exception("Event subscriber failed")
+
+    def publisher(self, topic):
+        """
+        Get a function publishing events to a topic, as taken by the events
+        argument of Storage
+
+        Parameters
+        ----------
+        topic : str
+            topic of the events
+
+        Returns
+        -------
+        publish : callable
+            publishes an event, given its type and data
+        """
+        return lambda event, data: self.publish(topic, event, data)
+
+
+async def stream_events(broker, topic, heartbeat=HEARTBEAT_INTERVAL,
+                        queue_size=EVENT_QUEUE_SIZE):
+    """
+    Generates the event stream of a topic for a client, starting with a
+    hello event. A heartbeat comment is sent while no event is published,
+    so that disconnected clients are noticed. The stream ends if the client
+    falls too far behind
+
+    Parameters
+    ----------
+    broker : EventBroker
+        broker publishing the events
+    topic : str
+        topic of the events
+    heartbeat : float
+        seconds between heartbeats
+    queue_size : int
+        number of events kept while the client is behind
+
+    Returns
+    -------
+    messages : async generator of bytes
+        messages of the event stream
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=queue_size)
+
+    def offer(message):
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            """ the client missed events: make room to end the stream """
+            while not queue.empty():
+                queue.get_nowait()
+
+            queue.put_nowait(None)
+
+    def deliver(message):
+        loop.call_soon_threadsafe(offer, message)
+
+    broker.subscribe(topic, deliver)
+
+    try:
+        yield ("retry: %d\n" % RETRY_INTERVAL).encode() + \
+            format_event("hello", {})
+
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                message = HEARTBEAT
+
+            if message is None:
+                return
+
+            yield message
+    finally:
+        broker.unsubscribe(topic, deliver)
+
+
+def events_topic(path):
+    """
+    Get the topic of an event stream path
+
+    Parameters
+    ----------
+    path : str
+        path of the request, /events for a single workfile and
+        /w/<name>/events for a workfile of a workspace
+
+    Returns
+    -------
+    topic : str
+        topic of the events, or None if the path is not an event stream
+    """
+    if path == EVENTS_PATH:
+        return ""
+
+    if path.startswith(WORKFILE_PREFIX) and path.endswith(EVENTS_PATH):
+        name = path[len(WORKFILE_PREFIX):-len(EVENTS_PATH)]
+
+        if WORKFILE_NAME.fullmatch(name):
+            return name
+
+    return None
+
+
+class EventServer():
+    """
+    Serves the event streams on a port of their own, next to the waitress
+    server. Every stream is a coroutine of a single asyncio event loop, so
+    idle clients hold no thread
+    """
+
+    def __init__(self, broker, host, port, page_port):
+        """
+        Parameters
+        ----------
+        broker : EventBroker
+            broker publishing the events
+        host : str
+            host address where the events are served
+        port : int
+            port where the events are served, or 0 for any free port
+        page_port : int
+            port serving the pages. Only pages served from it may read the
+            event streams from a browser
+        """
+        self._broker = broker
+        self._host = host
+        self.port = port
+        self._page_port = page_port
+        self._loop = None
+        self._stopped = None
+        self._started = Event()
+        self._error = None
+        self._thread = None
+
+    def start(self):
+        """
+        Starts serving in the background, once the port is listening
+
+        Raises
+        ------
+        OSError
+            if the port can not be listened on
+        """
+        self._started.clear()
+        self._thread = Thread(target=asyncio.run, args=(self._serve(),),
+                              name="worky-events", daemon=True)
+        self._thread.start()
+        self._started.wait()
+
+        if self._error is not None:
+            raise self._error
+
+    def stop(self):
+        """
+        Stops serving, closing every event stream
+        """
+        if self._thread is None:
+            return
+
+        self._loop.call_soon_threadsafe(self._stopped.set)
+        self._thread.join()
+        self._thread = None
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+
+        try:
+            server = await asyncio.start_server(self._handle, self._host,
+                                                self.port,
+                                                limit=MAX_REQUEST_SIZE)
+        except OSError as error:
+            self._error = error
+            self._started.set()
+            return
+
+        self.port = server.sockets[0].getsockname()[1]
+        self._started.set()
+
+        async with server:
+            await self._stopped.wait()
+
+            server.close()
+
+            """ ends the streams, which are not awaited by the server """
+            for task in asyncio.all_tasks():
+                if task is not asyncio.current_task():
+                    task.cancel()
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"),
+                                             REQUEST_TIMEOUT)
+            (method, path, headers) = _parse_request(request)
+            topic = events_topic(path)
+
+            if method != "GET" or topic is None:
+                writer.write(b"HTTP/1.1 404 Not Found\r\n"
+                             b"Content-Length: 0\r\nConnection: close\r\n\r\n")
+                await writer.drain()
+                return
+
+            writer.write(self._response_head(headers))
+
+            async with aclosing(stream_events(self._broker,
+                                              topic)) as messages:
+                async for message in messages:
+                    writer.write(message)
+                    await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError,
+                asyncio.LimitOverrunError, ValueError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _response_head(self, headers):
+        """
+        Builds the head of an event stream response. The streams are read
+        by the pages of another port, so a cross-origin read is allowed, but
+        only by pages of the same host on the page port
+
+        Parameters
+        ----------
+        headers : dict
+            request headers, by lower case name
+
+        Returns
+        -------
+        head : bytes
+            response status line and headers
+        """
+        head = ["HTTP/1.1 200 OK", "Content-Type: text/event-stream",
+                "Cache-Control: no-cache", "Connection: close"]
+
+        origin = headers.get("origin")
+        host = headers.get("host")
+
+        if origin is not None and host is not None:
+            origin_url = urlsplit(origin)
+            host_url = urlsplit("//" + host)
+
+            if origin_url.hostname == host_url.hostname and \
+                    origin_url.port == self._page_port:
+                head.append("Access-Control-Allow-Origin: %s" % origin)
+
+        return ("\r\n".join(head) + "\r\n\r\n").encode("latin-1")
+
+
+def _parse_request(request):
+    """
+    Parses the head of an HTTP request
+
+    Parameters
+    ----------
+    request : bytes
+        request line and headers
+
+    Returns
+    -------
+    request : tuple of (str, str, dict)
+        method, path without the query string, and headers by lower case
+        name
+
+    Raises
+    ------
+    ValueError
+        if the request is malformed
+    """
+    lines = request.decode("latin-1").split("\r\n")
+    (method, target, _) = lines[0].split(" ")
+
+    headers = {}
+
+    for line in lines[1:]:
+        if line:
+            (name, value) = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+
+    return (method, target.split("?", 1)[0], headers)
@@ -0,0 +1,460 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from bisect import bisect_left
+from contextvars import ContextVar
+from threading import Lock
+import logging
+import sqlalchemy
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+""" upper bounds of the duration histograms, in seconds """
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                    1, 2.5, 5, 10)
+
+""" upper bounds of the query and row count histograms """
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000,
+                 10000)
+
+""" content type of the Prometheus text exposition format """
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+""" route label of the requests that matched no route """
+UNMATCHED_ROUTE = "unmatched"
+
+""" statistics of the request being served by the current thread """
+_request_stats = ContextVar("worky_request_stats", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"") \
+        .replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=""):
+    labels = ["%s=\"%s\"" % (name, _escape(value))
+              for (name, value) in zip(names, values)]
+
+    if extra:
+        labels.append(extra)
+
+    return "{%s}" % ",".join(labels) if labels else ""
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram():
+    """
+    Distribution of observed values, such as durations, by label values.
+    Not thread safe: Metrics serializes the updates
+    """
+
+    def __init__(self, name, description, labels=(),
+                 buckets=DURATION_BUCKETS):
+        """
+        Parameters
+        ----------
+        name : str
+            metric name
+        description : str
+            help text of the metric
+        labels : tuple of str
+            label names
+        buckets : tuple of float
+            increasing upper bounds of the buckets, without +Inf
+        """
+        self.name = name
+        self.description = description
+        self._labels = labels
+        self._buckets = buckets
+        self._series = {}
+
+    def observe(self, label_values, value):
+        """
+        Records a value
+
+        Parameters
+        ----------
+        label_values : tuple of str
+            values of the labels, in order
+        value : float
+            observed value
+        """
+        series = self._series.get(label_values)
+
+        if series is None:
+            """ bucket counts, with the +Inf bucket last, sum and count """
+            series = [[0] * (len(self._buckets) + 1), 0, 0]
+            self._series[label_values] = series
+
+        series[0][bisect_left(self._buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def count(self, label_values):
+        """ number of values recorded with the given label values """
+        series = self._series.get(label_values)
+
+        return 0 if series is None else series[2]
+
+    def expose(self):
+        """
+        Get the histogram in the Prometheus text exposition format
+
+        Returns
+        -------
+        lines : list of str
+            exposition lines
+        """
+        lines = ["# HELP %s %s" % (self.name, self.description),
+                 "# TYPE %s histogram" % self.name]
+
+        for (label_values, (buckets, total, count)) in \
+                sorted(self._series.items()):
+            cumulative = 0
+
+            for (bound, bucket) in zip(self._buckets + ("+Inf",), buckets):
+                cumulative += bucket
+                le = "le=\"%s\"" % (bound if isinstance(bound, str)
+                                    else _format_value(float(bound)))
+                lines.append("%s_bucket%s %d" % (
+                    self.name, _format_labels(self._labels, label_values, le),
+                    cumulative))
+
+            labels = _format_labels(self._labels, label_values)
+            lines.append("%s_sum%s %s" % (self.name, labels,
+                                          _format_value(total)))
+            lines.append("%s_count%s %d" % (self.name, labels, count))
+
+        return lines
+
+
+class Counter():
+    """
+    Counts of events by label values. Not thread safe: Metrics serializes
+    the updates
+    """
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self._labels = labels
+        self._series = {}
+
+    def inc(self, label_values):
+        """ counts an event with the given label values """
+        self._series[label_values] = self._series.get(label_values, 0) + 1
+
+    def count(self, label_values):
+        """ number of events counted with the given label values """
+        return self._series.get(label_values, 0)
+
+    def expose(self):
+        """ Get the counter in the Prometheus text exposition format """
+        lines = ["# HELP %s %s" % (self.name, self.description),
+                 "# TYPE %s counter" % self.name]
+
+        for (label_values, count) in sorted(self._series.items()):
+            lines.append("%s%s %d" % (self.name,
+                                      _format_labels(self._labels,
+                                                     label_values), count))
+
+        return lines
+
+
+class RequestStats():
+    """
+    Where the time of a request went
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.rows = 0
+        self.sql_seconds = 0.0
+        self.database_seconds = 0.0
+        self.render_seconds = 0.0
+        self.render_start = None
+
+
+class _RowCountingCursor(sqlite3.Cursor):
+    """
+    Cursor counting the rows fetched by the request being served
+    """
+
+    def fetchone(self):
+        row = super().fetchone()
+
+        if row is not None:
+            _count_rows(1)
+
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = super().fetchmany(*args, **kwargs)
+        _count_rows(len(rows))
+
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        _count_rows(len(rows))
+
+        return rows
+
+
+class RowCountingConnection(sqlite3.Connection):
+    """
+    SQLite connection whose cursors count the rows they fetch, as SQLAlchemy
+    offers no event once the rows of a statement are fetched
+    """
+
+    def cursor(self, factory=_RowCountingCursor):
+        return super().cursor(factory)
+
+
+def _count_rows(rows):
+    stats = _request_stats.get()
+
+    if stats is not None:
+        stats.rows += rows
+
+
+class Metrics():
+    """
+    Collects the latency of the requests and where it went: SQL statements,
+    rows fetched, time the database connections were held (which includes
+    turning the rows into objects) and template rendering. The statistics
+    of a request are recorded by the thread serving it, between
+    start_request and finish_request
+    """
+
+    def __init__(self, slow_request=None):
+        """
+        Parameters
+        ----------
+        slow_request : float
+            milliseconds from which a request is logged as a warning along
+            with where its time went. Disabled if None
+
+        Raises
+        ------
+        MetricsException
+            if the slow request threshold is not positive
+        """
+        if slow_request is not None and slow_request <= 0:
+            raise MetricsException("Invalid slow request threshold: %s"
+                                   % slow_request)
+
+        self._slow_request = slow_request
+        self._lock = Lock()
+
+        self.requests = Counter("worky_requests_total", "Requests served",
+                                ("route", "method", "status"))
+        self.request_duration = Histogram(
+            "worky_request_duration_seconds", "Time to serve a request",
+            ("route", "method"))
+        self.request_queries = Histogram(
+            "worky_request_queries", "SQL statements run per request",
+            ("route",), COUNT_BUCKETS)
+        self.request_rows = Histogram(
+            "worky_request_rows", "Rows fetched from the database per "
+            "request", ("route",), COUNT_BUCKETS)
+        self.request_sql = Histogram(
+            "worky_request_sql_seconds", "Time spent running SQL statements "
+            "per request", ("route",))
+        self.request_database = Histogram(
+            "worky_request_database_seconds", "Time database connections "
+            "were held per request, including turning rows into objects",
+            ("route",))
+        self.request_render = Histogram(
+            "worky_request_render_seconds", "Time spent rendering templates "
+            "per request", ("route",))
+        self.query_duration = Histogram(
+            "worky_query_duration_seconds", "Time to run a SQL statement, by "
+            "statement type", ("statement",))
+
+        self._metrics = [self.requests, self.request_duration,
+                         self.request_queries, self.request_rows,
+                         self.request_sql, self.request_database,
+                         self.request_render, self.query_duration]
+
+    def engine_args(self):
+        """
+        Get the arguments of sqlalchemy.create_engine that make the
+        connections count the rows they fetch
+
+        Returns
+        -------
+        engine_args : dict
+            keyword arguments of sqlalchemy.create_engine
+        """
+        return {"connect_args": {"factory": RowCountingConnection}}
+
+    def instrument(self, engine):
+        """
+        Records the statements run through an engine and the time its
+        connections are held
+
+        Parameters
+        ----------
+        engine : sqlalchemy.engine.Engine
+            engine to instrument
+        """
+        sqlalchemy.event.listen(engine, "before_cursor_execute",
+                                self._before_execute)
+        sqlalchemy.event.listen(engine, "after_cursor_execute",
+                                self._after_execute)
+        sqlalchemy.event.listen(engine, "checkout", self._checkout)
+        sqlalchemy.event.listen(engine, "checkin", self._checkin)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context,
+                        executemany):
+        conn.info.setdefault("worky_query_start", []).append(
+            time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context,
+                       executemany):
+        seconds = time.perf_counter() - conn.info["worky_query_start"].pop()
+        statement_type = statement.lstrip().split(None, 1)[0].upper() \
+            if statement.strip() else "OTHER"
+
+        with self._lock:
+            self.query_duration.observe((statement_type,), seconds)
+
+        stats = _request_stats.get()
+
+        if stats is not None:
+            stats.queries += 1
+            stats.sql_seconds += seconds
+
+    def _checkout(self, dbapi_connection, connection_record,
+                  connection_proxy):
+        connection_record.info["worky_checkout"] = time.perf_counter()
+
+    def _checkin(self, dbapi_connection, connection_record):
+        checkout = connection_record.info.pop("worky_checkout", None)
+        stats = _request_stats.get()
+
+        if checkout is not None and stats is not None:
+            stats.database_seconds += time.perf_counter() - checkout
+
+    def start_request(self):
+        """
+        Starts recording the statistics of a request served by the current
+        thread
+
+        Returns
+        -------
+        token : contextvars.Token
+            to be given to finish_request
+        """
+        return _request_stats.set(RequestStats())
+
+    def render_started(self):
+        """ Marks the start of the rendering of a template """
+        stats = _request_stats.get()
+
+        if stats is not None:
+            stats.render_start = time.perf_counter()
+
+    def render_finished(self):
+        """ Marks the end of the rendering of a template """
+        stats = _request_stats.get()
+
+        if stats is not None and stats.render_start is not None:
+            stats.render_seconds += time.perf_counter() - stats.render_start
+            stats.render_start = None
+
+    def finish_request(self, token, route, method, status, target=None):
+        """
+        Records the statistics of the request served by the current thread
+
+        Parameters
+        ----------
+        token : contextvars.Token
+            given by start_request
+        route : str
+            route of the request, or None if it matched no route
+        method : str
+            HTTP method of the request
+        status : int
+            HTTP status of the response
+        target : str
+            requested path and query, shown in the slow request log
+        """
+        stats = _request_stats.get()
+        _request_stats.reset(token)
+
+        if stats is None:
+            return
+
+        seconds = time.perf_counter() - stats.start
+        route = UNMATCHED_ROUTE if route is None else route
+
+        with self._lock:
+            self.requests.inc((route, method, str(status)))
+            self.request_duration.observe((route, method), seconds)
+            self.request_queries.observe((route,), stats.queries)
+            self.request_rows.observe((route,), stats.rows)
+            self.request_sql.observe((route,), stats.sql_seconds)
+            self.request_database.observe((route,), stats.database_seconds)
+            self.request_render.observe((route,), stats.render_seconds)
+
+        if self._slow_request is not None and \
+                seconds * 1000 >= self._slow_request:
+            logger.warning("Slow request %s %s: %.1f ms, status %s, %d "
+                           "queries in %.1f ms, %d rows, database %.1f ms, "
+                           "rendering %.1f ms", method, target or route,
+                           seconds * 1000, status, stats.queries,
+                           stats.sql_seconds * 1000, stats.rows,
+                           stats.database_seconds * 1000,
+                           stats.render_seconds * 1000)
+
+    def expose(self):
+        """
+        Get every metric in the Prometheus text exposition format
+
+        Returns
+        -------
+        text : str
+            the metrics, to be served with CONTENT_TYPE
+        """
+        with self._lock:
+            lines = [line for metric in self._metrics
+                     for line in metric.expose()]
+
+        return "\n".join(lines) + "\n"
+
+
+class MetricsException(Exception):
+    """
+    Metrics exception
+    """
+    pass
@@ -27,6 +27,33 @@ from worky.models.page_model import PageModel
 
 class CompletedModel(PageModel):
     show_active_button_id = "show_active"
-
-    def __init__(self, completed_tasks):
+    newer_page_button_id = "newer_page"
+    older_page_button_id = "older_page"
+    show_archive_button_id = "show_archive"
+    show_completed_button_id = "show_completed"
+
+    def __init__(self, completed_tasks, newer_page=None, older_page=None,
+                 archive_page=None):
+        """
+        newer_page and older_page are either the page links or, when the
+        tasks are streamed, callables returning them once the tasks were
+        rendered. archive_page links to the archived tasks, if any
+        """
         self.completed_tasks = completed_tasks
+        self.archive_page = archive_page
+        self._newer_page = newer_page
+        self._older_page = older_page
+
+    @property
+    def newer_page(self):
+        if callable(self._newer_page):
+            return self._newer_page()
+
+        return self._newer_page
+
+    @property
+    def older_page(self):
+        if callable(self._older_page):
+            return self._older_page()
+
+        return self._older_page
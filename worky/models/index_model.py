@@ -28,6 +28,11 @@ from worky.models.page_model import PageModel
 class IndexModel(PageModel):
     show_completed_button_id = "show_completed"
 
-    def __init__(self, active_tasks, overdue_tasks):
+    def __init__(self, active_tasks, overdue_tasks, events_url=None):
+        """
+        events_url is the event stream through which the page is kept up to
+        date, or None
+        """
         self.active_tasks = active_tasks
         self.overdue_tasks = overdue_tasks
+        self.events_url = events_url
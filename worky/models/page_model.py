@@ -26,3 +26,5 @@ SOFTWARE.
 class PageModel():
     create_task_button_id = "create_task"
     task_table_id = "tasks"
+    search_form_id = "search"
+    search_query = ""
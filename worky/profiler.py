@@ -0,0 +1,180 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from pathlib import Path
+from threading import Lock
+import cProfile
+import pstats
+
+""" number of functions listed per route on the profiles page """
+TOP_FUNCTIONS = 30
+
+""" suffix of the profile dumps, one per route """
+PROFILE_SUFFIX = ".prof"
+
+
+class RequestProfiler():
+    """
+    Profiles the requests with cProfile and aggregates their profiles by
+    route. The aggregated profile of each route is dumped to a file of its
+    own, <route>.prof, readable with python -m pstats, and replaced after
+    every profiled request of the route.
+
+    Requests are served one at a time while profiling. From Python 3.12 a
+    profiler records the functions run by every thread, so a request served
+    alongside the profiled one would be counted in its profile. Functions run
+    meanwhile by background threads, such as periodic backups, may still be
+    counted
+    """
+
+    def __init__(self, directory):
+        """
+        Parameters
+        ----------
+        directory : str
+            directory where the profiles are dumped. Created if it does not
+            exist. The dumps of a previous run are replaced
+        """
+        self._directory = Path(directory)
+        self._directory.mkdir(parents=True, exist_ok=True)
+
+        """ held while a request is being served """
+        self._serving = Lock()
+        self._lock = Lock()
+
+        """ aggregated profile and number of requests, by route """
+        self._routes = {}
+
+    @property
+    def directory(self):
+        return self._directory
+
+    def start(self, route):
+        """
+        Waits for the request being served, if any, and starts serving a
+        request on the current thread. Every request must be started, even
+        those that are not profiled, and then finished
+
+        Parameters
+        ----------
+        route : str
+            route of the request, or None if it is not profiled
+
+        Returns
+        -------
+        profile : cProfile.Profile
+            to be given to finish, or None if the request is not profiled
+        """
+        self._serving.acquire()
+
+        if route is None:
+            return None
+
+        profile = cProfile.Profile()
+
+        try:
+            profile.enable()
+        except ValueError:
+            """ another profiler, such as a debugger, is active """
+            return None
+
+        return profile
+
+    def finish(self, profile, route):
+        """
+        Finishes serving a request and adds its profile to its route
+
+        Parameters
+        ----------
+        profile : cProfile.Profile
+            given by start, or None
+        route : str
+            route of the request, used as the name of its dump
+        """
+        if profile is not None:
+            profile.disable()
+
+        self._serving.release()
+
+        if profile is None:
+            return
+
+        with self._lock:
+            if route in self._routes:
+                (stats, requests) = self._routes[route]
+                stats.add(profile)
+            else:
+                (stats, requests) = (pstats.Stats(profile), 0)
+
+            self._routes[route] = (stats, requests + 1)
+
+            stats.dump_stats(self._directory / (route + PROFILE_SUFFIX))
+
+    def routes(self):
+        """
+        Get the profiled routes
+
+        Returns
+        -------
+        routes : list of tuple of (str, int, float)
+            name, number of profiled requests and profiled seconds of each
+            route, slowest first
+        """
+        with self._lock:
+            routes = [(route, requests, stats.total_tt)
+                      for (route, (stats, requests)) in self._routes.items()]
+
+        return sorted(routes, key=lambda route: route[2], reverse=True)
+
+    def functions(self, route, limit=TOP_FUNCTIONS):
+        """
+        Get the functions of a route taking the most cumulative time
+
+        Parameters
+        ----------
+        route : str
+            profiled route
+        limit : int
+            maximum number of functions
+
+        Returns
+        -------
+        functions : list of tuple of (str, int, float, float)
+            location, number of calls, own seconds and cumulative seconds of
+            each function, or None if the route was not profiled
+        """
+        with self._lock:
+            if route not in self._routes:
+                return None
+
+            (stats, _) = self._routes[route]
+
+            functions = [(pstats.func_std_string(function), calls, own,
+                          cumulative)
+                         for (function, (_, calls, own, cumulative, _))
+                         in stats.stats.items()]
+
+        functions.sort(key=lambda function: function[3], reverse=True)
+
+        return functions[:limit]
@@ -22,35 +22,644 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-from flask import Flask, request, redirect
-from flask.templating import render_template
+from flask import Flask, request, redirect, url_for, make_response, abort
+from flask import jsonify, g, before_render_template, template_rendered
+from flask import has_request_context
+from flask.templating import render_template, stream_template
+from jinja2 import FileSystemBytecodeCache
 from datetime import datetime, timedelta, UTC
 from worky.models.index_model import IndexModel
 from worky.models.completed_model import CompletedModel
 from worky.models.create_task_model import CreateTaskModel
 from worky.models.update_task_model import UpdateTaskModel
 from worky.models.confirm_form_model import ConfirmFormModel
-from worky.storage import Storage
-from waitress import serve
+from worky.models.workspace_model import WorkspaceModel
+from worky.models.search_model import SearchModel
+from worky.models.profiles_model import ProfilesModel
+from worky.storage import Storage, StorageException
+from worky.workspace import Workspace, WorkspaceMiddleware
+from worky.workspace import STORAGE_KEY, WORKFILE_PREFIX
+from worky import startup
+from worky.config import THREADS, CONNECTION_LIMIT, BACKLOG, CHANNEL_TIMEOUT
+from worky.config import BACKUP_INTERVAL, BACKUP_KEEP, MAX_OPEN, IDLE_TIMEOUT
+from worky.config import validate_server_settings
+from worky.backup import PeriodicBackup
+from worky.events import EventBroker, EventServer, EVENTS_PATH
+from worky.metrics import Metrics, CONTENT_TYPE
+from worky.profiler import RequestProfiler
+from functools import wraps
+from pathlib import Path
+from urllib.parse import urlsplit
+import logging
+import os
+import sys
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
+""" default and maximum number of tasks per completed tasks page """
+COMPLETED_PAGE_SIZE = 100
+MAX_COMPLETED_PAGE_SIZE = 1000
+
+""" key of the request environ holding the settings of the ASGI application """
+SETTINGS_KEY = "worky.settings"
+
+""" range of the task ids, which SQLite stores as 64-bit integers """
+MIN_TASK_ID = -2 ** 63
+MAX_TASK_ID = 2 ** 63 - 1
+
+""" format of the due dates, the only one the storage accepts """
+DUE_DATE_FORMAT = '%Y-%m-%d'
+
+
+def default_template_cache_dir():
+    """
+    Get the user cache directory where the compiled templates are kept
+
+    Returns
+    -------
+    directory : pathlib.Path
+        template cache directory
+    """
+    if sys.platform.startswith("win32"):
+        cache_dir = os.getenv("LOCALAPPDATA", Path.home() / "AppData" /
+                              "Local")
+    else:
+        cache_dir = os.getenv("XDG_CACHE_HOME", Path.home() / ".cache")
+
+    return Path(cache_dir) / "worky" / "templates"
+
+
+def set_template_cache(directory):
+    """
+    Keeps the compiled templates in the given directory, so they are only
+    compiled again when they change instead of on every launch
+
+    Parameters
+    ----------
+    directory : str or pathlib.Path
+        template cache directory. Created if it does not exist. If it can
+        not be created, the templates are compiled on every launch
+    """
+    try:
+        Path(directory).mkdir(parents=True, exist_ok=True)
+    except OSError as error:
+        """ the cache only speeds up the launch, so do without it """
+        logger.warning("Template cache disabled: %s", error)
+
+        app.jinja_env.bytecode_cache = None
+
+        return
+
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(str(directory))
+
+
+def precompile_templates():
+    """
+    Compiles every template of the application, filling the template cache
+
+    Returns
+    -------
+    templates : list of str
+        names of the compiled templates
+    """
+    templates = app.jinja_env.list_templates(extensions=["html"])
+
+    for template in templates:
+        app.jinja_env.get_template(template)
+
+    return templates
+
+
+def run(db, host, port, pooled=False, profile="default", denormalize=False,
+        streaming=False, cache=True, template_cache=None, max_open=MAX_OPEN,
+        idle_timeout=IDLE_TIMEOUT, threads=THREADS,
+        connection_limit=CONNECTION_LIMIT, backlog=BACKLOG,
+        channel_timeout=CHANNEL_TIMEOUT, backup_dir=None,
+        backup_interval=BACKUP_INTERVAL, backup_keep=BACKUP_KEEP,
+        events_port=None, metrics=False, slow_request=None,
+        profile_dir=None):
+    validate_server_settings(threads, connection_limit, backlog,
+                             channel_timeout)
+
+    """
+    one pooled connection per thread using the storage, so no thread waits:
+    the worker threads and the periodic backup thread
+    """
+    pool_size = threads + (backup_dir is not None) if pooled else 0
+
+    with startup.phase("import waitress"):
+        """ only needed to serve, so it is not imported with the module """
+        from waitress import serve
+
+    if template_cache is not None:
+        set_template_cache(template_cache)
+
+    """ the served workfiles are upgraded, so that they can be searched """
+    storage_args = {"pool_size": pool_size, "profile": profile,
+                    "denormalize": denormalize, "cache": cache,
+                    "upgrade": True}
+
+    """
+    waitress holds a thread for as long as a response is being sent, so the
+    event streams are served by an event loop on a port of their own
+    """
+    broker = EventBroker() if events_port is not None else None
+
+    """ requests are only instrumented if their statistics are used """
+    if metrics or slow_request is not None:
+        storage_args["metrics"] = Metrics(slow_request)
+
+    if Path(db).is_dir():
+        """ serve every workfile of the directory, opened on demand """
+        storage = Workspace(db, max_open=max_open,
+                            idle_timeout=idle_timeout, events=broker,
+                            **storage_args)
+        storage.start()
+
+        app.config['STORAGE'] = None
+        app.config['WORKSPACE'] = storage
+
+        application = WorkspaceMiddleware(app, storage)
+
+        if backup_dir is not None:
+            backup = PeriodicBackup.of_workspace(storage, backup_dir,
+                                                 backup_interval * 60,
+                                                 backup_keep)
+    else:
+        if broker is not None:
+            storage_args["events"] = broker.publisher("")
+
+        with startup.phase("storage construction"):
+            storage = Storage(db, **storage_args)
+
+        app.config['STORAGE'] = storage
+        app.config['WORKSPACE'] = None
+
+        application = app
+
+        if backup_dir is not None:
+            backup = PeriodicBackup.of_storage(storage, Path(db).stem,
+                                               backup_dir,
+                                               backup_interval * 60,
+                                               backup_keep)
+
+    app.config['STREAMING'] = streaming
+    app.config['EVENTS'] = broker is not None
+    app.config['EVENTS_PORT'] = events_port
+    app.config['METRICS'] = storage_args.get("metrics")
+    app.config['METRICS_ENDPOINT'] = metrics
+    app.config['PROFILER'] = (RequestProfiler(profile_dir)
+                              if profile_dir is not None else None)
+
+    with startup.phase("template compile"):
+        """ compile before serving, instead of on the first page load """
+        precompile_templates()
+
+    startup.report()
+
+    if broker is not None:
+        event_server = EventServer(broker, host, events_port, port)
+        event_server.start()
+
+    if backup_dir is not None:
+        backup.start()
+
+    try:
+        serve(application, host=host, port=port, threads=threads,
+              connection_limit=connection_limit, backlog=backlog,
+              channel_timeout=channel_timeout)
+    finally:
+        if backup_dir is not None:
+            backup.stop()
+
+        if broker is not None:
+            event_server.stop()
+
+        storage.close()
+
+
+def get_setting(name):
+    """
+    Get a setting of the request being served: from the settings given with
+    the request by the ASGI application, which does not share the settings
+    of the Flask application, or else from the Flask application config
+
+    Parameters
+    ----------
+    name : str
+        setting name, such as 'STREAMING'
+
+    Returns
+    -------
+    value : object
+        the setting value, or None if it is not set
+    """
+    settings = app.config
+
+    if has_request_context():
+        settings = request.environ.get(SETTINGS_KEY, settings)
+
+    return settings.get(name)
+
+
+def get_storage():
+    """
+    Get the storage of the requested workfile: the one picked by the
+    workspace middleware, or else the single storage being served
+
+    Returns
+    -------
+    storage : Storage
+        storage of the requested workfile
+
+    Raises
+    ------
+    werkzeug.exceptions.NotFound
+        if no workfile was requested from a workspace
+    """
+    storage = request.environ.get(STORAGE_KEY, get_setting('STORAGE'))
+
+    if storage is None:
+        abort(404)
+
+    return storage
+
+
+def events_url():
+    """
+    Get the URL of the event stream of the requested workfile, which is
+    served on the events port when serving with waitress, or next to the
+    pages otherwise
+
+    Returns
+    -------
+    url : str
+        URL of the event stream, or None if events are not served
+    """
+    if not get_setting('EVENTS'):
+        return None
+
+    path = request.script_root + EVENTS_PATH
+    events_port = get_setting('EVENTS_PORT')
+
+    if events_port is None:
+        return path
+
+    hostname = urlsplit("//" + request.host).hostname
+
+    if ":" in hostname:
+        hostname = "[%s]" % hostname
+
+    return "//%s:%d%s" % (hostname, events_port, path)
+
+
+@app.before_request
+def start_request_metrics():
+    metrics = get_setting('METRICS')
+
+    if metrics is not None:
+        g.metrics_token = metrics.start_request()
+
+
+@app.after_request
+def record_response_status(response):
+    if get_setting('METRICS') is not None:
+        g.metrics_status = response.status_code
+
+    return response
+
+
+@app.teardown_request
+def finish_request_metrics(error):
+    """
+    runs once the response was sent, so a streamed page is fully measured
+    """
+    metrics = get_setting('METRICS')
+    token = g.pop('metrics_token', None)
+
+    if metrics is None or token is None:
+        return
+
+    route = request.url_rule.rule if request.url_rule is not None else None
+    status = g.pop('metrics_status', 500)
+
+    metrics.finish_request(token, route, request.method, status,
+                           request.full_path.rstrip("?"))
+
+
+@before_render_template.connect_via(app)
+def start_render_metrics(sender, **extra):
+    metrics = get_setting('METRICS')
+
+    if metrics is not None:
+        metrics.render_started()
+
+
+@template_rendered.connect_via(app)
+def finish_render_metrics(sender, **extra):
+    metrics = get_setting('METRICS')
+
+    if metrics is not None:
+        metrics.render_finished()
+
+
+""" endpoints that are not profiled """
+UNPROFILED_ENDPOINTS = [None, 'static', 'debug_profiles']
 
-def run(db, host, port):
-    app.config['STORAGE'] = Storage(db)
-    serve(app, host=host, port=port)
+
+@app.before_request
+def start_request_profile():
+    """
+    every request is started, even if not profiled, so that none runs
+    alongside a profiled one
+    """
+    profiler = get_setting('PROFILER')
+
+    if profiler is not None:
+        profiled = request.endpoint not in UNPROFILED_ENDPOINTS
+
+        g.profile = profiler.start(request.endpoint if profiled else None)
+
+
+@app.teardown_request
+def finish_request_profile(error):
+    profiler = get_setting('PROFILER')
+
+    if profiler is not None and 'profile' in g:
+        profiler.finish(g.pop('profile'), request.endpoint)
+
+
+@app.route('/debug/profiles')
+def debug_profiles():
+    profiler = get_setting('PROFILER')
+
+    if profiler is None:
+        abort(404)
+
+    route = request.args.get('route')
+
+    routes = [(name, requests, seconds * 1000 / requests,
+               url_for('debug_profiles', route=name))
+              for (name, requests, seconds) in profiler.routes()]
+
+    functions = None
+
+    if route is not None:
+        functions = profiler.functions(route)
+
+        if functions is None:
+            abort(404)
+
+        functions = [(location, calls, own * 1000, cumulative * 1000)
+                     for (location, calls, own, cumulative) in functions]
+
+    profiles_model = ProfilesModel(str(profiler.directory), routes, route,
+                                   functions)
+
+    return render_template("profiles.html", model=profiles_model)
+
+
+@app.route('/metrics')
+def expose_metrics():
+    metrics = get_setting('METRICS')
+
+    if metrics is None or not get_setting('METRICS_ENDPOINT'):
+        abort(404)
+
+    return app.response_class(metrics.expose(), content_type=CONTENT_TYPE)
+
+
+def not_modified(etag):
+    """
+    Get the "304 Not Modified" answer to a browser that already has the
+    current version of a page
+
+    Parameters
+    ----------
+    etag : str
+        current version of the page
+
+    Returns
+    -------
+    response : flask.Response
+        the answer, or None if the page has to be sent
+    """
+    if request.if_none_match.contains(etag):
+        return app.response_class(status=304)
+
+    return None
+
+
+def versioned(response, etag):
+    """
+    Tags a page with its version, which the browser has to check again
+    before showing its copy
+
+    Parameters
+    ----------
+    response : flask.Response
+        the page, or the "304 Not Modified" answer
+    etag : str
+        current version of the page
+
+    Returns
+    -------
+    response : flask.Response
+        the tagged response
+    """
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+
+    return response
+
+
+def conditional(view):
+    """
+    Serves a page only if the storage changed since the browser last got
+    it, answering with "304 Not Modified" otherwise
+
+    Parameters
+    ----------
+    view : callable
+        Flask view rendering the page from the storage
+
+    Returns
+    -------
+    view : callable
+        the wrapped view
+    """
+    @wraps(view)
+    def conditional_view(*args, **kwargs):
+        storage = get_storage()
+
+        """ read before rendering, so a concurrent change is not missed """
+        etag = storage.get_version()
+
+        response = not_modified(etag)
+
+        if response is None:
+            response = make_response(view(*args, **kwargs))
+
+        return versioned(response, etag)
+
+    return conditional_view
+
+
+def index_page(overdue_tasks, active_tasks, render=render_template):
+    """
+    Renders the TODO page
+
+    Parameters
+    ----------
+    overdue_tasks : list or TaskStream of Tasks
+        active overdue tasks
+    active_tasks : list or TaskStream of Tasks
+        active tasks
+    render : callable
+        render_template, or stream_template to stream the page
+    """
+    index_model = IndexModel(active_tasks, overdue_tasks, events_url())
+
+    return render("index.html", model=index_model)
 
 
 @app.route('/')
 def index():
-    storage = app.config['STORAGE']
+    workspace = get_setting('WORKSPACE')
+
+    if workspace is not None and STORAGE_KEY not in request.environ:
+        workfiles = [(name, request.script_root + WORKFILE_PREFIX + name +
+                      "/") for name in workspace.names()]
+
+        return render_template("workspace.html",
+                               model=WorkspaceModel(workfiles))
+
+    return tasks()
+
+
+@conditional
+def tasks():
+    storage = get_storage()
+
+    if get_setting('STREAMING'):
+        (overdue_tasks, active_tasks) = storage.iter_index_view()
+
+        return index_page(overdue_tasks, active_tasks, stream_template)
+
+    (overdue_tasks, active_tasks) = storage.get_index_view()
 
-    overdue_tasks = storage.get_overdue_tasks()
-    active_tasks = storage.get_active_tasks()
+    return index_page(overdue_tasks, active_tasks)
 
-    index_model = IndexModel(active_tasks, overdue_tasks)
 
-    return render_template("index.html", model=index_model)
+def requested_task_id():
+    """
+    Get the id of the task a page or form acts on
+
+    Returns
+    -------
+    task_id : int
+        the task id
+
+    Raises
+    ------
+    werkzeug.exceptions.BadRequest
+        if the id is missing or is not an integer that SQLite can store
+    """
+    task_id = request.args.get('id', type=int)
+
+    if task_id is None or not MIN_TASK_ID <= task_id <= MAX_TASK_ID:
+        abort(400)
+
+    return task_id
+
+
+def requested_task_fields():
+    """
+    Get the fields of a task sent by the create and update forms
+
+    Returns
+    -------
+    fields : tuple of (str, str)
+        description and due date
+
+    Raises
+    ------
+    werkzeug.exceptions.BadRequest
+        if the description is missing or the due date is missing or invalid
+    """
+    description = request.args.get('description')
+    due_date = request.args.get('dueDate')
+
+    if not description:
+        abort(400)
+
+    try:
+        datetime.strptime(due_date, DUE_DATE_FORMAT)
+    except (TypeError, ValueError):
+        abort(400)
+
+    return (description, due_date)
+
+
+def known_task(task):
+    """
+    Checks that the task a page or form acts on exists
+
+    Parameters
+    ----------
+    task : Tasks
+        the task, or None if it does not exist
+
+    Returns
+    -------
+    task : Tasks
+        the task
+
+    Raises
+    ------
+    werkzeug.exceptions.NotFound
+        if the task does not exist
+    """
+    if task is None:
+        abort(404)
+
+    return task
+
+
+def index_redirect():
+    """ Sends the browser back to the TODO page after a change """
+    return redirect(url_for('index'), code=302)
+
+
+def update_form_page(task):
+    """
+    Renders the form updating a task
+    """
+    update_task_model = UpdateTaskModel(url_for('update_task'),
+                                        task.due_date, task)
+
+    return render_template("updateTask.html", model=update_task_model)
+
+
+def confirm_form_page(task, action, endpoint):
+    """
+    Renders the form confirming an action on a task
+
+    Parameters
+    ----------
+    task : Tasks
+        the task
+    action : str
+        name of the action, shown on the form
+    endpoint : str
+        endpoint the form is sent to
+    """
+    confirm_model = ConfirmFormModel(url_for(endpoint), task.due_date, task,
+                                     action)
+
+    return render_template("confirmForm.html", model=confirm_model)
 
 
 @app.route('/createForm')
@@ -59,107 +668,610 @@ def create_form():
     default_due_date = datetime.now(UTC) + timedelta(weeks=2)
     default_due_date = datetime.strftime(default_due_date, '%Y-%m-%d')
 
-    create_task_model = CreateTaskModel("/createTask", default_due_date)
+    create_task_model = CreateTaskModel(url_for('create_task'),
+                                        default_due_date)
 
     return render_template("createTask.html", model=create_task_model)
 
 
 @app.route('/createTask')
 def create_task():
-    storage = app.config['STORAGE']
+    storage = get_storage()
 
-    description = request.args.get('description')
-    due_date = request.args.get('dueDate')
+    (description, due_date) = requested_task_fields()
 
     storage.create_task(description, due_date)
 
-    return redirect("/", code=302)
+    return index_redirect()
 
 
 @app.route('/updateForm')
 def update_form():
-    storage = app.config['STORAGE']
-
-    task_id = request.args.get('id')
+    storage = get_storage()
 
-    task = storage.get_task(task_id)
+    task = known_task(storage.get_task(requested_task_id()))
 
-    update_task_model = UpdateTaskModel("/updateTask", task.due_date, task)
-
-    return render_template("updateTask.html", model=update_task_model)
+    return update_form_page(task)
 
 
 @app.route('/updateTask')
 def update_task():
-    storage = app.config['STORAGE']
+    storage = get_storage()
 
-    task_id = request.args.get('id')
-    description = request.args.get('description')
-    due_date = request.args.get('dueDate')
+    task_id = requested_task_id()
+    (description, due_date) = requested_task_fields()
 
-    storage.update_task(task_id, description, due_date)
+    try:
+        storage.update_task(task_id, description, due_date)
+    except StorageException:
+        abort(404)
 
-    return redirect("/", code=302)
+    return index_redirect()
 
 
 @app.route('/deleteForm')
 def delete_form():
-    storage = app.config['STORAGE']
-
-    task_id = request.args.get('id')
+    storage = get_storage()
 
-    task = storage.get_task(task_id)
-    action = "Delete"
-    form_action = "/deleteTask"
+    task = known_task(storage.get_task(requested_task_id()))
 
-    confirm_model = ConfirmFormModel(form_action, task.due_date, task, action)
-
-    return render_template("confirmForm.html", model=confirm_model)
+    return confirm_form_page(task, "Delete", 'delete_task')
 
 
 @app.route('/deleteTask')
 def delete_task():
-    storage = app.config['STORAGE']
+    storage = get_storage()
 
-    task_id = request.args.get('id')
+    storage.delete_task(requested_task_id())
 
-    storage.delete_task(task_id)
-
-    return redirect("/", code=302)
+    return index_redirect()
 
 
 @app.route('/completeForm')
 def complete_form():
-    storage = app.config['STORAGE']
-
-    task_id = request.args.get('id')
+    storage = get_storage()
 
-    task = storage.get_task(task_id)
-    action = "Complete"
-    form_action = "/completeTask"
+    task = known_task(storage.get_task(requested_task_id()))
 
-    confirm_model = ConfirmFormModel(form_action, task.due_date, task, action)
-
-    return render_template("confirmForm.html", model=confirm_model)
+    return confirm_form_page(task, "Complete", 'complete_task')
 
 
 @app.route('/completeTask')
 def complete_task():
-    storage = app.config['STORAGE']
+    storage = get_storage()
+
+    task_id = requested_task_id()
+
+    known_task(storage.get_task(task_id))
+
+    try:
+        storage.complete_task(task_id)
+    except StorageException:
+        """ the task was completed already """
+        abort(409)
+
+    return index_redirect()
+
+
+def completed_page_size(limit):
+    """
+    Get the number of tasks shown on a completed tasks page
+
+    Parameters
+    ----------
+    limit : int
+        page size requested by the browser, or None
+
+    Returns
+    -------
+    page_size : int
+        the page size, within the allowed range
+    """
+    page_size = COMPLETED_PAGE_SIZE if limit is None else limit
+
+    return max(1, min(page_size, MAX_COMPLETED_PAGE_SIZE))
+
+
+def requested_page():
+    """
+    Get the page of completed or archived tasks asked for by the browser
+
+    Returns
+    -------
+    page : tuple of (int, int, int, int)
+        task id after which the page starts and task id before which it
+        ends, or None, page size requested by the browser, or None, and
+        number of tasks shown on the page
+    """
+    after = request.args.get('after', type=int)
+    before = request.args.get('before', type=int)
+    limit = request.args.get('limit', type=int)
+
+    return (after, before, limit, completed_page_size(limit))
+
+
+def completed_row_key(row):
+    """ pagination key of a completed tasks row """
+    return row.Tasks.id
+
+
+def build_completed_model(completed_tasks, after, before, page_size, limit,
+                          endpoint="completed", key=completed_row_key,
+                          archive_page=None):
+    """
+    Builds the model of a completed tasks page, with its page links
+
+    Parameters
+    ----------
+    completed_tasks : list of rows
+        completed tasks of the page, fetched with one extra task to know if
+        there is a further page
+    after : int
+        task id after which the page starts, or None
+    before : int
+        task id before which the page ends, or None
+    page_size : int
+        number of tasks shown on the page
+    limit : int
+        page size requested by the browser, or None
+    endpoint : str
+        endpoint of the page, which the page links point to
+    key : callable
+        gets the task id of a row, used by the page links
+    archive_page : str
+        link to the archived tasks, or None
+
+    Returns
+    -------
+    model : CompletedModel
+        model of the page
+    """
+    has_more = len(completed_tasks) > page_size
+
+    if before is not None:
+        completed_tasks = completed_tasks[-page_size:]
+        (has_newer, has_older) = (has_more, True)
+    else:
+        completed_tasks = completed_tasks[:page_size]
+        (has_newer, has_older) = (after is not None, has_more)
+
+    newer_page = None
+    older_page = None
+
+    if completed_tasks and has_newer:
+        newer_page = url_for(endpoint, before=key(completed_tasks[0]),
+                             limit=limit)
+
+    if completed_tasks and has_older:
+        older_page = url_for(endpoint, after=key(completed_tasks[-1]),
+                             limit=limit)
+
+    return CompletedModel(completed_tasks, newer_page, older_page,
+                          archive_page)
+
 
-    task_id = request.args.get('id')
+def archive_page(has_archive):
+    """
+    Get the link to the archived tasks
 
-    storage.complete_task(task_id)
+    Parameters
+    ----------
+    has_archive : bool
+        whether any task of the storage was archived
 
-    return redirect("/", code=302)
+    Returns
+    -------
+    archive_page : str
+        the link, or None if no task was archived
+    """
+    return url_for('archived') if has_archive else None
+
+
+def completed_page(completed_tasks, page, has_archive):
+    """
+    Renders a completed tasks page
+
+    Parameters
+    ----------
+    completed_tasks : list of rows
+        completed tasks of the page, fetched with one extra task to know if
+        there is a further page
+    page : tuple
+        the requested page, as given by requested_page
+    has_archive : bool
+        whether any task of the storage was archived
+    """
+    (after, before, limit, page_size) = page
+
+    completed_model = build_completed_model(
+        completed_tasks, after, before, page_size, limit,
+        archive_page=archive_page(has_archive))
+
+    return render_template("completed.html", model=completed_model)
 
 
 @app.route('/completed')
+@conditional
 def completed():
-    storage = app.config['STORAGE']
+    storage = get_storage()
 
-    completed_tasks = storage.get_completed_tasks()
+    page = requested_page()
+    (after, before, limit, page_size) = page
 
-    completed_model = CompletedModel(completed_tasks)
+    if get_setting('STREAMING') and before is None:
+        completed_tasks = storage.iter_completed_tasks(after=after,
+                                                       limit=page_size)
 
-    return render_template("completed.html", model=completed_model)
+        def newer_page():
+            if after is not None and completed_tasks.count > 0:
+                return url_for('completed',
+                               before=completed_tasks.first.Tasks.id,
+                               limit=limit)
+
+        def older_page():
+            if completed_tasks.has_more:
+                return url_for('completed',
+                               after=completed_tasks.last.Tasks.id,
+                               limit=limit)
+
+        """ the page links are only known once the tasks were streamed """
+        completed_model = CompletedModel(
+            completed_tasks, newer_page, older_page,
+            archive_page(storage.has_archive()))
+
+        return stream_template("completed.html", model=completed_model)
+
+    """ fetch one extra task to know if there is a further page """
+    completed_tasks = storage.get_completed_tasks(after=after, before=before,
+                                                  limit=page_size + 1)
+
+    return completed_page(completed_tasks, page, storage.has_archive())
+
+
+@app.route('/search')
+@conditional
+def search():
+    storage = get_storage()
+
+    search_query = request.args.get('q', '')
+    page = max(0, request.args.get('page', 0, type=int))
+    limit = request.args.get('limit', type=int)
+
+    page_size = completed_page_size(limit)
+
+    """ fetch one extra task to know if there is a further page """
+    results = storage.search_tasks(search_query, offset=page * page_size,
+                                   limit=page_size + 1)
+
+    previous_page = None
+    next_page = None
+
+    if page > 0:
+        previous_page = url_for('search', q=search_query, page=page - 1,
+                                limit=limit)
+
+    if len(results) > page_size:
+        next_page = url_for('search', q=search_query, page=page + 1,
+                            limit=limit)
+
+    search_model = SearchModel(search_query, results[:page_size],
+                               previous_page, next_page)
+
+    return render_template("search.html", model=search_model)
+
+
+@app.route('/archived')
+@conditional
+def archived():
+    storage = get_storage()
+
+    (after, before, limit, page_size) = requested_page()
+
+    """ the archive is only read when its page is asked for """
+    archived_tasks = storage.get_archived_tasks(after=after, before=before,
+                                                limit=page_size + 1)
+
+    archived_model = build_completed_model(archived_tasks, after, before,
+                                           page_size, limit,
+                                           endpoint='archived',
+                                           key=lambda row: row.id)
+
+    return render_template("archived.html", model=archived_model)
+
+
+class ApiException(Exception):
+    """
+    JSON API exception, answered with the given HTTP status
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+@app.errorhandler(ApiException)
+def api_error(error):
+    return jsonify(error=str(error)), error.status
+
+
+def task_json(task):
+    """
+    Get the JSON representation of a task
+
+    Parameters
+    ----------
+    task : Tasks
+        the task
+
+    Returns
+    -------
+    task : dict
+        task fields, with dates in ISO 8601 format
+    """
+    return {
+        "id": task.id,
+        "description": task.description,
+        "due_date": task.due_date.isoformat(),
+        "created_date": task.created_date.isoformat(),
+        "last_updated": task.last_updated.isoformat(),
+    }
+
+
+def api_body(body_type):
+    """
+    Get the JSON body of an API request
+
+    Parameters
+    ----------
+    body_type : type
+        expected type of the body, dict or list
+
+    Returns
+    -------
+    body : dict or list
+        the decoded body
+
+    Raises
+    ------
+    ApiException
+        if the body is not JSON of the expected type
+    """
+    body = request.get_json(silent=True)
+
+    if not isinstance(body, body_type):
+        raise ApiException(400, "Expected a JSON %s"
+                           % ("object" if body_type is dict else "array"))
+
+    return body
+
+
+def api_task_fields(fields):
+    """
+    Get the description and due date of a task sent to the API
+
+    Parameters
+    ----------
+    fields : dict
+        task fields, as sent by the client
+
+    Returns
+    -------
+    fields : tuple of (str, str)
+        description and due date
+
+    Raises
+    ------
+    ApiException
+        if any field is missing or invalid
+    """
+    if not isinstance(fields, dict):
+        raise ApiException(400, "Expected a JSON object per task")
+
+    description = fields.get("description")
+    due_date = fields.get("due_date")
+
+    if not isinstance(description, str) or not description:
+        raise ApiException(400, "Missing task description")
+
+    try:
+        datetime.strptime(due_date, DUE_DATE_FORMAT)
+    except (TypeError, ValueError):
+        raise ApiException(400, "Invalid due date: %s" % due_date)
+
+    return (description, due_date)
+
+
+def api_task_id(task_id):
+    """
+    Get a task id sent to the API
+
+    Parameters
+    ----------
+    task_id : object
+        task id, as sent by the client
+
+    Returns
+    -------
+    task_id : int
+        the task id
+
+    Raises
+    ------
+    ApiException
+        if the task id is not an integer that SQLite can store
+    """
+    if not isinstance(task_id, int) or isinstance(task_id, bool) or \
+            not MIN_TASK_ID <= task_id <= MAX_TASK_ID:
+        raise ApiException(400, "Invalid task id: %s" % task_id)
+
+    return task_id
+
+
+def api_task(storage, task_id):
+    """
+    Get a task requested through the API
+
+    Parameters
+    ----------
+    storage : Storage
+        storage of the requested workfile
+    task_id : int
+        task id
+
+    Returns
+    -------
+    task : Tasks
+        the task
+
+    Raises
+    ------
+    ApiException
+        if the task id is invalid or the task does not exist
+    """
+    task = storage.get_task(api_task_id(task_id))
+
+    if task is None:
+        raise ApiException(404, "Unknown task: %d" % task_id)
+
+    return task
+
+
+@app.route('/api/tasks', methods=['GET'])
+@conditional
+def api_list_tasks():
+    storage = get_storage()
+
+    (overdue_tasks, active_tasks) = storage.get_index_view()
+
+    return jsonify(overdue=[task_json(task) for task in overdue_tasks],
+                   active=[task_json(task) for task in active_tasks])
+
+
+@app.route('/api/tasks/completed', methods=['GET'])
+@conditional
+def api_list_completed_tasks():
+    storage = get_storage()
+
+    after = request.args.get('after', type=int)
+    page_size = completed_page_size(request.args.get('limit', type=int))
+
+    """ fetch one extra task to know if there is a further page """
+    rows = storage.get_completed_tasks(after=after, limit=page_size + 1)
+
+    tasks = []
+
+    for row in rows[:page_size]:
+        task = task_json(row.Tasks)
+        task["completed_by"] = row.Completed.completed_by.isoformat()
+        tasks.append(task)
+
+    after = rows[page_size - 1].Tasks.id if len(rows) > page_size else None
+
+    return jsonify(tasks=tasks, after=after)
+
+
+@app.route('/api/tasks/<int:task_id>', methods=['GET'])
+def api_get_task(task_id):
+    storage = get_storage()
+
+    return jsonify(task_json(api_task(storage, task_id)))
+
+
+@app.route('/api/tasks', methods=['POST'])
+def api_create_task():
+    storage = get_storage()
+
+    (description, due_date) = api_task_fields(api_body(dict))
+
+    task_id = storage.create_task(description, due_date)
+
+    return jsonify(task_json(storage.get_task(task_id))), 201
+
+
+@app.route('/api/tasks/<int:task_id>', methods=['PUT'])
+def api_update_task(task_id):
+    storage = get_storage()
+
+    (description, due_date) = api_task_fields(api_body(dict))
+
+    api_task(storage, task_id)
+
+    storage.update_task(task_id, description, due_date)
+
+    return jsonify(task_json(storage.get_task(task_id)))
+
+
+@app.route('/api/tasks/<int:task_id>', methods=['DELETE'])
+def api_delete_task(task_id):
+    storage = get_storage()
+
+    api_task(storage, task_id)
+
+    storage.delete_task(task_id)
+
+    return "", 204
+
+
+@app.route('/api/tasks/<int:task_id>/complete', methods=['POST'])
+def api_complete_task(task_id):
+    storage = get_storage()
+
+    api_task(storage, task_id)
+
+    try:
+        storage.complete_tasks([task_id])
+    except StorageException as error:
+        raise ApiException(409, str(error))
+
+    return "", 204
+
+
+@app.route('/api/batch/create', methods=['POST'])
+def api_create_tasks():
+    storage = get_storage()
+
+    tasks = [api_task_fields(fields) for fields in api_body(list)]
+
+    return jsonify(ids=storage.create_tasks(tasks)), 201
+
+
+@app.route('/api/batch/update', methods=['POST'])
+def api_update_tasks():
+    storage = get_storage()
+
+    tasks = []
+
+    for fields in api_body(list):
+        (description, due_date) = api_task_fields(fields)
+
+        tasks.append((api_task_id(fields.get("id")), description, due_date))
+
+    try:
+        storage.update_tasks(tasks)
+    except StorageException as error:
+        raise ApiException(404, str(error))
+
+    return "", 204
+
+
+@app.route('/api/batch/delete', methods=['POST'])
+def api_delete_tasks():
+    storage = get_storage()
+
+    storage.delete_tasks([api_task_id(task_id)
+                          for task_id in api_body(list)])
+
+    return "", 204
+
+
+@app.route('/api/batch/complete', methods=['POST'])
+def api_complete_tasks():
+    storage = get_storage()
+
+    try:
+        storage.complete_tasks([api_task_id(task_id)
+                                for task_id in api_body(list)])
+    except StorageException as error:
+        raise ApiException(409, str(error))
+
+    return "", 204
@@ -0,0 +1,94 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from contextlib import contextmanager
+import sys
+import time
+
+""" timings of the recorded startup phases, or None when not profiling """
+_phases = None
+_depth = 0
+
+
+def enable():
+    """
+    Starts recording the duration of the startup phases
+    """
+    global _phases
+
+    _phases = []
+
+
+@contextmanager
+def phase(name):
+    """
+    Records the duration of a startup phase, if profiling is enabled.
+    Phases may be nested
+
+    Parameters
+    ----------
+    name : str
+        phase name
+    """
+    global _depth
+
+    if _phases is None:
+        yield
+        return
+
+    record = [name, _depth, None]
+    _phases.append(record)
+
+    _depth += 1
+    start = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        record[2] = time.perf_counter() - start
+        _depth -= 1
+
+
+def report(file=sys.stderr):
+    """
+    Prints the duration of every recorded startup phase, if profiling is
+    enabled
+
+    Parameters
+    ----------
+    file : file object
+        where the report is printed
+    """
+    if _phases is None:
+        return
+
+    print("Startup profile:", file=file)
+
+    for (name, depth, duration) in _phases:
+        print("  %-40s %10.1f ms" % ("  " * depth + name, duration * 1000),
+              file=file)
+
+    total = sum(duration for (_, depth, duration) in _phases if depth == 0)
+
+    print("  %-40s %10.1f ms" % ("total", total * 1000), file=file)
@@ -0,0 +1,140 @@
+/*
+ * Keeps the TODO table up to date with the changes made by other users,
+ * received as server-sent events. Each event lists the changed tasks, and
+ * their rows are patched in place instead of reloading the page
+ */
+(function () {
+    var script = document.currentScript;
+    var tableId = script.dataset.table;
+    var source = new EventSource(script.dataset.events);
+    var connected = false;
+
+    function table() {
+        return document.getElementById(tableId);
+    }
+
+    function today() {
+        /* due dates are compared with the current UTC date, as on the server */
+        return new Date().toISOString().slice(0, 10);
+    }
+
+    function cell(text, className) {
+        var td = document.createElement("td");
+
+        td.textContent = text;
+
+        if (className) {
+            td.className = className;
+        }
+
+        return td;
+    }
+
+    function actionCell(root, form, id, label) {
+        var td = document.createElement("td");
+        var link = document.createElement("a");
+
+        link.href = root + "/" + form + "?id=" + id;
+        link.className = "rowAction";
+        link.textContent = label;
+        td.appendChild(link);
+
+        return td;
+    }
+
+    function buildRow(root, task) {
+        var row = document.createElement("tr");
+
+        row.id = "task-" + task.id;
+        row.dataset.due = task.due_date;
+
+        row.appendChild(cell(task.description, "description"));
+        row.appendChild(cell(task.due_date,
+                             task.due_date < today() ? "overdue" : ""));
+        row.appendChild(cell(task.created_date));
+        row.appendChild(cell(task.last_updated));
+        row.appendChild(actionCell(root, "updateForm", task.id, "Update"));
+        row.appendChild(actionCell(root, "deleteForm", task.id, "Delete"));
+        row.appendChild(actionCell(root, "completeForm", task.id, "Complete"));
+
+        return row;
+    }
+
+    function insertRow(task) {
+        var tasks = table();
+
+        if (!tasks) {
+            /* the page shows that nothing is left to do */
+            location.reload();
+            return;
+        }
+
+        var row = buildRow(tasks.dataset.scriptRoot, task);
+        var rows = tasks.querySelectorAll("tr[data-due]");
+        var next = null;
+
+        /* the tasks are sorted by due date, the newest last */
+        for (var i = 0; i < rows.length; i++) {
+            if (rows[i].dataset.due > task.due_date) {
+                next = rows[i];
+                break;
+            }
+        }
+
+        if (next) {
+            next.parentNode.insertBefore(row, next);
+        } else {
+            tasks.tBodies[0].appendChild(row);
+        }
+    }
+
+    function removeRow(task) {
+        var row = document.getElementById("task-" + task.id);
+
+        if (row) {
+            row.remove();
+        }
+
+        return row;
+    }
+
+    function listen(event, patch) {
+        source.addEventListener(event, function (message) {
+            JSON.parse(message.data).forEach(patch);
+
+            var tasks = table();
+
+            if (tasks && !tasks.querySelector("tr[data-due]")) {
+                location.reload();
+            }
+        });
+    }
+
+    source.addEventListener("hello", function () {
+        /* events may have been missed while reconnecting */
+        if (connected) {
+            location.reload();
+        }
+
+        connected = true;
+    });
+
+    source.addEventListener("reload", function () {
+        location.reload();
+    });
+
+    listen("created", insertRow);
+
+    listen("updated", function (task) {
+        var row = removeRow(task);
+
+        /* completed tasks are updated too, but are not on this page */
+        if (row) {
+            task.created_date = row.cells[2].textContent;
+            insertRow(task);
+        }
+    });
+
+    listen("completed", removeRow);
+    listen("deleted", removeRow);
+})();
@@ -26,18 +26,35 @@ from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey
 from sqlalchemy.orm import declarative_base
 import sqlalchemy
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import NullPool
-from datetime import datetime, UTC
+from sqlalchemy.pool import NullPool, QueuePool
+from datetime import date, datetime, timedelta, UTC
 import logging
+import os
 import re
-from sqlalchemy.exc import OperationalError
+import sqlite3
+import time
+import zlib
+from sqlalchemy.exc import DatabaseError, OperationalError
 from contextlib import contextmanager
+from collections import OrderedDict
+from threading import Lock
+import uuid
+from worky.task_stream import TaskSource, TaskStream
+from worky.profiles import POOLED_CACHE_SIZE, POOL_OVERFLOW, PROFILES
+from worky import startup
 
 logger = logging.getLogger(__name__)
 logger.setLevel(__debug__)
 
 Base = declarative_base()
 
+"""
+version of the schema expected by this application. Must be increased
+whenever the schema or its upgrades change, so that databases validated by
+previous versions are validated and upgraded again
+"""
+SCHEMA_VERSION = 2
+
 
 class Tasks(Base):
     """
@@ -47,7 +64,7 @@ class Tasks(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     description = Column(String, nullable=False)
-    due_date = Column(Date, nullable=False)
+    due_date = Column(Date, nullable=False, index=True)
     created_date = Column(DateTime, nullable=False)
     last_updated = Column(DateTime, nullable=False)
 
@@ -60,7 +77,137 @@ class Completed(Base):
 
     id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"),
                 primary_key=True)
-    completed_by = Column(DateTime, nullable=False)
+    completed_by = Column(DateTime, nullable=False, index=True)
+
+
+""" tables of the archive file, kept apart from the workfile tables """
+ArchiveBase = declarative_base()
+
+
+class ArchivedTasks(ArchiveBase):
+    """
+    Archived Tasks table. Task ids may be reused by the workfile once their
+    tasks are archived, so archived tasks get ids of their own
+    """
+    __tablename__ = 'archived_tasks'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    task_id = Column(Integer, nullable=False, index=True)
+    description = Column(String, nullable=False)
+    due_date = Column(Date, nullable=False)
+    created_date = Column(DateTime, nullable=False)
+    last_updated = Column(DateTime, nullable=False)
+    completed_by = Column(DateTime, nullable=False, index=True)
+
+
+""" maximum number of task lists kept by the read cache """
+CACHE_SIZE = 64
+
+""" number of rows fetched at a time by the streamed queries """
+STREAM_BATCH_SIZE = 100
+
+""" maximum number of task ids bound to a single IN list """
+ID_BATCH_SIZE = 500
+
+""" number of database pages copied by each step of a backup """
+BACKUP_STEP_PAGES = 256
+
+""" seconds the database is left to other connections between backup steps """
+BACKUP_STEP_SLEEP = 0.005
+
+""" restarts after which a backup copies the rest in a single step """
+BACKUP_MAX_RESTARTS = 3
+
+""" number of tasks read or written at a time when exporting or importing """
+TRANSFER_CHUNK_SIZE = 1000
+
+"""
+suffix of the archive file kept next to a workfile, following the naming of
+the SQLite journal files
+"""
+ARCHIVE_SUFFIX = "-archive"
+
+"""
+events published when tasks change. Each event holds the list of the changed
+tasks: created and updated tasks with their fields, completed and deleted
+tasks with their id only. reload is published instead when too many tasks
+changed at once to describe them
+"""
+EVENT_TYPES = ["created", "updated", "completed", "deleted", "reload"]
+
+""" maximum number of tasks described by a single event """
+MAX_EVENT_TASKS = 100
+
+""" auto_vacuum setting of databases vacuumed incrementally """
+AUTO_VACUUM_INCREMENTAL = 2
+
+""" completion state of a task on the denormalized layout """
+TASK_OPEN = 0
+TASK_COMPLETED = 1
+
+""" columns added to the tasks table by the denormalized layout """
+DENORMALIZED_COLUMNS = ["status", "completed_by"]
+
+""" partial index over the open tasks of the denormalized layout """
+DENORMALIZED_INDEX = "ix_tasks_open_due_date"
+
+"""
+statements migrating a database to the denormalized layout, where the
+completion state of each task is also kept on the tasks table so that the
+open tasks are read through a partial index without joining the completed
+table
+"""
+DENORMALIZE_STATEMENTS = [
+    "ALTER TABLE tasks ADD COLUMN status INTEGER NOT NULL DEFAULT %d"
+    % TASK_OPEN,
+    "ALTER TABLE tasks ADD COLUMN completed_by DATETIME",
+    "UPDATE tasks SET status = %d, completed_by = (SELECT "
+    "completed.completed_by FROM completed WHERE completed.id = tasks.id) "
+    "WHERE tasks.id IN (SELECT id FROM completed)" % TASK_COMPLETED,
+    "CREATE INDEX %s ON tasks (due_date) WHERE status = %d"
+    % (DENORMALIZED_INDEX, TASK_OPEN),
+]
+
+""" full-text index over the task descriptions """
+SEARCH_TABLE = "tasks_search"
+
+"""
+statements creating the full-text index. The index is an external content
+FTS5 table: it only holds the index, reads the descriptions from the tasks
+table, and is kept in sync by triggers on every write to the tasks table,
+including the bulk statements. Existing tasks are indexed by the rebuild
+"""
+SEARCH_STATEMENTS = [
+    "CREATE VIRTUAL TABLE %(index)s USING fts5(description, "
+    "content='tasks', content_rowid='id', prefix='2 3', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER %(index)s_insert AFTER INSERT ON tasks BEGIN "
+    "INSERT INTO %(index)s (rowid, description) "
+    "VALUES (new.id, new.description); END",
+    "CREATE TRIGGER %(index)s_delete AFTER DELETE ON tasks BEGIN "
+    "INSERT INTO %(index)s (%(index)s, rowid, description) "
+    "VALUES ('delete', old.id, old.description); END",
+    "CREATE TRIGGER %(index)s_update AFTER UPDATE OF description ON tasks "
+    "BEGIN INSERT INTO %(index)s (%(index)s, rowid, description) "
+    "VALUES ('delete', old.id, old.description); "
+    "INSERT INTO %(index)s (rowid, description) "
+    "VALUES (new.id, new.description); END",
+    "INSERT INTO %(index)s (%(index)s) VALUES ('rebuild')",
+]
+SEARCH_STATEMENTS = [statement % {"index": SEARCH_TABLE}
+                     for statement in SEARCH_STATEMENTS]
+
+""" full-text index columns used by the search queries """
+task_search = sqlalchemy.table(SEARCH_TABLE,
+                               sqlalchemy.column(SEARCH_TABLE),
+                               sqlalchemy.column("rowid", Integer),
+                               sqlalchemy.column("rank"))
+
+""" completion state columns of the denormalized layout """
+task_state = sqlalchemy.table(Tasks.__tablename__,
+                              sqlalchemy.column("id", Integer),
+                              sqlalchemy.column("status", Integer),
+                              sqlalchemy.column("completed_by", DateTime))
 
 
 class Storage():
@@ -68,7 +215,9 @@ class Storage():
     Persistent storage
     """
 
-    def __init__(self, db_path):
+    def __init__(self, db_path, pool_size=0, profile="default",
+                 denormalize=False, cache=True, events=None, metrics=None,
+                 upgrade=False):
         """
         Constructor
 
@@ -76,6 +225,35 @@ class Storage():
         ----------
         db_path : str
             path to the database
+        pool_size : int
+            number of long-lived connections kept open to the database. Should
+            match the number of threads using the storage at once: the server
+            worker threads and any background thread. A few more connections
+            are opened while they are all in use (see POOL_OVERFLOW). When 0
+            (default) a new connection is opened and closed for every
+            operation
+        profile : str
+            name of the performance profile (see PROFILES) applied to every
+            database connection
+        denormalize : bool
+            migrates the database to the denormalized layout if it is not
+            already on it. The migration is one-way
+        cache : bool
+            keeps the task lists in memory until the database changes,
+            whether through this storage or any other connection or process
+        events : callable
+            called with the type and data of an event whenever tasks are
+            changed through this storage (see EVENT_TYPES), such as
+            EventBroker.publisher gives. Changes made by other processes are
+            not published
+        metrics : Metrics
+            records the statements run, the rows fetched and the time the
+            database connections are held by the requests being served
+        upgrade : bool
+            upgrades a database created by an older version of the
+            application in place, adding the indexes and the full-text index
+            introduced since. The upgrade is one-way. When False (default),
+            such a database is opened as it is, and can not be searched
 
         Raises
         ------
@@ -89,21 +267,346 @@ class Storage():
             raise StorageException("Database name must start with a letter "
                                    "and end with .worky: %s" % db_path)
 
+        if pool_size < 0:
+            raise StorageException("Invalid connection pool size: %d"
+                                   % pool_size)
+
+        if profile not in PROFILES:
+            raise StorageException("Unknown storage profile: %s" % profile)
+
+        self._pragmas = {}
+
+        if pool_size == 0:
+            pool_args = {"poolclass": NullPool}
+        else:
+            """
+            pooled connections outlive each operation, so a larger page cache
+            is kept warm between requests
+            """
+            self._pragmas["cache_size"] = POOLED_CACHE_SIZE
+
+            pool_args = {"poolclass": QueuePool, "pool_size": pool_size,
+                         "max_overflow": POOL_OVERFLOW}
+
+        self._pragmas.update(PROFILES[profile])
+
+        self._cache = OrderedDict() if cache else None
+        self._cache_lock = Lock()
+        self._generation = 0
+
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        self._events = events
+
+        self._metrics = metrics
+        self._engine_args = {} if metrics is None else metrics.engine_args()
+
+        self._archive_path = db_path + ARCHIVE_SUFFIX
+        self._archive_engine = None
+        self._archive_lock = Lock()
+
         try:
             engine = sqlalchemy.create_engine("sqlite:///" + db_path,
-                                              poolclass=NullPool)
+                                              **pool_args,
+                                              **self._engine_args)
+
+            sqlalchemy.event.listen(engine, "connect", self._on_connect)
+
+            if metrics is not None:
+                metrics.instrument(engine)
+
+            self._engine = engine
 
             self._session_maker = sessionmaker(bind=engine,
                                                expire_on_commit=False)
 
-            """ if the database was just created """
-            if sqlalchemy.inspect(engine).get_table_names() == []:
-                """ create the database tables """
-                Base.metadata.create_all(engine)
+            with startup.phase("schema validation"):
+                schema = self._read_schema(engine)
+
+                """ if the database was just created """
+                if not schema:
+                    """ create the database tables """
+                    Base.metadata.create_all(engine)
+
+                known_schema = self._is_known_schema(schema)
+
+                """ if the database has every index of this version """
+                upgraded = known_schema
+
+                if known_schema:
+                    """ the schema was already validated and upgraded """
+                    self._denormalized = any(name == DENORMALIZED_INDEX
+                                             for (_, name, _, _) in schema)
+                else:
+                    self._validate_database(sqlalchemy.inspect(engine))
+
+                    """ a new database is completed, not migrated """
+                    if upgrade or not schema:
+                        self._upgrade_database(engine, db_path,
+                                               created=not schema)
+
+                        upgraded = True
+
+                if denormalize and not self._denormalized:
+                    self._denormalize_database(engine)
+
+                    known_schema = False
+
+                """
+                a database left as it is is validated again when next opened,
+                so that it can still be upgraded then
+                """
+                if upgraded and not known_schema:
+                    self._write_schema_fingerprint(engine)
 
-            self._validate_database(sqlalchemy.inspect(engine))
+            self._version_connection = sqlite3.connect(
+                db_path, check_same_thread=False)
+            self._version_lock = Lock()
+            self._instance = uuid.uuid4().hex[:8]
         except OperationalError:
             raise StorageException("Invalid database path: %s" % db_path)
+        except DatabaseError:
+            raise StorageException("Not a database: %s" % db_path)
+
+    def checkpoint(self):
+        """
+        Transfers every change kept in the write-ahead log into the database
+        file and truncates the log, so that the database file alone holds all
+        the data. Must be called before copying the database file. Has no
+        effect if the database is not in WAL mode
+        """
+        with self._engine.connect() as connection:
+            connection.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def backup(self, target_path, step_pages=BACKUP_STEP_PAGES,
+               step_sleep=BACKUP_STEP_SLEEP):
+        """
+        Copies the database to another file while it stays in use, with the
+        SQLite online backup API. The database is copied a few pages at a
+        time, and is only locked while each step runs, so requests keep
+        being served during the copy. The copy is written to a temporary
+        file first, so the target file is either left as it was or fully
+        replaced.
+
+        In WAL mode the copy is a snapshot taken when the backup starts, as
+        readers do not block writers. Otherwise the copy restarts whenever
+        another connection writes to the database, and after a few restarts
+        the rest of the copy is done in a single step, blocking writers
+        until it is done
+
+        Parameters
+        ----------
+        target_path : str
+            location of the copy. Replaced if it exists
+        step_pages : int
+            number of pages copied by each step
+        step_sleep : float
+            seconds to wait between steps
+
+        Returns
+        -------
+        pages : int
+            number of database pages copied
+        seconds : float
+            duration of the copy
+
+        Raises
+        ------
+        StorageException
+            if the copy can not be written
+        """
+        temporary_path = "%s.%s.tmp" % (target_path, uuid.uuid4().hex[:8])
+        copy = {"pages": 0, "remaining": None, "restarts": 0}
+
+        def progress(status, remaining, total):
+            copy["pages"] = total
+
+            if copy["remaining"] is not None and \
+                    remaining > copy["remaining"]:
+                copy["restarts"] += 1
+
+                if copy["restarts"] > BACKUP_MAX_RESTARTS:
+                    raise _BackupRestarted()
+
+            copy["remaining"] = remaining
+
+            if remaining:
+                time.sleep(step_sleep)
+
+        start = time.perf_counter()
+
+        try:
+            with self._engine.connect() as connection:
+                source = connection.connection.driver_connection
+
+                journal_mode = source.execute(
+                    "PRAGMA journal_mode").fetchone()[0]
+
+                if journal_mode.lower() == "wal":
+                    self._pinned_backup(source, temporary_path, step_pages,
+                                        progress)
+                else:
+                    try:
+                        self._copy(source, temporary_path, step_pages,
+                                   progress)
+                    except _BackupRestarted:
+                        self._pinned_backup(source, temporary_path, -1,
+                                            progress)
+
+            os.replace(temporary_path, target_path)
+        except (sqlite3.Error, OSError) as error:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+            raise StorageException("Backup to %s failed: %s"
+                                   % (target_path, error))
+
+        return (copy["pages"], time.perf_counter() - start)
+
+    def _pinned_backup(self, source, target_path, pages, progress):
+        """
+        Copies the database while holding a read transaction, so that the
+        copy is not restarted by the writes of other connections
+
+        Parameters
+        ----------
+        source : sqlite3.Connection
+            connection to the database
+        target_path : str
+            location of the copy
+        pages : int
+            number of pages copied by each step, or -1 to copy all at once
+        progress : callable
+            backup progress callback
+        """
+        source.execute("BEGIN")
+
+        try:
+            """ the read transaction only starts with a first read """
+            source.execute("SELECT count(*) FROM sqlite_master").fetchone()
+
+            self._copy(source, target_path, pages, progress)
+        finally:
+            source.execute("COMMIT")
+
+    def _copy(self, source, target_path, pages, progress):
+        target = sqlite3.connect(target_path)
+
+        try:
+            source.backup(target, pages=pages, progress=progress)
+        finally:
+            target.close()
+
+    def close(self):
+        """
+        Checkpoints the database and closes every database connection held
+        by the storage
+        """
+        self.checkpoint()
+        self._engine.dispose()
+        self._version_connection.close()
+
+        if self._archive_engine is not None:
+            self._archive_engine.dispose()
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        """
+        Applies the connection level PRAGMAs to a newly opened database
+        connection. With a connection pool this only happens once per pooled
+        connection
+
+        Parameters
+        ----------
+        dbapi_connection : sqlite3.Connection
+            the newly opened database connection
+        connection_record : sqlalchemy.pool.ConnectionRecord
+            the pool record of the connection
+        """
+        cursor = dbapi_connection.cursor()
+
+        for pragma, value in self._pragmas.items():
+            cursor.execute("PRAGMA %s = %s" % (pragma, value))
+
+        cursor.close()
+
+    def _read_schema(self, engine):
+        """
+        Reads the definition of every schema object of the database and the
+        stored schema fingerprint with a single query
+
+        Parameters
+        ----------
+        engine : sqlalchemy.engine.Engine
+            database engine
+
+        Returns
+        -------
+        schema : list of tuple of (str, str, str, int)
+            type, name, SQL definition of each schema object, sorted by name,
+            and the stored schema fingerprint. Empty for a new database
+        """
+        with engine.connect() as connection:
+            schema = connection.exec_driver_sql(
+                "SELECT type, name, sql, (SELECT user_version FROM "
+                "pragma_user_version) FROM sqlite_master ORDER BY name")
+
+            return schema.fetchall()
+
+    def _schema_fingerprint(self, schema):
+        """
+        Computes the fingerprint of a database schema
+
+        Parameters
+        ----------
+        schema : list of tuple of (str, str, str, int)
+            schema as read by _read_schema
+
+        Returns
+        -------
+        fingerprint : int
+            positive 31 bit fingerprint of the schema and SCHEMA_VERSION
+        """
+        definition = "\n".join("%s %s %s" % (object_type, name, sql)
+                               for (object_type, name, sql, _) in schema)
+        definition = "%d\n%s" % (SCHEMA_VERSION, definition)
+
+        return (zlib.crc32(definition.encode()) & 0x7fffffff) or 1
+
+    def _is_known_schema(self, schema):
+        """
+        Checks if a database schema was validated and upgraded by this
+        version of the application
+
+        Parameters
+        ----------
+        schema : list of tuple of (str, str, str, int)
+            schema as read by _read_schema
+
+        Returns
+        -------
+        known : bool
+            if the schema matches its stored fingerprint
+        """
+        return (len(schema) > 0
+                and schema[0][3] == self._schema_fingerprint(schema))
+
+    def _write_schema_fingerprint(self, engine):
+        """
+        Stores the fingerprint of the current database schema in the
+        database user_version, so that the schema does not need to be
+        validated the next time the database is opened
+
+        Parameters
+        ----------
+        engine : sqlalchemy.engine.Engine
+            database engine
+        """
+        fingerprint = self._schema_fingerprint(self._read_schema(engine))
+
+        with engine.begin() as connection:
+            connection.exec_driver_sql("PRAGMA user_version = %d"
+                                       % fingerprint)
 
     def _validate_database(self, inspector):
         """
@@ -120,7 +623,10 @@ class Storage():
             if the given database does not match the expected schema
         """
         expected_tables = [Tasks.__tablename__, Completed.__tablename__]
-        obtained_tables = inspector.get_table_names()
+
+        """ the full-text index is recreated by the upgrade if missing """
+        obtained_tables = [table for table in inspector.get_table_names()
+                           if not table.startswith(SEARCH_TABLE)]
         error_msg = ("The loaded database is not compatible with this "
                      "application")
 
@@ -128,18 +634,27 @@ class Storage():
         self._compare_lists(expected_tables, obtained_tables, error_msg)
 
         # Validate Tasks table columns
+        tasks_columns = [c["name"] for c in
+                         inspector.get_columns(Tasks.__tablename__)]
+        expected_columns = list(sqlalchemy.inspect(Tasks).columns.keys())
+
+        self._denormalized = all(c in tasks_columns
+                                 for c in DENORMALIZED_COLUMNS)
+
+        if self._denormalized:
+            expected_columns += DENORMALIZED_COLUMNS
+
         self._inspect_table_columns(inspector, Tasks.__tablename__,
-                                    sqlalchemy.inspect(Tasks).columns,
-                                    error_msg)
+                                    expected_columns, error_msg)
         self._inspect_primary_key(inspector, Tasks.__tablename__, ["id"],
                                   error_msg)
         self._inspect_foreign_key(inspector, Tasks.__tablename__, [],
                                   error_msg)
 
         # Validate Completed table columns
-        self._inspect_table_columns(inspector, Completed.__tablename__,
-                                    sqlalchemy.inspect(Completed).columns,
-                                    error_msg)
+        self._inspect_table_columns(
+            inspector, Completed.__tablename__,
+            list(sqlalchemy.inspect(Completed).columns.keys()), error_msg)
         self._inspect_primary_key(inspector, Completed.__tablename__, ["id"],
                                   error_msg)
         self._inspect_foreign_key(inspector, Completed.__tablename__,
@@ -147,6 +662,56 @@ class Storage():
                                     "referred_table": Tasks.__tablename__,
                                     "referred_columns": ["id"]}], error_msg)
 
+    def _upgrade_database(self, engine, db_path, created):
+        """
+        Upgrades a validated database in place by creating any index that
+        was introduced after the database was created, including the
+        full-text index. Building the full-text index of an existing
+        database is logged, since older versions of worky can no longer
+        open the database afterwards
+
+        Parameters
+        ----------
+        engine : sqlalchemy.engine.Engine
+            database engine
+        db_path : str
+            path to the database file
+        created : bool
+            whether the database was just created
+        """
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(engine, checkfirst=True)
+
+        with engine.begin() as connection:
+            search_table = connection.exec_driver_sql(
+                "SELECT name FROM sqlite_master WHERE name = ?",
+                (SEARCH_TABLE,)).first()
+
+            if search_table is None:
+                if not created:
+                    logger.warning("Building the full-text search index of "
+                                   "%s: older versions of worky will no "
+                                   "longer open it", db_path)
+
+                for statement in SEARCH_STATEMENTS:
+                    connection.exec_driver_sql(statement)
+
+    def _denormalize_database(self, engine):
+        """
+        Migrates a validated database to the denormalized layout
+
+        Parameters
+        ----------
+        engine : sqlalchemy.engine.Engine
+            database engine
+        """
+        with engine.begin() as connection:
+            for statement in DENORMALIZE_STATEMENTS:
+                connection.exec_driver_sql(statement)
+
+        self._denormalized = True
+
     def _inspect_table_columns(self, inspector, table_name, expected_columns,
                                error_msg):
         """
@@ -278,19 +843,120 @@ class Storage():
         StorageException
             if the given lists do not match
         """
-        if len(list1) != len(list2):
+        if len(list1) != len(list2) or set(list1) != set(list2):
             raise StorageException(error_msg)
 
-        for element in list1:
-            if element not in list2:
-                raise StorageException(error_msg)
-
     def _today(self):
         return datetime.now(UTC).strftime(self._due_date_format)
 
     def _current_date_time(self):
         return datetime.now(UTC).replace(microsecond=0)
 
+    def _cached(self, key, load):
+        """
+        Get a value from the read cache, loading it on a miss
+
+        Parameters
+        ----------
+        key: tuple
+            cache key
+        load: callable
+            loads the value from the database
+
+        Returns
+        -------
+        value: object
+            the cached or loaded value
+        """
+        if self._cache is None:
+            return load()
+
+        """ read before loading, so a concurrent change is not missed """
+        data_version = self._data_version()
+
+        with self._cache_lock:
+            value = self._cache_lookup(key, data_version)
+
+            if value is not None:
+                return value
+
+            self.cache_misses += 1
+            generation = self._generation
+
+        value = load()
+
+        with self._cache_lock:
+            """
+            a value loaded while a task was being changed may be stale, so it
+            is only kept if no change happened in the meantime
+            """
+            if generation == self._generation:
+                self._cache[key] = (data_version, value)
+
+                if len(self._cache) > CACHE_SIZE:
+                    self._cache.popitem(last=False)
+
+        return value
+
+    def _cache_lookup(self, key, data_version):
+        """
+        Get a value of the read cache, unless the database changed since it
+        was loaded, such as when another process wrote to it. Must be called
+        with the cache lock held
+
+        Returns
+        -------
+        value: object
+            the cached value, or None on a miss
+        """
+        entry = self._cache.get(key)
+
+        if entry is None:
+            return None
+
+        if entry[0] != data_version:
+            del self._cache[key]
+
+            return None
+
+        self.cache_hits += 1
+        self._cache.move_to_end(key)
+
+        return entry[1]
+
+    def _data_version(self):
+        """
+        Get the data_version of the database, which changes whenever another
+        connection, from this or any other process, commits to the database
+        """
+        with self._version_lock:
+            return self._version_connection.execute(
+                "PRAGMA data_version").fetchone()[0]
+
+    def _changed(self):
+        """
+        Invalidates the read cache after a task was changed
+        """
+        with self._cache_lock:
+            self._generation += 1
+
+            if self._cache is not None:
+                self._cache.clear()
+
+    def get_version(self):
+        """
+        Get a token that changes whenever the tasks may have changed,
+        including when tasks become overdue at midnight. Changes made by
+        other processes are also detected
+
+        Returns
+        -------
+        version: str
+            version token
+        """
+        return "%s-%d-%s" % (self._instance, self._data_version(),
+                             self._today())
+
     @contextmanager
     def _session_scope(self):
         session = self._session_maker()
@@ -358,6 +1024,11 @@ class Storage():
         """
         t = session.query(Tasks)
 
+        if self._denormalized:
+            tasks = t.filter(sqlalchemy.text("tasks.status = %d" % TASK_OPEN))
+
+            return tasks.order_by(Tasks.due_date)
+
         tasks = t.outerjoin(Completed, Tasks.id == Completed.id)
 
         return tasks.filter(Completed.id.is_(None)).order_by(Tasks.due_date)
@@ -371,6 +1042,9 @@ class Storage():
         tasks: list of Tasks
             active tasks
         """
+        if self._cache is not None:
+            return self.get_index_view()[1]
+
         with self._session_scope() as session:
             incomplete_tasks = self._get_incomplete_tasks(session)
             query = incomplete_tasks.filter(Tasks.due_date >= self._today())
@@ -386,81 +1060,456 @@ class Storage():
         tasks: list of Tasks
             active overdue tasks
         """
+        if self._cache is not None:
+            return self.get_index_view()[0]
+
         with self._session_scope() as session:
             incomplete_tasks = self._get_incomplete_tasks(session)
             query = incomplete_tasks.filter(Tasks.due_date < self._today())
 
             return query.all()
 
-    def get_completed_tasks(self):
+    def get_index_view(self):
         """
-        Get all the completed tasks
+        Get all the overdue and active tasks with a single query
 
         Returns
         -------
-        tasks: list of Tasks
-            completed tasks
+        overdue_tasks: list of Tasks
+            active overdue tasks
+        active_tasks: list of Tasks
+            active tasks (not yet complete, and not overdue)
         """
-        with self._session_scope() as session:
-            all_tasks = session.query(Tasks, Completed)
-            completed_tasks = all_tasks.filter(Completed.id == Tasks.id)
-            query = completed_tasks.order_by(Completed.completed_by.desc())
+        today = self._today()
 
-            return query.all()
+        def load():
+            with self._session_scope() as session:
+                return self._get_incomplete_tasks(session).all()
 
-    def create_task(self, description, due_date):
+        """ the overdue tasks change at midnight, so they are cached by day """
+        tasks = self._cached(("index", today), load)
+
+        """ tasks are sorted by due date, so overdue tasks come first """
+        today = date.fromisoformat(today)
+        split = next((i for i, task in enumerate(tasks)
+                      if task.due_date >= today), len(tasks))
+
+        return (tasks[:split], tasks[split:])
+
+    def _get_completed_tasks_query(self, session, after=None, before=None):
         """
-        Create new task
+        Get the completed tasks, most recently completed first
 
         Parameters
         ----------
-        description: str
-            task description
-        due_date: date
-            task due date
+        session: sqlalchemy.org.session.Session
+            sqlalchemy ORM session object
+        after: int
+            id of a completed task. Only the tasks completed before it are
+            returned
+        before: int
+            id of a completed task. Only the tasks completed after it are
+            returned, in reverse order (least recently completed first)
+
+        Returns
+        -------
+        query: sqlalchemy.query
+            completed tasks query
         """
-        due_date = datetime.strptime(due_date, self._due_date_format)
+        all_tasks = session.query(Tasks, Completed)
+        completed_tasks = all_tasks.filter(Completed.id == Tasks.id)
 
-        with self._session_scope() as session:
-            task = Tasks(description=description, due_date=due_date,
-                         created_date=self._current_date_time(),
-                         last_updated=self._current_date_time())
-            session.add(task)
-            session.commit()
+        key = sqlalchemy.tuple_(Completed.completed_by, Completed.id)
 
-    def update_task(self, task_id, description, due_date):
+        if after is not None:
+            completed_tasks = completed_tasks.filter(
+                key < self._completed_key(after))
+
+        if before is not None:
+            completed_tasks = completed_tasks.filter(
+                key > self._completed_key(before))
+
+            return completed_tasks.order_by(Completed.completed_by,
+                                            Completed.id)
+
+        return completed_tasks.order_by(Completed.completed_by.desc(),
+                                        Completed.id.desc())
+
+    def _completed_key(self, task_id):
         """
-        Update an existing task
+        Get the pagination key of a completed task
 
         Parameters
         ----------
         task_id: int
             task id
-        description: str
-            task description
-        due_date: date
-            task due date
-        """
-        due_date = datetime.strptime(due_date, self._due_date_format)
 
-        with self._session_scope() as session:
-            task = self._get_task_query(session, task_id).first()
+        Returns
+        -------
+        key: sqlalchemy.Tuple
+            (completed_by, id) of the given task
+        """
+        completed_by = sqlalchemy.select(Completed.completed_by)
+        completed_by = completed_by.where(Completed.id == task_id)
 
-            task.description = description
-            task.due_date = due_date
-            task.last_updated = self._current_date_time()
+        return sqlalchemy.tuple_(completed_by.scalar_subquery(), task_id)
 
-    def delete_task(self, task_id):
+    def _stream_query(self, build_query):
         """
-        Delete a task
+        Lazily runs a query, fetching its rows in batches. The session is
+        opened when the first row is requested and stays open until the last
+        row is consumed or the generator is closed
+
+        Parameters
+        ----------
+        build_query: callable
+            builds the query to run from a sqlalchemy ORM session object
+
+        Returns
+        -------
+        rows: generator
+            the query rows
+        """
+        with self._session_scope() as session:
+            yield from build_query(session).yield_per(STREAM_BATCH_SIZE)
+
+    def iter_index_view(self):
+        """
+        Lazily get all the overdue and active tasks with a single query. The
+        query is only run when the tasks are first requested, and its rows are
+        fetched while the tasks are consumed. The overdue tasks must be
+        consumed before the active tasks
+
+        Returns
+        -------
+        overdue_tasks: TaskStream
+            active overdue tasks
+        active_tasks: TaskStream
+            active tasks (not yet complete, and not overdue)
+        """
+        today = self._today()
+
+        """ tasks already in memory are cheaper than running the query """
+        tasks = None
+
+        if self._cache is not None:
+            data_version = self._data_version()
+
+            with self._cache_lock:
+                tasks = self._cache_lookup(("index", today), data_version)
+
+        if tasks is None:
+            tasks = self._stream_query(self._get_incomplete_tasks)
+
+        source = TaskSource(tasks)
+
+        today = date.fromisoformat(today)
+
+        return (TaskStream(source, lambda task: task.due_date < today),
+                TaskStream(source))
+
+    def iter_completed_tasks(self, after=None, limit=None):
+        """
+        Lazily get the completed tasks, most recently completed first. The
+        query is only run when the tasks are first requested, and its rows are
+        fetched while the tasks are consumed
+
+        Parameters
+        ----------
+        after: int
+            id of a completed task. Only the tasks completed before it are
+            returned
+        limit: int
+            maximum number of tasks to return, or None to return all of them.
+            If given, TaskStream.has_more tells if further tasks exist once
+            the stream is consumed
+
+        Returns
+        -------
+        tasks: TaskStream
+            completed tasks
+        """
+        def build_query(session):
+            query = self._get_completed_tasks_query(session, after)
+
+            if limit is not None:
+                """ one extra task tells if there are further tasks """
+                query = query.limit(limit + 1)
+
+            return query
+
+        return TaskStream(TaskSource(self._stream_query(build_query)),
+                          limit=limit)
+
+    def get_completed_tasks(self, after=None, before=None, limit=None):
+        """
+        Get the completed tasks, most recently completed first. The tasks
+        are paginated by keyset: a page starts right after (or ends right
+        before) the completed task with the given id
+
+        Parameters
+        ----------
+        after: int
+            id of a completed task. Only the tasks completed before it are
+            returned
+        before: int
+            id of a completed task. Only the tasks completed after it are
+            returned
+        limit: int
+            maximum number of tasks to return, or None to return all of them.
+            When used with before, the tasks completed closest to the given
+            task are returned
+
+        Returns
+        -------
+        tasks: list of (Tasks, Completed)
+            completed tasks
+        """
+        def load():
+            with self._session_scope() as session:
+                query = self._get_completed_tasks_query(session, after,
+                                                        before)
+
+                if limit is not None:
+                    query = query.limit(limit)
+
+                tasks = query.all()
+
+            if before is not None:
+                tasks.reverse()
+
+            return tasks
+
+        return list(self._cached(("completed", after, before, limit), load))
+
+    def search_tasks(self, text, offset=0, limit=None):
+        """
+        Search the tasks, completed or not, whose description holds every
+        word of the given text, best matches first. Words match any word of
+        a description they are a prefix of, regardless of case and
+        diacritics. The search goes through the full-text index, so it does
+        not scan the tasks table
+
+        Parameters
+        ----------
+        text: str
+            words to search for
+        offset: int
+            number of best matches to skip
+        limit: int
+            maximum number of tasks to return, or None to return all of them
+
+        Returns
+        -------
+        tasks: list of (Tasks, completed_by)
+            matching tasks, with the completion date of the completed tasks
+            and None for the others
+        """
+        match = self._search_expression(text)
+
+        if match is None:
+            return []
+
+        def load():
+            with self._session_scope() as session:
+                query = session.query(Tasks, Completed.completed_by)
+                query = query.join(task_search,
+                                   task_search.c.rowid == Tasks.id)
+                query = query.outerjoin(Completed, Completed.id == Tasks.id)
+                query = query.filter(
+                    task_search.c[SEARCH_TABLE].op("MATCH")(match))
+                query = query.order_by(task_search.c.rank, Tasks.id)
+                query = query.offset(offset)
+
+                if limit is not None:
+                    query = query.limit(limit)
+
+                return query.all()
+
+        return list(self._cached(("search", match, offset, limit), load))
+
+    def _search_expression(self, text):
+        """
+        Turns the text searched by the user into an FTS5 query, so that
+        the FTS5 query syntax is never interpreted
+
+        Parameters
+        ----------
+        text: str
+            words to search for
+
+        Returns
+        -------
+        expression: str
+            query matching every word as a prefix, or None if the text has
+            no words
+        """
+        words = text.split()
+
+        if not words:
+            return None
+
+        return " ".join('"%s"*' % word.replace('"', '""') for word in words)
+
+    def create_task(self, description, due_date):
+        """
+        Create new task
+
+        Parameters
+        ----------
+        description: str
+            task description
+        due_date: date
+            task due date
+
+        Returns
+        -------
+        task_id: int
+            id of the new task
+        """
+        return self.create_tasks([(description, due_date)])[0]
+
+    def create_tasks(self, tasks):
+        """
+        Create several new tasks in a single transaction, with one bulk
+        INSERT statement
+
+        Parameters
+        ----------
+        tasks: iterable of (str, str)
+            description and due date of each task
+
+        Returns
+        -------
+        task_ids: list of int
+            ids of the new tasks, in the given order
+        """
+        now = self._current_date_time()
+
+        rows = [{"description": description,
+                 "due_date": datetime.strptime(due_date,
+                                               self._due_date_format),
+                 "created_date": now, "last_updated": now}
+                for (description, due_date) in tasks]
+
+        if not rows:
+            return []
+
+        insert = sqlalchemy.insert(Tasks).returning(Tasks.id)
+
+        with self._session_scope() as session:
+            """
+            SQLite does not return the rows of a multi-row INSERT in order,
+            but gives new rows increasing ids while the transaction holds the
+            write lock, so the sorted ids follow the order of the tasks
+            """
+            task_ids = sorted(session.scalars(insert, rows))
+
+        self._changed()
+
+        self._publish("created", len(task_ids), lambda: [
+            dict(self._event_task(row), id=task_id,
+                 created_date=self._event_time(row["created_date"]))
+            for (task_id, row) in zip(task_ids, rows)])
+
+        return task_ids
+
+    def update_task(self, task_id, description, due_date):
+        """
+        Update an existing task
 
         Parameters
         ----------
         task_id: int
             task id
+        description: str
+            task description
+        due_date: date
+            task due date
+
+        Raises
+        ------
+        StorageException
+            if the task does not exist
+        """
+        self.update_tasks([(task_id, description, due_date)])
+
+    def update_tasks(self, tasks):
+        """
+        Update several existing tasks in a single transaction, with one bulk
+        UPDATE statement. No task is updated if any of them does not exist
+
+        Parameters
+        ----------
+        tasks: iterable of (int, str, str)
+            id, description and due date of each task
+
+        Raises
+        ------
+        StorageException
+            if any of the tasks does not exist
         """
+        now = self._current_date_time()
+
+        rows = [{"id": int(task_id), "description": description,
+                 "due_date": datetime.strptime(due_date,
+                                               self._due_date_format),
+                 "last_updated": now}
+                for (task_id, description, due_date) in tasks]
+
+        if not rows:
+            return
+
         with self._session_scope() as session:
-            self._get_task_query(session, task_id).delete()
+            task_ids = set(row["id"] for row in rows)
+            missing = task_ids - self._existing_tasks(session, task_ids)
+
+            if missing:
+                raise StorageException("Unknown task: %s" % min(missing))
+
+            """ bulk UPDATE by primary key, without loading the tasks """
+            session.execute(sqlalchemy.update(Tasks), rows)
+
+        self._changed()
+
+        self._publish("updated", len(rows),
+                      lambda: [dict(self._event_task(row), id=row["id"])
+                               for row in rows])
+
+    def delete_task(self, task_id):
+        """
+        Delete a task
+
+        Parameters
+        ----------
+        task_id: int
+            task id
+        """
+        self.delete_tasks([task_id])
+
+    def delete_tasks(self, task_ids):
+        """
+        Delete several tasks in a single transaction. Unknown tasks are
+        ignored
+
+        Parameters
+        ----------
+        task_ids: iterable of int
+            task ids
+        """
+        task_ids = list(set(int(task_id) for task_id in task_ids))
+
+        with self._session_scope() as session:
+            for batch in self._id_batches(task_ids):
+                session.execute(sqlalchemy.delete(Completed)
+                                .where(Completed.id.in_(batch)))
+                session.execute(sqlalchemy.delete(Tasks)
+                                .where(Tasks.id.in_(batch)))
+
+        self._changed()
+
+        self._publish("deleted", len(task_ids),
+                      lambda: [{"id": task_id} for task_id in task_ids])
 
     def complete_task(self, task_id):
         """
@@ -470,12 +1519,592 @@ class Storage():
         ----------
         task_id: int
             task id
+
+        Raises
+        ------
+        StorageException
+            if the task does not exist or is already completed
         """
+        self.complete_tasks([task_id])
+
+    def complete_tasks(self, task_ids):
+        """
+        Mark several tasks as completed in a single transaction, with one
+        bulk INSERT statement. No task is completed if any of them does not
+        exist or is already completed
+
+        Parameters
+        ----------
+        task_ids: iterable of int
+            task ids
+
+        Raises
+        ------
+        StorageException
+            if any of the tasks does not exist or is already completed, or
+            if a task is given more than once
+        """
+        task_ids = [int(task_id) for task_id in task_ids]
+
+        if not task_ids:
+            return
+
+        unique_ids = set(task_ids)
+
+        if len(unique_ids) != len(task_ids):
+            raise StorageException("Tasks given more than once")
+
+        completed_by = self._current_date_time()
+
         with self._session_scope() as session:
-            complete = Completed(id=task_id,
-                                 completed_by=self._current_date_time())
+            open_ids = self._existing_tasks(session, unique_ids,
+                                            incomplete=True)
+
+            if open_ids != unique_ids:
+                raise StorageException("Unknown or completed task: %s"
+                                       % min(unique_ids - open_ids))
+
+            session.execute(sqlalchemy.insert(Completed),
+                            [{"id": task_id, "completed_by": completed_by}
+                             for task_id in task_ids])
+
+            if self._denormalized:
+                for batch in self._id_batches(task_ids):
+                    state = task_state.update().where(
+                        task_state.c.id.in_(batch))
 
-            session.add(complete)
+                    session.execute(state.values(status=TASK_COMPLETED,
+                                                 completed_by=completed_by))
+
+        self._changed()
+
+        self._publish("completed", len(task_ids),
+                      lambda: [{"id": task_id} for task_id in task_ids])
+
+    def _event_task(self, row):
+        """
+        Get the fields of a created or updated task published by its event,
+        formatted as shown on the pages
+        """
+        return {"description": row["description"],
+                "due_date": row["due_date"].strftime(self._due_date_format),
+                "last_updated": self._event_time(row["last_updated"])}
+
+    def _event_time(self, value):
+        """ times are shown as stored, without their UTC offset """
+        return value.replace(tzinfo=None).isoformat(" ")
+
+    def _publish(self, event, task_count, tasks):
+        """
+        Publishes the change of some tasks, if events are enabled
+
+        Parameters
+        ----------
+        event : str
+            event type, see EVENT_TYPES
+        task_count : int
+            number of changed tasks
+        tasks : callable
+            gives the event data, the list of the changed tasks. Only called
+            when the tasks are few enough to be described by the event
+        """
+        if self._events is None:
+            return
+
+        if task_count > MAX_EVENT_TASKS:
+            self._events("reload", [])
+        else:
+            self._events(event, tasks())
+
+    def iter_tasks(self, chunk_size=TRANSFER_CHUNK_SIZE):
+        """
+        Lazily get every task, completed or not, in id order. The tasks are
+        read in chunks, each by its own short query, so the database is not
+        kept locked while the tasks are consumed
+
+        Parameters
+        ----------
+        chunk_size: int
+            number of tasks read by each query
+
+        Returns
+        -------
+        tasks: generator of rows
+            the tasks, with the id, description, due_date, created_date,
+            last_updated and completed_by fields. completed_by is None for
+            the tasks not completed yet
+        """
+        query = sqlalchemy.select(Tasks.id, Tasks.description, Tasks.due_date,
+                                  Tasks.created_date, Tasks.last_updated,
+                                  Completed.completed_by)
+        query = query.outerjoin(Completed, Tasks.id == Completed.id)
+        query = query.order_by(Tasks.id).limit(chunk_size)
+
+        last_id = None
+
+        while True:
+            chunk_query = query
+
+            if last_id is not None:
+                chunk_query = query.where(Tasks.id > last_id)
+
+            with self._session_scope() as session:
+                tasks = session.execute(chunk_query).all()
+
+            yield from tasks
+
+            if len(tasks) < chunk_size:
+                return
+
+            last_id = tasks[-1].id
+
+    def import_tasks(self, tasks, chunk_size=TRANSFER_CHUNK_SIZE):
+        """
+        Adds tasks with all their fields, such as exported by iter_tasks, in
+        a single transaction. The tasks are inserted in chunks as they are
+        consumed, so the iterable may hold any number of tasks. The tasks
+        get new ids
+
+        Parameters
+        ----------
+        tasks: iterable of dict
+            tasks with the description, due_date (date), created_date,
+            last_updated and completed_by (datetime) fields. completed_by is
+            None for the tasks not completed yet
+        chunk_size: int
+            number of tasks inserted by each statement
+
+        Returns
+        -------
+        count: int
+            number of imported tasks
+        """
+        count = 0
+
+        with self._session_scope() as session:
+            chunk = []
+
+            for task in tasks:
+                chunk.append(task)
+
+                if len(chunk) == chunk_size:
+                    count += self._import_chunk(session, chunk)
+                    chunk = []
+
+            if chunk:
+                count += self._import_chunk(session, chunk)
+
+        self._changed()
+
+        """ imported tasks may be open or completed, so pages reload """
+        if count:
+            self._publish("reload", count, lambda: [])
+
+        return count
+
+    def _import_chunk(self, session, tasks):
+        """
+        Inserts a chunk of tasks being imported
+
+        Parameters
+        ----------
+        session: sqlalchemy.orm.session.Session
+            sqlalchemy ORM session object
+        tasks: list of dict
+            tasks, as given to import_tasks
+
+        Returns
+        -------
+        count: int
+            number of inserted tasks
+        """
+        rows = [{"description": task["description"],
+                 "due_date": task["due_date"],
+                 "created_date": task["created_date"],
+                 "last_updated": task["last_updated"]}
+                for task in tasks]
+
+        insert = sqlalchemy.insert(Tasks).returning(Tasks.id)
+
+        """ the sorted ids follow the order of the rows, see create_tasks """
+        task_ids = sorted(session.scalars(insert, rows))
+
+        completed = [{"id": task_id, "completed_by": task["completed_by"]}
+                     for (task_id, task) in zip(task_ids, tasks)
+                     if task["completed_by"] is not None]
+
+        if completed:
+            session.execute(sqlalchemy.insert(Completed), completed)
+
+            if self._denormalized:
+                self._import_task_states(session, completed)
+
+        return len(tasks)
+
+    def _import_task_states(self, session, completed):
+        """
+        Sets the completion state of imported tasks on the denormalized
+        layout
+
+        Parameters
+        ----------
+        session: sqlalchemy.orm.session.Session
+            sqlalchemy ORM session object
+        completed: list of dict
+            id and completed_by of each completed task
+        """
+        state = task_state.update().where(
+            task_state.c.id == sqlalchemy.bindparam("task_id"))
+        state = state.values(status=TASK_COMPLETED,
+                             completed_by=sqlalchemy.bindparam("done"))
+
+        session.connection().execute(
+            state, [{"task_id": task["id"], "done": task["completed_by"]}
+                    for task in completed])
+
+    def has_archive(self):
+        """
+        Tells if tasks were archived from the database
+
+        Returns
+        -------
+        has_archive: bool
+            True if the archive file exists
+        """
+        return os.path.exists(self._archive_path)
+
+    def archive_tasks(self, days):
+        """
+        Moves the tasks completed more than the given number of days ago to
+        the archive file kept next to the database, so that the database only
+        holds the recent tasks. SQLite does not commit a transaction spanning
+        a database in WAL mode and an attached database atomically, so the
+        tasks are first copied to the archive, and then removed from the
+        database in a second transaction, once they are in the archive. If
+        archival is interrupted in between, running it again completes it:
+        the tasks already in the archive are not copied twice.
+
+        The space freed by the archived tasks is only given back to the file
+        system by vacuum
+
+        Parameters
+        ----------
+        days: float
+            age, in days, from which completed tasks are archived
+
+        Returns
+        -------
+        count: int
+            number of archived tasks
+
+        Raises
+        ------
+        StorageException
+            if the age is negative or the archive can not be written
+        """
+        if days < 0:
+            raise StorageException("Invalid archive age: %s days" % days)
+
+        cutoff = self._current_date_time() - timedelta(days=days)
+
+        archive_engine = self._get_archive_engine()
+
+        """ the archive tables are created by the first archival """
+        ArchiveBase.metadata.create_all(archive_engine)
+
+        """ archives written by older versions lack the task id index """
+        for index in ArchivedTasks.__table__.indexes:
+            index.create(archive_engine, checkfirst=True)
+
+        archived = sqlalchemy.select(Completed.id).where(
+            Completed.completed_by < cutoff)
+
+        try:
+            with self._engine.connect() as connection:
+                connection.exec_driver_sql("ATTACH DATABASE ? AS archive",
+                                           (self._archive_path,))
+
+                try:
+                    for step in (self._copy_to_archive,
+                                 self._remove_archived):
+                        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+                        try:
+                            count = step(connection, archived)
+
+                            connection.commit()
+                        except Exception:
+                            connection.rollback()
+                            raise
+                finally:
+                    connection.exec_driver_sql("DETACH DATABASE archive")
+        except OperationalError as error:
+            raise StorageException("Archival to %s failed: %s"
+                                   % (self._archive_path, error))
+
+        self._changed()
+
+        return count
+
+    def _archived_tasks_table(self):
+        """
+        Get the table of the archived tasks in the attached archive
+
+        Returns
+        -------
+        table: sqlalchemy.Table
+            archived tasks table, in the archive schema
+        """
+        return ArchivedTasks.__table__.to_metadata(sqlalchemy.MetaData(),
+                                                   schema="archive")
+
+    def _in_archive(self, archived_tasks):
+        """
+        Get the condition of the tasks that are already in the archive. Task
+        ids may be reused once their tasks are archived, so the tasks are
+        matched by all their fields
+
+        Parameters
+        ----------
+        archived_tasks: sqlalchemy.Table
+            archived tasks table, in the archive schema
+
+        Returns
+        -------
+        condition: sqlalchemy.Exists
+            condition on the Tasks table
+        """
+        completed_by = sqlalchemy.select(Completed.completed_by).where(
+            Completed.id == Tasks.id).scalar_subquery()
+
+        return sqlalchemy.exists().where(
+            archived_tasks.c.task_id == Tasks.id,
+            archived_tasks.c.description == Tasks.description,
+            archived_tasks.c.due_date == Tasks.due_date,
+            archived_tasks.c.created_date == Tasks.created_date,
+            archived_tasks.c.last_updated == Tasks.last_updated,
+            archived_tasks.c.completed_by == completed_by)
+
+    def _copy_to_archive(self, connection, archived):
+        """
+        Copies tasks that are not in the archive yet to the attached archive
+
+        Parameters
+        ----------
+        connection: sqlalchemy.engine.Connection
+            connection with the archive attached, in a write transaction
+        archived: sqlalchemy.Select
+            query of the ids of the tasks to archive
+
+        Returns
+        -------
+        count: int
+            number of copied tasks
+        """
+        archived_tasks = self._archived_tasks_table()
+
+        rows = sqlalchemy.select(Tasks.id, Tasks.description, Tasks.due_date,
+                                 Tasks.created_date, Tasks.last_updated,
+                                 Completed.completed_by)
+        rows = rows.join(Completed, Tasks.id == Completed.id)
+        rows = rows.where(Completed.id.in_(archived),
+                          ~self._in_archive(archived_tasks))
+        rows = rows.order_by(Completed.completed_by, Completed.id)
+
+        return connection.execute(
+            archived_tasks.insert().from_select(
+                ["task_id", "description", "due_date", "created_date",
+                 "last_updated", "completed_by"], rows)).rowcount
+
+    def _remove_archived(self, connection, archived):
+        """
+        Removes from the database the tasks to archive that are in the
+        attached archive
+
+        Parameters
+        ----------
+        connection: sqlalchemy.engine.Connection
+            connection with the archive attached, in a write transaction
+        archived: sqlalchemy.Select
+            query of the ids of the tasks to archive
+
+        Returns
+        -------
+        count: int
+            number of removed tasks
+        """
+        archived_tasks = self._archived_tasks_table()
+
+        count = connection.execute(sqlalchemy.delete(Tasks).where(
+            Tasks.id.in_(archived),
+            self._in_archive(archived_tasks))).rowcount
+
+        """ the tasks are selected by the completed ids, so go last """
+        connection.execute(sqlalchemy.delete(Completed).where(
+            Completed.id.in_(archived),
+            ~sqlalchemy.exists().where(Tasks.id == Completed.id)))
+
+        return count
+
+    def vacuum(self):
+        """
+        Gives the free pages of the database back to the file system, such
+        as the pages left by archived tasks. Incrementally when the database
+        uses incremental auto-vacuum, otherwise by rebuilding the database
+        file, which blocks writers until it is done
+        """
+        with self._engine.connect() as connection:
+            source = connection.connection.driver_connection
+
+            auto_vacuum = source.execute("PRAGMA auto_vacuum").fetchone()[0]
+
+            if auto_vacuum == AUTO_VACUUM_INCREMENTAL:
+                source.execute("PRAGMA incremental_vacuum").fetchall()
+            else:
+                source.execute("VACUUM")
+
+        """ in WAL mode the rebuilt pages are only written on checkpoint """
+        self.checkpoint()
+
+    def get_archived_tasks(self, after=None, before=None, limit=None):
+        """
+        Get the archived tasks, most recently completed first. The tasks are
+        paginated by keyset, as by get_completed_tasks
+
+        Parameters
+        ----------
+        after: int
+            id of an archived task. Only the tasks completed before it are
+            returned
+        before: int
+            id of an archived task. Only the tasks completed after it are
+            returned
+        limit: int
+            maximum number of tasks to return, or None to return all of them
+
+        Returns
+        -------
+        tasks: list of ArchivedTasks
+            archived tasks, an empty list if no task was archived
+        """
+        def load():
+            if not self.has_archive():
+                return []
+
+            key = sqlalchemy.tuple_(ArchivedTasks.completed_by,
+                                    ArchivedTasks.id)
+            query = sqlalchemy.select(ArchivedTasks)
+
+            if after is not None:
+                query = query.where(key < self._archived_key(after))
+
+            if before is not None:
+                query = query.where(key > self._archived_key(before))
+                query = query.order_by(ArchivedTasks.completed_by,
+                                       ArchivedTasks.id)
+            else:
+                query = query.order_by(ArchivedTasks.completed_by.desc(),
+                                       ArchivedTasks.id.desc())
+
+            if limit is not None:
+                query = query.limit(limit)
+
+            with self._archive_session() as session:
+                tasks = session.scalars(query).all()
+
+            if before is not None:
+                tasks.reverse()
+
+            return tasks
+
+        return list(self._cached(("archived", after, before, limit), load))
+
+    def _archived_key(self, archived_id):
+        completed_by = sqlalchemy.select(ArchivedTasks.completed_by)
+        completed_by = completed_by.where(ArchivedTasks.id == archived_id)
+
+        return sqlalchemy.tuple_(completed_by.scalar_subquery(), archived_id)
+
+    def _get_archive_engine(self):
+        """
+        Get the engine of the archive file, created on first use as most
+        databases are never archived
+        """
+        with self._archive_lock:
+            if self._archive_engine is None:
+                self._archive_engine = sqlalchemy.create_engine(
+                    "sqlite:///" + self._archive_path, poolclass=NullPool,
+                    **self._engine_args)
+
+                if self._metrics is not None:
+                    self._metrics.instrument(self._archive_engine)
+
+            return self._archive_engine
+
+    @contextmanager
+    def _archive_session(self):
+        session = sessionmaker(bind=self._get_archive_engine(),
+                               expire_on_commit=False)()
+
+        try:
+            yield session
+        finally:
+            session.close()
+
+    def _id_batches(self, task_ids):
+        """
+        Splits task ids in batches small enough for a single IN list
+
+        Parameters
+        ----------
+        task_ids: list of int
+            task ids
+
+        Returns
+        -------
+        batches: iterator of list of int
+            the task ids, in batches of at most ID_BATCH_SIZE
+        """
+        for start in range(0, len(task_ids), ID_BATCH_SIZE):
+            yield task_ids[start:start + ID_BATCH_SIZE]
+
+    def _existing_tasks(self, session, task_ids, incomplete=False):
+        """
+        Get which of the given tasks exist
+
+        Parameters
+        ----------
+        session: sqlalchemy.orm.session.Session
+            sqlalchemy ORM session object
+        task_ids: set of int
+            task ids
+        incomplete: bool
+            only consider the tasks not completed yet
+
+        Returns
+        -------
+        task_ids: set of int
+            ids of the given tasks that exist
+        """
+        existing = set()
+
+        for batch in self._id_batches(list(task_ids)):
+            query = sqlalchemy.select(Tasks.id).where(Tasks.id.in_(batch))
+
+            if incomplete:
+                query = query.outerjoin(Completed, Tasks.id == Completed.id)
+                query = query.where(Completed.id.is_(None))
+
+            existing.update(session.scalars(query))
+
+        return existing
+
+
+class _BackupRestarted(Exception):
+    """
+    Raised when a backup was restarted too many times by concurrent writes
+    """
+    pass
 
 
 class StorageException(Exception):
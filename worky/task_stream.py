@@ -0,0 +1,136 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+_END = object()
+
+
+class TaskSource():
+    """
+    Lazily fetched tasks that can be peeked before being consumed
+    """
+
+    def __init__(self, tasks):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        tasks : iterable
+            tasks, usually a generator over an open database query
+        """
+        self._tasks = iter(tasks)
+        self._next = None
+
+    def peek(self):
+        """
+        Get the next task without consuming it
+
+        Returns
+        -------
+        task : object
+            the next task, or _END if there are no more tasks
+        """
+        if self._next is None:
+            self._next = next(self._tasks, _END)
+
+        return self._next
+
+    def pop(self):
+        """
+        Consume the next task
+
+        Returns
+        -------
+        task : object
+            the next task, or _END if there are no more tasks
+        """
+        task = self.peek()
+
+        if task is not _END:
+            self._next = None
+
+        return task
+
+
+class TaskStream():
+    """
+    Tasks streamed from a task source while a page is being rendered. The
+    stream can only be iterated once, but it can be tested for emptiness
+    beforehand. Several streams may share the same source, each taking the
+    tasks while its condition holds
+    """
+
+    def __init__(self, source, condition=None, limit=None):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        source : TaskSource
+            source of the tasks
+        condition : callable
+            the stream ends at the first task for which condition(task) is
+            False. By default every task is taken
+        limit : int
+            maximum number of tasks to take, or None to take them all
+        """
+        self._source = source
+        self._condition = condition
+        self._limit = limit
+
+        self.count = 0
+        self.first = None
+        self.last = None
+
+    def _has_next(self):
+        if self._limit is not None and self.count >= self._limit:
+            return False
+
+        task = self._source.peek()
+
+        if task is _END:
+            return False
+
+        return self._condition is None or self._condition(task)
+
+    def __bool__(self):
+        return self._has_next()
+
+    def __iter__(self):
+        while self._has_next():
+            self.last = self._source.pop()
+
+            if self.count == 0:
+                self.first = self.last
+
+            self.count += 1
+
+            yield self.last
+
+    @property
+    def has_more(self):
+        """
+        Whether the source holds further tasks past the limit of the stream
+        """
+        return self._source.peek() is not _END
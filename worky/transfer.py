@@ -0,0 +1,280 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from worky.storage import Storage, StorageException
+from datetime import date, datetime, UTC
+from pathlib import Path
+import argparse
+import csv
+import json
+import sys
+import time
+
+""" file formats of the exported tasks """
+FORMATS = ["csv", "jsonl"]
+
+""" fields of an exported task, in CSV column order """
+FIELDS = ["id", "description", "due_date", "created_date", "last_updated",
+          "completed_by"]
+
+
+def export_tasks(storage, output, file_format):
+    """
+    Writes every task of a storage to a file, reading the tasks in chunks
+
+    Parameters
+    ----------
+    storage : Storage
+        storage whose tasks are exported
+    output : file object
+        text file the tasks are written to
+    file_format : str
+        one of FORMATS
+
+    Returns
+    -------
+    count : int
+        number of exported tasks
+    """
+    count = 0
+
+    if file_format == "csv":
+        writer = csv.writer(output)
+        writer.writerow(FIELDS)
+
+        def write(task):
+            writer.writerow(["" if value is None else value
+                             for value in task.values()])
+    else:
+        def write(task):
+            output.write(json.dumps(task) + "\n")
+
+    for row in storage.iter_tasks():
+        write({
+            "id": row.id,
+            "description": row.description,
+            "due_date": row.due_date.isoformat(),
+            "created_date": row.created_date.isoformat(),
+            "last_updated": row.last_updated.isoformat(),
+            "completed_by": None if row.completed_by is None
+            else row.completed_by.isoformat(),
+        })
+
+        count += 1
+
+    return count
+
+
+def read_tasks(source, file_format):
+    """
+    Lazily reads the tasks of a file written by export_tasks. Only the
+    description and due_date fields are mandatory: missing creation and
+    update dates are set to the current time, and tasks without a
+    completion date are not completed
+
+    Parameters
+    ----------
+    source : file object
+        text file the tasks are read from
+    file_format : str
+        one of FORMATS
+
+    Returns
+    -------
+    tasks : generator of dict
+        the tasks, as expected by Storage.import_tasks
+
+    Raises
+    ------
+    TransferException
+        if a task is invalid
+    """
+    now = datetime.now(UTC).replace(microsecond=0, tzinfo=None)
+
+    if file_format == "csv":
+        """ the header is line 1 """
+        records = enumerate(csv.DictReader(source), start=2)
+    else:
+        records = ((line_number, _json_record(line, line_number))
+                   for (line_number, line) in enumerate(source, start=1)
+                   if line.strip())
+
+    for (line_number, record) in records:
+        try:
+            yield _parse_task(record, now)
+        except (TypeError, ValueError, KeyError) as error:
+            raise TransferException("Invalid task at line %d: %s"
+                                    % (line_number, error))
+
+
+def _json_record(line, line_number):
+    try:
+        record = json.loads(line)
+    except ValueError as error:
+        raise TransferException("Invalid JSON at line %d: %s"
+                                % (line_number, error))
+
+    if not isinstance(record, dict):
+        raise TransferException("Invalid task at line %d: expected a JSON "
+                                "object" % line_number)
+
+    return record
+
+
+def _parse_task(record, now):
+    """
+    Converts the fields of a task read from a file
+
+    Parameters
+    ----------
+    record : dict
+        task fields, as strings or None
+    now : datetime
+        default creation and update date
+
+    Returns
+    -------
+    task : dict
+        the task, as expected by Storage.import_tasks
+    """
+    description = record["description"]
+
+    if not isinstance(description, str) or not description:
+        raise ValueError("missing description")
+
+    def date_time(name, default):
+        value = record.get(name)
+
+        if value is None or value == "":
+            return default
+
+        value = datetime.fromisoformat(value)
+
+        """ dates are kept in UTC, without time zone """
+        if value.tzinfo is not None:
+            value = value.astimezone(UTC).replace(tzinfo=None)
+
+        return value
+
+    return {
+        "description": description,
+        "due_date": date.fromisoformat(record["due_date"]),
+        "created_date": date_time("created_date", now),
+        "last_updated": date_time("last_updated", now),
+        "completed_by": date_time("completed_by", None),
+    }
+
+
+def _file_format(path, file_format):
+    if file_format is not None:
+        return file_format
+
+    return "jsonl" if Path(path).suffix.lower() == ".jsonl" else "csv"
+
+
+def _report(action, count, seconds):
+    print("%s %d tasks in %.2f s (%.0f tasks/s)"
+          % (action, count, seconds, count / seconds if seconds else 0),
+          file=sys.stderr)
+
+
+def main(command, argv):
+    """
+    Runs the import or export command of worky.py
+
+    Parameters
+    ----------
+    command : str
+        import or export
+    argv : list of str
+        command arguments
+    """
+    arg_parser = argparse.ArgumentParser(prog="worky.py %s" % command)
+
+    if command == "export":
+        arg_parser.description = "Writes every task of a Worky database to " \
+            "a CSV or JSON lines file"
+        arg_parser.add_argument("db", help="location of the Worky database",
+                                type=str)
+        arg_parser.add_argument("file", help="file the tasks are written to, "
+                                "or - for the standard output", type=str)
+    else:
+        arg_parser.description = "Adds the tasks of a CSV or JSON lines " \
+            "file, such as written by export, to a Worky database. The " \
+            "tasks get new ids. Nothing is imported if any task is invalid"
+        arg_parser.add_argument("db", help="location of the Worky database. "
+                                "If the database does not exists it will be "
+                                "created", type=str)
+        arg_parser.add_argument("file", help="file the tasks are read from, "
+                                "or - for the standard input", type=str)
+
+    arg_parser.add_argument("--format", metavar="", help="file format, one "
+                            "of: %s. Default is jsonl for .jsonl files and "
+                            "csv otherwise" % ", ".join(FORMATS), type=str,
+                            dest="file_format", choices=FORMATS)
+    args = arg_parser.parse_args(argv)
+
+    file_format = _file_format(args.file, args.file_format)
+
+    if command == "export" and not Path(args.db).is_file():
+        arg_parser.error("Database does not exist: %s" % args.db)
+
+    try:
+        storage = Storage(args.db)
+    except StorageException as error:
+        arg_parser.error(str(error))
+
+    start = time.perf_counter()
+
+    try:
+        if command == "export":
+            if args.file == "-":
+                count = export_tasks(storage, sys.stdout, file_format)
+            else:
+                with open(args.file, "w", newline="",
+                          encoding="utf-8") as output:
+                    count = export_tasks(storage, output, file_format)
+
+            _report("Exported", count, time.perf_counter() - start)
+        else:
+            if args.file == "-":
+                count = storage.import_tasks(read_tasks(sys.stdin,
+                                                        file_format))
+            else:
+                with open(args.file, newline="", encoding="utf-8") as source:
+                    count = storage.import_tasks(read_tasks(source,
+                                                            file_format))
+
+            _report("Imported", count, time.perf_counter() - start)
+    except (OSError, TransferException) as error:
+        arg_parser.error(str(error))
+    finally:
+        storage.close()
+
+
+class TransferException(Exception):
+    """
+    Import or export exception
+    """
+    pass
@@ -0,0 +1,388 @@
+"""
+MIT License
+
+Copyright (c) 2020 André Lousa Marques <andre.lousa.marques at gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from worky.storage import Storage, StorageException
+from worky.config import MAX_OPEN, IDLE_TIMEOUT
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Condition, Event, Thread
+from werkzeug.wsgi import ClosingIterator
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+""" URL prefix under which each workfile of a workspace is served """
+WORKFILE_PREFIX = "/w/"
+
+""" environ key holding the storage of the requested workfile """
+STORAGE_KEY = "worky.storage"
+
+""" name of a workfile, without the .worky suffix """
+WORKFILE_NAME = re.compile("[a-zA-Z]\\w*")
+
+
+class Workspace():
+    """
+    Directory of Worky databases, opened on demand. At most a given number
+    of databases are kept open at the same time, closing the least recently
+    used ones first, and databases left unused for a while are closed too
+    """
+
+    def __init__(self, directory, max_open=MAX_OPEN,
+                 idle_timeout=IDLE_TIMEOUT, events=None, **storage_args):
+        """
+        Parameters
+        ----------
+        directory : str
+            directory holding the workfiles
+        max_open : int
+            maximum number of workfiles kept open at the same time. Workfiles
+            in use by a request are never closed, so this bound is exceeded
+            while more workfiles than this are being used at once
+        idle_timeout : float
+            number of seconds after which an unused workfile is closed
+        events : EventBroker
+            broker to which each workfile publishes the changes of its
+            tasks, on the topic named after the workfile, or None
+        storage_args : dict
+            arguments of every Storage opened by the workspace
+
+        Raises
+        ------
+        WorkspaceException
+            if the given directory does not exist or the limits are invalid
+        """
+        self._directory = Path(directory)
+
+        if not self._directory.is_dir():
+            raise WorkspaceException("Workspace directory does not exist: %s"
+                                     % directory)
+
+        if max_open < 1:
+            raise WorkspaceException("Invalid maximum number of open "
+                                     "workfiles: %d" % max_open)
+
+        if idle_timeout <= 0:
+            raise WorkspaceException("Invalid idle timeout: %s"
+                                     % idle_timeout)
+
+        self._max_open = max_open
+        self._idle_timeout = idle_timeout
+        self._storage_args = storage_args
+        self._events = events
+
+        """ open workfiles by name, least recently used first """
+        self._open = OrderedDict()
+        self._condition = Condition()
+        self._stop = Event()
+        self._reaper = None
+
+    def names(self):
+        """
+        Get the names of the workfiles in the workspace directory
+
+        Returns
+        -------
+        names : list of str
+            sorted workfile names, without the .worky suffix
+        """
+        return sorted(path.stem for path in self._directory.glob("*.worky")
+                      if path.is_file() and
+                      WORKFILE_NAME.fullmatch(path.stem))
+
+    def open_count(self):
+        """
+        Get the number of workfiles currently open
+
+        Returns
+        -------
+        count : int
+            number of open workfiles
+        """
+        with self._condition:
+            return len(self._open)
+
+    def acquire(self, name):
+        """
+        Get the storage of a workfile, opening it if needed. The storage is
+        not closed until it is released
+
+        Parameters
+        ----------
+        name : str
+            workfile name, without the .worky suffix
+
+        Returns
+        -------
+        storage : Storage
+            storage of the workfile
+
+        Raises
+        ------
+        WorkspaceException
+            if the workspace has no such workfile
+        StorageException
+            if the workfile is not a valid Worky database
+        """
+        path = self._directory / ("%s.worky" % name)
+
+        """ new workfiles are never created from a URL """
+        if not WORKFILE_NAME.fullmatch(name) or not path.is_file():
+            raise WorkspaceException("Unknown workfile: %s" % name)
+
+        with self._condition:
+            while True:
+                entry = self._open.get(name)
+
+                if entry is None or not entry.opening:
+                    break
+
+                """ another request is opening this workfile """
+                self._condition.wait()
+
+            if entry is not None:
+                self._open.move_to_end(name)
+                entry.users += 1
+
+                return entry.storage
+
+            entry = _OpenWorkfile()
+            self._open[name] = entry
+
+        """ opening validates the schema, so other workfiles are not held """
+        if self._events is not None:
+            storage_args = dict(self._storage_args,
+                                events=self._events.publisher(name))
+        else:
+            storage_args = self._storage_args
+
+        try:
+            storage = Storage(str(path), **storage_args)
+        except BaseException:
+            with self._condition:
+                del self._open[name]
+                self._condition.notify_all()
+            raise
+
+        with self._condition:
+            entry.storage = storage
+            entry.opening = False
+            entry.users = 1
+            self._condition.notify_all()
+
+            evicted = self._evict(self._max_open)
+
+        self._close(evicted)
+
+        return storage
+
+    def release(self, name):
+        """
+        Marks a storage obtained through acquire as no longer in use
+
+        Parameters
+        ----------
+        name : str
+            workfile name, without the .worky suffix
+        """
+        with self._condition:
+            entry = self._open[name]
+            entry.users -= 1
+            entry.last_used = time.monotonic()
+
+            evicted = self._evict(self._max_open)
+
+        self._close(evicted)
+
+    @contextmanager
+    def storage(self, name):
+        """
+        Context manager holding the storage of a workfile while in use
+
+        Parameters
+        ----------
+        name : str
+            workfile name, without the .worky suffix
+
+        Yields
+        ------
+        storage : Storage
+            storage of the workfile
+        """
+        storage = self.acquire(name)
+
+        try:
+            yield storage
+        finally:
+            self.release(name)
+
+    def evict_idle(self):
+        """
+        Closes the workfiles left unused for longer than the idle timeout
+        """
+        with self._condition:
+            evicted = self._evict(self._max_open,
+                                  time.monotonic() - self._idle_timeout)
+
+        self._close(evicted)
+
+    def start(self):
+        """
+        Starts closing idle workfiles in the background
+        """
+        self._stop.clear()
+        self._reaper = Thread(target=self._reap, name="worky-workspace",
+                              daemon=True)
+        self._reaper.start()
+
+    def close(self):
+        """
+        Stops the background eviction and closes every open workfile
+        """
+        self._stop.set()
+
+        if self._reaper is not None:
+            self._reaper.join()
+            self._reaper = None
+
+        with self._condition:
+            evicted = self._evict(0)
+
+        self._close(evicted)
+
+    def _reap(self):
+        while not self._stop.wait(self._idle_timeout / 2):
+            self.evict_idle()
+
+    def _evict(self, max_open, idle_since=None):
+        """
+        Removes unused workfiles from the open workfiles, least recently used
+        first, until at most max_open remain. Workfiles unused since before
+        idle_since are removed regardless. Must be called with the lock held
+
+        Parameters
+        ----------
+        max_open : int
+            maximum number of workfiles left open
+        idle_since : float
+            monotonic time before which unused workfiles are removed
+
+        Returns
+        -------
+        storages : list of Storage
+            storages of the removed workfiles, to be closed without the lock
+        """
+        evicted = []
+        excess = len(self._open) - max_open
+
+        for (name, entry) in list(self._open.items()):
+            if entry.opening or entry.users > 0:
+                continue
+
+            if excess > 0 or (idle_since is not None and
+                              entry.last_used < idle_since):
+                evicted.append(self._open.pop(name).storage)
+                excess -= 1
+
+        return evicted
+
+    def _close(self, storages):
+        for storage in storages:
+            storage.close()
+
+
+class _OpenWorkfile():
+    """
+    Storage of an open workfile and its usage
+    """
+
+    def __init__(self):
+        self.storage = None
+        self.opening = True
+        self.users = 0
+        self.last_used = time.monotonic()
+
+
+class WorkspaceMiddleware():
+    """
+    WSGI middleware serving each workfile of a workspace under its own URL
+    prefix. The requested workfile is held open until its response is sent,
+    and its storage is passed to the application through the request environ
+    """
+
+    def __init__(self, app, workspace):
+        """
+        Parameters
+        ----------
+        app : callable
+            WSGI application serving a single workfile
+        workspace : Workspace
+            workspace whose workfiles are served
+        """
+        self._app = app
+        self._workspace = workspace
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+
+        if not path.startswith(WORKFILE_PREFIX):
+            return self._app(environ, start_response)
+
+        (name, _, rest) = path[len(WORKFILE_PREFIX):].partition("/")
+
+        try:
+            storage = self._workspace.acquire(name)
+        except WorkspaceException:
+            return self._app(environ, start_response)
+        except StorageException as error:
+            """ a workfile that is not a valid database is not served """
+            logger.warning("Can not serve workfile %s: %s", name, error)
+
+            return self._app(environ, start_response)
+
+        """ the application sees the workfile prefix as its mount point """
+        environ["SCRIPT_NAME"] = environ.get("SCRIPT_NAME", "") + \
+            WORKFILE_PREFIX + name
+        environ["PATH_INFO"] = "/" + rest
+        environ[STORAGE_KEY] = storage
+
+        try:
+            response = self._app(environ, start_response)
+        except BaseException:
+            self._workspace.release(name)
+            raise
+
+        """ streamed pages keep reading the storage until fully sent """
+        return ClosingIterator(response,
+                               lambda: self._workspace.release(name))
+
+
+class WorkspaceException(Exception):
+    """
+    Workspace class exception
+    """
+    pass